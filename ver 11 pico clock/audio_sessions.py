@@ -0,0 +1,244 @@
+import asyncio
+import threading
+import time
+
+
+def init_com_thread():
+    """Initialise COM on the calling thread (no-op where COM does not exist)."""
+    try:
+        import comtypes
+    except ImportError:
+        return
+
+    comtypes.CoInitialize()
+
+
+class SessionBackend:
+    """Where the volume interfaces come from.
+
+    list_sessions() returns (process_name, session_key, simple_audio_volume)
+    tuples. session_key identifies one session (e.g. the process id) so the
+    index can tell when sessions appeared or disappeared.
+    """
+
+    def init_thread(self):
+        """Called once on every thread that will talk to the backend."""
+
+    def master_volume(self):
+        raise NotImplementedError
+
+    def list_sessions(self):
+        raise NotImplementedError
+
+
+class PycawSessionBackend(SessionBackend):
+    """Windows Core Audio sessions through pycaw."""
+
+    def init_thread(self):
+        init_com_thread()
+
+    def master_volume(self):
+        from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
+        from comtypes import CLSCTX_ALL
+
+        devices = AudioUtilities.GetSpeakers()
+        interface = devices.Activate(IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
+        return interface.QueryInterface(IAudioEndpointVolume)
+
+    def list_sessions(self):
+        from pycaw.pycaw import AudioUtilities
+
+        sessions = []
+        for session in AudioUtilities.GetAllSessions():
+            # noinspection PyBroadException
+            try:
+                if session.Process:
+                    sessions.append((session.Process.name(), session.ProcessId, session.SimpleAudioVolume))
+            except Exception:
+                pass  # process exited while enumerating
+        return sessions
+
+
+class FakeVolume:
+    """Stand-in for IAudioEndpointVolume / ISimpleAudioVolume that records writes."""
+
+    def __init__(self):
+        self.level = None
+        self.writes = 0
+
+    def SetMasterVolume(self, level, event_context):
+        self.level = level
+        self.writes += 1
+
+    def SetMasterVolumeLevel(self, level_db, event_context):
+        self.level = level_db
+        self.writes += 1
+
+
+class FakeSessionBackend(SessionBackend):
+    """In-memory sessions, for running and benchmarking the host on any OS."""
+
+    def __init__(self, session_count=0, enumerate_delay=0.0):
+        self.enumerate_delay = enumerate_delay
+        self.enumerations = 0
+        self.master = FakeVolume()
+        self._sessions = {}
+        self._next_key = 0
+        self._lock = threading.Lock()
+        for i in range(session_count):
+            self.add_session(f"app{i}.exe")
+
+    def master_volume(self):
+        return self.master
+
+    def add_session(self, name):
+        with self._lock:
+            key = self._next_key
+            self._next_key += 1
+            self._sessions[key] = (name, FakeVolume())
+            return key
+
+    def remove_session(self, key):
+        with self._lock:
+            self._sessions.pop(key, None)
+
+    def list_sessions(self):
+        self.enumerations += 1
+        if self.enumerate_delay:
+            time.sleep(self.enumerate_delay)
+        with self._lock:
+            return [(name, key, volume) for key, (name, volume) in self._sessions.items()]
+
+
+class AudioSessionIndex:
+    """process name -> session volume interfaces, refreshed off the hot path.
+
+    run() re-enumerates the backend every refresh_interval (or sooner after
+    invalidate()) in the given executor and swaps in a new dict only when the
+    set of sessions changed, or always after invalidate(rebuild=True) for
+    interfaces that went stale under an unchanged key. lookup() is a plain
+    dict read and never enumerates. Subscribers hear about every new index.
+    """
+
+    def __init__(self, backend, refresh_interval=2.0, min_refresh_gap=0.5):
+        self.backend = backend
+        self.refresh_interval = refresh_interval
+        self.min_refresh_gap = min_refresh_gap
+
+        self._index = {}
+        self._keys = frozenset()
+        self._last_refresh = 0.0
+        self._rebuild = False  # next refresh rebuilds even if the keys are unchanged
+        self._misses = {}  # name -> rebuilds count at its last miss
+
+        self.refreshes = 0
+        self.rebuilds = 0
+
+        self.loop = None
+        self.invalidate_event = asyncio.Event()
+        self.rebuild_callbacks = []
+
+    def lookup(self, name):
+        """Return the volume interfaces of every session owned by name (may be empty)."""
+        return self._index.get(name, ())
+
+    def subscribe(self, callback):
+        """Call callback(names) on the event loop after run() rebuilt the index; names are the apps in it."""
+        self.rebuild_callbacks.append(callback)
+
+    def invalidate(self, rebuild=False):
+        """Ask for a refresh soon. Thread safe.
+
+        rebuild=True replaces the interfaces even if the sessions look the same,
+        for an interface that failed, e.g. after the audio device changed.
+        """
+        if rebuild:
+            self._rebuild = True
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.invalidate_event.set)
+
+    def miss(self, name):
+        """name has no session: refresh once, then only again after the index changed.
+
+        A configured app that is not running would otherwise force an
+        enumeration on every volume write.
+        """
+        if self._misses.get(name) != self.rebuilds:
+            self._misses[name] = self.rebuilds
+            self.invalidate()
+
+    def refresh(self, force=False):
+        """Enumerate the backend once (blocking) and rebuild the index if needed."""
+        force = force or self._rebuild
+        self._rebuild = False
+        sessions = self.backend.list_sessions()
+        self._last_refresh = time.monotonic()
+        self.refreshes += 1
+
+        keys = frozenset((name, key) for name, key, _ in sessions)
+        if keys == self._keys and not force:
+            return False
+
+        index = {}
+        for name, _, volume in sessions:
+            index.setdefault(name, []).append(volume)
+
+        # Single reference swap, readers never see a half built index
+        self._index = {name: tuple(volumes) for name, volumes in index.items()}
+        self._keys = keys
+        self.rebuilds += 1
+        return True
+
+    async def run(self, executor=None):
+        self.loop = asyncio.get_running_loop()
+
+        while True:
+            try:
+                await asyncio.wait_for(self.invalidate_event.wait(), self.refresh_interval)
+            except asyncio.TimeoutError:
+                pass
+            self.invalidate_event.clear()
+
+            # Bound how often misses can force an enumeration
+            gap = self._last_refresh + self.min_refresh_gap - time.monotonic()
+            if gap > 0:
+                await asyncio.sleep(gap)
+
+            try:
+                rebuilt = await self.loop.run_in_executor(executor, self.refresh)
+            except Exception as e:
+                print(f"Audio session refresh error: {e}")
+                continue
+
+            if rebuilt:
+                names = frozenset(self._index)
+                for callback in self.rebuild_callbacks:
+                    callback(names)
+
+
+# Lookup cost benchmark, runs anywhere thanks to the fake backend
+if __name__ == "__main__":
+    import timeit
+
+    session_count = 5000
+    backend = FakeSessionBackend(session_count)
+    index = AudioSessionIndex(backend)
+    index.refresh()
+    name = f"app{session_count - 1}.exe"
+
+    def linear_scan():
+        for session_name, _, volume in backend.list_sessions():
+            if session_name == name:
+                volume.SetMasterVolume(0.5, None)
+
+    def indexed():
+        for volume in index.lookup(name):
+            volume.SetMasterVolume(0.5, None)
+
+    runs = 200
+    scan_time = timeit.timeit(linear_scan, number=runs) / runs
+    index_time = timeit.timeit(indexed, number=runs * 100) / (runs * 100)
+
+    print(f"{session_count} sessions")
+    print(f"linear scan: {scan_time * 1e6:10.1f} us per set_volume")
+    print(f"indexed:     {index_time * 1e6:10.3f} us per set_volume")
@@ -0,0 +1,216 @@
+import asyncio
+import calendar
+import json
+import time
+from collections import namedtuple
+from datetime import datetime
+
+import pyserial
+import serial_protocol
+
+# A sync round sends RTC|RESYNC so the pad re-reads its DS1307, then PING|<seq>;
+# the pad answers ALIVE|<seq>|<ms>|<age ms> with its clock in ms (local time,
+# counted like time.mktime on the pad: since 1970 with no time zone) and how
+# long that clock has run on the Pico's crystal since the chip was read. See
+# SerialManager._on_ping in pico_test.py.
+RESYNC_WAIT = 1.2  # the pad needs up to a second to catch the chip's seconds tick
+MAX_SAMPLE_AGE_MS = 5000  # older snapshots measure the crystal, not the DS1307
+PINGS_PER_ROUND = 8
+PING_SPACING = 0.05  # seconds between the pings of a round
+REPLY_TIMEOUT = 1.0
+RETRY_INTERVAL = 5.0  # next round after a failed or late correction
+SPIN_BEFORE = 0.03  # last stretch before a CLOCK write is awaited with sleep(0), timers are too coarse
+MIN_DRIFT_SPAN = 60.0  # seconds since the last correction before a drift rate is reported
+
+SyncSample = namedtuple("SyncSample", ["rtt_ms", "offset_ms"])
+
+
+def local_ms(wall):
+    """time.time() value as ms since 1970 in local time, the pad's reckoning."""
+    return calendar.timegm(time.localtime(wall)) * 1000 + int(wall % 1 * 1000)
+
+
+def wall_at(perf):
+    """time.time() at the perf_counter() value perf."""
+    return time.time() - (time.perf_counter() - perf)
+
+
+class ClockSync:
+    """Keeps the pad's clock within threshold_ms of this computer's.
+
+    Every interval (and on every new connection) a round of pings measures the
+    pad's offset; the reply with the shortest round trip is used, its midpoint
+    taken as the moment the pad read its clock. When the pad is further off
+    than threshold_ms, a CLOCK command is written so that it reaches the pad
+    on a whole second: the DS1307 restarts its second when the seconds are
+    written, so the pad is then in step to within the write jitter.
+
+    Only replies from a fresh chip read count, so between corrections the
+    offset creeps by the DS1307's drift; the rate since the last correction
+    is reported in ppm. Rounds are printed and, with
+    log_path, appended to a JSON lines file.
+    """
+
+    def __init__(self, serial_obj, interval=600.0, threshold_ms=20, log_path=None, echo=True):
+        self.serial_obj = serial_obj
+        self.interval = interval
+        self.threshold_ms = threshold_ms
+        self.log_path = log_path
+        self.echo = echo
+
+        self._seq = 0
+        self._pending = {}  # seq -> future resolved with (received perf_counter, pad ms, age ms)
+        self._stale = 0  # replies of the last round whose snapshot was too old
+        self.reference = None  # (perf_counter, offset_ms) of the first round or the last correction
+        self.last = None
+        self.drift_ppm = None
+        self.corrections = 0
+        serial_obj.subscribe(self._on_frame)
+
+    async def run(self):
+        session = None
+        next_round = 0.0
+        while True:
+            await asyncio.sleep(1)
+            if not self.serial_obj.connected:
+                continue
+            if self.serial_obj.sessions == session and time.monotonic() < next_round:
+                continue
+
+            session = self.serial_obj.sessions
+            try:
+                ok = await self.sync()
+            except Exception as e:
+                print(f"Clock sync error: {e}")
+                ok = False
+            next_round = time.monotonic() + (self.interval if ok else RETRY_INTERVAL)
+
+    async def sync(self):
+        """One round: measure, correct if needed and verify. True if the pad is in step."""
+        sample = await self.measure()
+        if sample is None and self._stale:
+            print("Clock sync: pad did not re-read its RTC, trying again later")
+            return False
+        if sample is None:
+            # Firmware without timestamped pings, the best we can do is set it blind
+            await self.correct(SyncSample(0.0, None))
+            self._record(None, corrected=True)
+            return True
+
+        self._update_drift(sample)
+        if abs(sample.offset_ms) <= self.threshold_ms:
+            self._record(sample, corrected=False)
+            return True
+
+        await self.correct(sample)
+        residual = await self.measure()
+        self._record(sample, corrected=True, residual=residual)
+        if residual is None:
+            return False
+
+        self.reference = (time.perf_counter(), residual.offset_ms)
+        return abs(residual.offset_ms) <= self.threshold_ms
+
+    async def measure(self):
+        """Best SyncSample of a round of pings, None if the pad never answered with its chip's clock."""
+        loop = asyncio.get_running_loop()
+        self.serial_obj.send("RTC|RESYNC\n", priority=pyserial.PRIORITY_CONTROL, key="RTC")
+        await asyncio.sleep(RESYNC_WAIT)
+
+        best = None
+        self._stale = 0
+        for _ in range(PINGS_PER_ROUND):
+            self._seq = (self._seq + 1) % 65536
+            seq = self._seq
+            reply = self._pending[seq] = loop.create_future()
+            try:
+                enqueued = time.perf_counter()
+                write = self.serial_obj.send(f"PING|{seq}\n", priority=pyserial.PRIORITY_CONTROL)
+                written = enqueued + await asyncio.wrap_future(write)
+                received, pad_ms, age_ms = await asyncio.wait_for(reply, REPLY_TIMEOUT)
+            except Exception:
+                continue  # lost reply, refused write or a pad that answers plain ALIVE
+            finally:
+                self._pending.pop(seq, None)
+
+            if age_ms > MAX_SAMPLE_AGE_MS:
+                self._stale += 1
+                continue
+
+            rtt = received - written
+            sample = SyncSample(rtt * 1000, pad_ms - local_ms(wall_at(written + rtt / 2)))
+            if best is None or sample.rtt_ms < best.rtt_ms:
+                best = sample
+            await asyncio.sleep(PING_SPACING)
+        return best
+
+    async def correct(self, sample):
+        """Write CLOCK so that it reaches the pad as the next whole second starts."""
+        lead = sample.rtt_ms / 2000  # one way, from a write completing to the pad acting on it
+        write_latency = self.serial_obj.write_latency[pyserial.PRIORITY_CONTROL].last
+
+        target = int(time.time()) + 1
+        send_at = target - lead - write_latency
+        if send_at - time.time() < 0.2:
+            target += 1  # too close to prepare, use the second after
+            send_at += 1
+
+        remaining = send_at - time.time()
+        if remaining > SPIN_BEFORE:
+            await asyncio.sleep(remaining - SPIN_BEFORE)
+        while time.time() < send_at:
+            await asyncio.sleep(0)
+
+        latency = await asyncio.wrap_future(self.serial_obj.send_time_to_pico(datetime.fromtimestamp(target)))
+        self.corrections += 1
+        return latency
+
+    def _on_frame(self, frame):
+        if frame.type != serial_protocol.FRAME_TEXT or not frame.data.startswith("ALIVE|"):
+            return
+        try:
+            _, seq, pad_ms, age_ms = frame.data.split("|")
+            reply = self._pending.get(int(seq))
+            if reply is not None and not reply.done():
+                reply.set_result((time.perf_counter(), int(pad_ms), int(age_ms)))
+        except ValueError:
+            pass
+
+    def _update_drift(self, sample):
+        if self.reference is None:
+            self.reference = (time.perf_counter(), sample.offset_ms)
+            return
+        since, offset_ms = self.reference
+        span = time.perf_counter() - since
+        if span >= MIN_DRIFT_SPAN:
+            # ms per s is 1000 ppm
+            self.drift_ppm = (sample.offset_ms - offset_ms) / span * 1000
+
+    def _record(self, sample, corrected, residual=None):
+        record = {
+            "time": time.time(),
+            "rtt_ms": round(sample.rtt_ms, 2) if sample else None,
+            "offset_ms": round(sample.offset_ms, 1) if sample else None,
+            "corrected": corrected,
+            "residual_ms": round(residual.offset_ms, 1) if residual else None,
+            "drift_ppm": round(self.drift_ppm, 2) if self.drift_ppm is not None else None,
+        }
+        self.last = record
+
+        if self.echo:
+            if sample is None:
+                print("Clock sync: pad does not report its clock, time sent")
+            else:
+                line = f"Clock sync: pad {sample.offset_ms:+.0f} ms (rtt {sample.rtt_ms:.1f} ms)"
+                if corrected:
+                    line += f", corrected to {record['residual_ms']:+.0f} ms" if residual else ", corrected"
+                if self.drift_ppm is not None:
+                    line += f", drift {self.drift_ppm:+.1f} ppm"
+                print(line)
+
+        if self.log_path:
+            try:
+                with open(self.log_path, "a") as file:
+                    file.write(json.dumps(record) + "\n")
+            except OSError as e:
+                print(f"Clock sync log error: {e}")
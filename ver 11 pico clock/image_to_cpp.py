@@ -1,5 +1,29 @@
-from PIL import Image
+from PIL import Image, ImageOps
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import argparse
+import hashlib
 import io
+import os
+import struct
+import time
+
+OLED_WIDTH = 128
+OLED_HEIGHT = 64
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".gif")
+CACHE_DIR = ".asset_cache"
+CACHE_VERSION = 1  # bump when the conversion changes so cached assets get rebuilt
+BUNDLE_MAGIC = b"OLED"
+BUNDLE_MAX = 255  # asset count, name bytes, width and height are u8 in the bundle
+POOL_MIN_IMAGES = 8  # smaller sets convert faster inline than a process pool starts
+
+# 4x4 Bayer matrix, normalised to thresholds in 0..255
+BAYER_4X4 = (np.array([[0, 8, 2, 10],
+                       [12, 4, 14, 6],
+                       [3, 11, 1, 9],
+                       [15, 7, 13, 5]], dtype=np.float32) + 0.5) * 16
+
+HEX_BYTES = [f"0x{byte:02X}" for byte in range(256)]
 
 
 def jpeg_to_cpp_array(image_path, array_name="image_data"):
@@ -33,19 +57,205 @@ def jpeg_to_cpp_array(image_path, array_name="image_data"):
     return "\n".join(cpp_code)
 
 
-# Example usage
-if __name__ == "__main__":
-    # Path to the JPEG image
-    image_path = 'no media.jpg'
+def load_monochrome(image_path, width=OLED_WIDTH, height=OLED_HEIGHT, dither=True, threshold=128):
+    """Fit an image into width x height (black borders) and return a bool array, True = lit."""
+    with Image.open(image_path) as img:
+        img = ImageOps.pad(img.convert("L"), (width, height), color=0)
+
+    pixels = np.asarray(img, dtype=np.float32)
+    if not dither:
+        return pixels >= threshold
+
+    # Ordered dither is a single vectorized comparison, unlike error diffusion
+    bayer = np.tile(BAYER_4X4, (height // 4 + 1, width // 4 + 1))[:height, :width]
+    return pixels + (128 - threshold) >= bayer
+
+
+def pack_pages(pixels):
+    """SSD1306 GDDRAM order: one byte per column of each 8 row page, LSB = top row."""
+    height, width = pixels.shape
+    if height % 8:
+        raise ValueError(f"Height must be a multiple of 8, got {height}")
+
+    pages = pixels.reshape(height // 8, 8, width)
+    return np.packbits(pages, axis=1, bitorder="little").tobytes()
+
+
+def unpack_pages(data, width, height):
+    pages = np.frombuffer(data, dtype=np.uint8).reshape(height // 8, 1, width)
+    return np.unpackbits(pages, axis=1, bitorder="little").reshape(height, width).astype(bool)
+
+
+def cpp_header(name, width, height, data):
+    """C header with the page packed bytes, ready for an SSD1306 framebuffer copy."""
+    cpp_code = [f"// {width}x{height}, SSD1306 page order, total size: {len(data)} bytes",
+                f"#define {name.upper()}_WIDTH {width}",
+                f"#define {name.upper()}_HEIGHT {height}",
+                f"const uint8_t {name}[] PROGMEM = {{"]
+
+    for i in range(0, len(data), 16):
+        cpp_code.append("    " + ", ".join(HEX_BYTES[byte] for byte in data[i:i + 16]) + ",")
+
+    cpp_code[-1] = cpp_code[-1].rstrip(",")
+    cpp_code.append("};")
+    return "\n".join(cpp_code) + "\n"
+
+
+def save_bmp(path, pixels):
+    """1 bit BMP, loadable with displayio.OnDiskBitmap / adafruit_imageload."""
+    Image.fromarray(pixels).convert("1").save(path, format="BMP")
+
+
+def save_bundle(path, assets):
+    """All assets in one file: header, index, then the page packed data.
+
+    "OLED" u8 version u8 count, then per asset: u8 name length, name,
+    u8 width, u8 height, u32 offset, u32 size (little endian).
+    """
+    index = bytearray(BUNDLE_MAGIC + struct.pack("<BB", CACHE_VERSION, len(assets)))
+    entries = []
+    for name, width, height, data in assets:
+        encoded = name.encode()
+        entries.append(struct.pack("<B", len(encoded)) + encoded + struct.pack("<BB", width, height))
+
+    offset = len(index) + sum(len(entry) + 8 for entry in entries)
+    for entry, (_, _, _, data) in zip(entries, assets):
+        index += entry + struct.pack("<II", offset, len(data))
+        offset += len(data)
 
-    # Convert the image to a C++ byte array
-    cpp_data = jpeg_to_cpp_array(image_path, array_name="brightness_menu")
+    with open(path, "wb") as f:
+        f.write(index)
+        for _, _, _, data in assets:
+            f.write(data)
 
-    # Save the output to a header file
-    with open('image_data.h', 'w') as f:
-        f.write(cpp_data)
-        print("Generated image_data.h")
 
-    # Print preview of the output
-    print("\nPreview:")
-    print("\n".join(cpp_data.split("\n")[:10]))
+def asset_hash(image_path, width, height, dither, threshold):
+    digest = hashlib.sha1()
+    with open(image_path, "rb") as f:
+        digest.update(f.read())
+    digest.update(repr((CACHE_VERSION, width, height, dither, threshold)).encode())
+    return digest.hexdigest()
+
+
+def convert_asset(image_path, width, height, dither, threshold):
+    """Worker: decode, dither and page pack one image."""
+    return pack_pages(load_monochrome(image_path, width, height, dither, threshold))
+
+
+def find_images(paths):
+    images = []
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    images.append(os.path.join(path, name))
+        else:
+            images.append(path)
+    return images
+
+
+def asset_name(image_path):
+    """C identifier for image_path: its file name without extension, e.g. "1.png" -> "img_1"."""
+    stem = os.path.splitext(os.path.basename(image_path))[0]
+    name = "".join(char if char.isascii() and char.isalnum() else "_" for char in stem).lower()
+    return "img_" + name if name[:1].isdigit() else name
+
+
+def check_assets(images, formats, width, height):
+    """Raise ValueError before any conversion if the outputs would clash or not fit."""
+    seen = {}
+    for image_path in images:
+        name = asset_name(image_path)
+        if not name:
+            raise ValueError(f"{image_path} has no name to use for its asset")
+        if name in seen:
+            raise ValueError(f"{seen[name]} and {image_path} would both be written as asset {name!r}")
+        seen[name] = image_path
+
+    if "bundle" in formats:
+        if len(images) > BUNDLE_MAX:
+            raise ValueError(f"A bundle holds at most {BUNDLE_MAX} assets, got {len(images)}")
+        if width > BUNDLE_MAX or height > BUNDLE_MAX:
+            raise ValueError(f"Bundle assets must be at most {BUNDLE_MAX}x{BUNDLE_MAX}, got {width}x{height}")
+        for name in seen:
+            if len(name.encode()) > BUNDLE_MAX:
+                raise ValueError(f"Asset name {name[:32]!r}... is longer than {BUNDLE_MAX} bytes")
+
+
+def build_assets(paths, out_dir, formats=("header",), width=OLED_WIDTH, height=OLED_HEIGHT,
+                 dither=True, threshold=128, jobs=None):
+    """Convert every image under paths, reusing cached conversions of unchanged files.
+
+    Returns (converted, cached) counts.
+    """
+    images = find_images(paths)
+    check_assets(images, formats, width, height)
+    cache_dir = os.path.join(out_dir, CACHE_DIR)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    assets = {}
+    todo = []
+    for image_path in images:
+        key = asset_hash(image_path, width, height, dither, threshold)
+        cache_path = os.path.join(cache_dir, f"{key}.bin")
+        try:
+            with open(cache_path, "rb") as f:
+                assets[image_path] = f.read()
+        except OSError:
+            todo.append((image_path, cache_path))
+
+    args = [(image_path, width, height, dither, threshold) for image_path, _ in todo]
+    if len(todo) >= POOL_MIN_IMAGES and jobs != 1:
+        with ProcessPoolExecutor(max_workers=jobs) as pool:
+            results = list(pool.map(convert_asset, *zip(*args)))
+    else:
+        results = [convert_asset(*arg) for arg in args]
+
+    for (image_path, cache_path), data in zip(todo, results):
+        assets[image_path] = data
+        with open(cache_path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(cache_path + ".tmp", cache_path)
+
+    bundle = []
+    for image_path in images:
+        name = asset_name(image_path)
+        data = assets[image_path]
+        base = os.path.join(out_dir, name)
+
+        if "header" in formats:
+            with open(f"{base}.h", "w") as f:
+                f.write(cpp_header(name, width, height, data))
+        if "raw" in formats:
+            with open(f"{base}.bin", "wb") as f:
+                f.write(data)
+        if "bmp" in formats:
+            save_bmp(f"{base}.bmp", unpack_pages(data, width, height))
+        bundle.append((name, width, height, data))
+
+    if "bundle" in formats:
+        save_bundle(os.path.join(out_dir, "assets.bin"), bundle)
+
+    return len(todo), len(images) - len(todo)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert images into SSD1306 ready assets.")
+    parser.add_argument("paths", nargs="*", default=["no media.jpg"], help="image files or directories")
+    parser.add_argument("-o", "--out", default="assets", help="output directory")
+    parser.add_argument("-f", "--format", nargs="+", default=["header"],
+                        choices=["header", "bmp", "raw", "bundle"], help="outputs to write")
+    parser.add_argument("--width", type=int, default=OLED_WIDTH)
+    parser.add_argument("--height", type=int, default=OLED_HEIGHT)
+    parser.add_argument("--threshold", type=int, default=128, help="0..255, higher = darker")
+    parser.add_argument("--no-dither", action="store_true", help="plain threshold instead of ordered dither")
+    parser.add_argument("-j", "--jobs", type=int, default=None, help="worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    try:
+        converted, cached = build_assets(args.paths, args.out, args.format, args.width, args.height,
+                                         not args.no_dither, args.threshold, args.jobs)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"{converted} converted, {cached} cached in {time.perf_counter() - start:.3f} s -> {args.out}")
@@ -0,0 +1,188 @@
+import asyncio
+import json
+import struct
+import time
+from collections import namedtuple
+
+import pyserial
+import serial_protocol
+
+# Mirrors TASK_* / STATS_* in the pad firmware (see LoopStats in pico_test.py)
+TASK_NAMES = ("scan", "encoders", "serial", "display")
+FIRST_BUCKET_US = 128  # bucket i counts passes under 128 << i us, the last one the rest
+
+STATS_HEADER = struct.Struct("<IIIHBB")  # window_ms, mem_free, mem_alloc, gc_runs, tasks, buckets
+TASK_HEADER = struct.Struct("<III")  # passes, max_us, mean_us, then buckets x u32
+HID_COUNTERS = struct.Struct("<IIH")  # reports, merged, dropped; optional trailer
+
+TaskStats = namedtuple("TaskStats", ["name", "passes", "max_us", "mean_us", "histogram"])
+HidStats = namedtuple("HidStats", ["reports", "merged", "dropped"])
+LoopStats = namedtuple("LoopStats", ["window_ms", "mem_free", "mem_alloc", "gc_runs", "tasks", "hid"])
+
+
+def task_name(index):
+    return TASK_NAMES[index] if index < len(TASK_NAMES) else f"task{index}"
+
+
+def decode_stats(frame):
+    """LoopStats from a STATS frame (binary) or "STATS|..." line (ASCII), else None."""
+    try:
+        if frame.type == serial_protocol.FRAME_STATS:
+            return _decode_binary(frame.data)
+        if frame.type == serial_protocol.FRAME_TEXT and frame.data.startswith("STATS|"):
+            return _decode_ascii(frame.data)
+    except (ValueError, struct.error):
+        pass
+    return None
+
+
+def _decode_binary(payload):
+    window_ms, mem_free, mem_alloc, gc_runs, task_count, buckets = STATS_HEADER.unpack_from(payload)
+    histogram = struct.Struct(f"<{buckets}I")
+
+    tasks = []
+    offset = STATS_HEADER.size
+    for index in range(task_count):
+        passes, max_us, mean_us = TASK_HEADER.unpack_from(payload, offset)
+        offset += TASK_HEADER.size
+        tasks.append(TaskStats(task_name(index), passes, max_us, mean_us,
+                               list(histogram.unpack_from(payload, offset))))
+        offset += histogram.size
+
+    hid = None
+    if len(payload) >= offset + HID_COUNTERS.size:
+        hid = HidStats(*HID_COUNTERS.unpack_from(payload, offset))
+
+    return LoopStats(window_ms, mem_free, mem_alloc, gc_runs, tasks, hid)
+
+
+def _decode_ascii(line):
+    fields = line.split("|")[1:]
+    window_ms, mem_free, mem_alloc, gc_runs = (int(field) for field in fields[:4])
+
+    tasks = []
+    hid = None
+    for field in fields[4:]:
+        if field.startswith("HID:"):
+            hid = HidStats(*(int(value) for value in field[4:].split(",")))
+            continue
+        values = [int(value) for value in field.split(",")]
+        tasks.append(TaskStats(task_name(len(tasks)), values[0], values[1], values[2], values[3:]))
+
+    return LoopStats(window_ms, mem_free, mem_alloc, gc_runs, tasks, hid)
+
+
+def bucket_limit_us(index, buckets):
+    """Upper bound of a bucket in microseconds, None for the open ended last one."""
+    return None if index == buckets - 1 else FIRST_BUCKET_US << index
+
+
+def percentile_us(task, fraction):
+    """Upper bucket bound below which `fraction` of the passes fell (max_us for the last bucket)."""
+    if not task.passes:
+        return 0
+
+    wanted = fraction * sum(task.histogram)
+    seen = 0
+    for index, count in enumerate(task.histogram):
+        seen += count
+        if seen >= wanted:
+            return bucket_limit_us(index, len(task.histogram)) or task.max_us
+    return task.max_us
+
+
+def rate_hz(stats, task):
+    return task.passes * 1000 / stats.window_ms if stats.window_ms else 0.0
+
+
+def as_dict(stats):
+    return {
+        "window_ms": stats.window_ms,
+        "mem_free": stats.mem_free,
+        "mem_alloc": stats.mem_alloc,
+        "gc_runs": stats.gc_runs,
+        "tasks": {
+            task.name: {
+                "passes": task.passes,
+                "rate_hz": round(rate_hz(stats, task), 2),
+                "mean_us": task.mean_us,
+                "p95_us": percentile_us(task, 0.95),
+                "max_us": task.max_us,
+                "histogram": task.histogram,
+            }
+            for task in stats.tasks
+        },
+        "hid": stats.hid._asdict() if stats.hid else None,
+    }
+
+
+def format_stats(stats):
+    lines = [f"window {stats.window_ms / 1000:.1f} s, heap {stats.mem_alloc} used / {stats.mem_free} free, "
+             f"{stats.gc_runs} GC runs"]
+    for task in stats.tasks:
+        lines.append(f"  {task.name:<9} {rate_hz(stats, task):8.1f}/s  mean {task.mean_us / 1000:7.2f} ms  "
+                     f"p95 <{percentile_us(task, 0.95) / 1000:7.2f} ms  max {task.max_us / 1000:8.2f} ms")
+    if stats.hid:
+        lines.append(f"  HID: {stats.hid.reports} reports, {stats.hid.merged} repeats merged, "
+                     f"{stats.hid.dropped} dropped")
+    return "\n".join(lines)
+
+
+class StatsMonitor:
+    """Polls the pad with STATS|RESET, so every report covers one interval.
+
+    Reports are printed and, with log_path, appended to a JSON lines file.
+    """
+
+    def __init__(self, serial_obj, interval=10.0, log_path=None, echo=True):
+        self.serial_obj = serial_obj
+        self.interval = interval
+        self.log_path = log_path
+        self.echo = echo
+        self.last = None
+        self.reports = 0
+        serial_obj.subscribe(self._on_frame)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            if self.serial_obj.connected:
+                self.serial_obj.send("STATS|RESET\n", priority=pyserial.PRIORITY_BULK, key="STATS")
+
+    def _on_frame(self, frame):
+        stats = decode_stats(frame)
+        if stats is None:
+            return
+
+        self.last = stats
+        self.reports += 1
+        if self.echo:
+            print(format_stats(stats))
+
+        if self.log_path:
+            record = {"time": time.time(), **as_dict(stats)}
+            try:
+                with open(self.log_path, "a") as file:
+                    file.write(json.dumps(record) + "\n")
+            except OSError as e:
+                print(f"Loop stats log error: {e}")
+
+
+# Summarises a log written by StatsMonitor
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) != 2:
+        print("usage: python loop_stats.py loop_stats.jsonl")
+        sys.exit(1)
+
+    with open(sys.argv[1]) as file:
+        for line in file:
+            record = json.loads(line)
+            print(time.strftime("%H:%M:%S", time.localtime(record["time"])), end=" ")
+            print(format_stats(LoopStats(record["window_ms"], record["mem_free"], record["mem_alloc"],
+                                         record["gc_runs"],
+                                         [TaskStats(name, task["passes"], task["max_us"], task["mean_us"],
+                                                    task["histogram"])
+                                          for name, task in record["tasks"].items()],
+                                         HidStats(**record["hid"]) if record.get("hid") else None)))
@@ -1,12 +1,17 @@
 import pyserial
 import media_session
 import volume_potentiometer
-import time
+import volume_actuator
+import thumbnail
+import loop_stats
+import clock_sync
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from numpy import interp
 import yaml
 
 
-def process_received_data(data, volume_obj, no_of_sliders, slider_functions):
+def process_received_data(data, actuator, no_of_sliders, slider_functions, received_at=None):
     if data is None or len(data) != no_of_sliders:
         return
 
@@ -14,8 +19,8 @@ def process_received_data(data, volume_obj, no_of_sliders, slider_functions):
         try:
             # print(data)
             vol_lvl = map_potentiometer_value(data[i])
-            volume_obj.set_volume(name=slider_functions[i], value=vol_lvl)
-            # time.sleep(0.5)
+            # The actuator skips unchanged levels and coalesces bursts per slider
+            actuator.submit(slider_functions[i], vol_lvl, received_at)
         except Exception as e:
             print(f"Cannot set volume error: {e}")
 
@@ -24,42 +29,108 @@ def map_potentiometer_value(value):
     return int(interp(int(value), [5, 4090], [0, 100]))
 
 
-def main():
-    try:
-        with open('config.yaml', 'r') as file:
-            file_service = yaml.safe_load(file)
-            slider_functions = file_service['slider_functions']
+async def process_sliders(serial_obj, actuator, no_of_sliders, slider_functions):
+    while True:
+        # Wakes up only when the pad sends a new slider frame, no polling
+        received_at, data = await serial_obj.get_sliders()
+        process_received_data(data=data, actuator=actuator, no_of_sliders=no_of_sliders,
+                              slider_functions=slider_functions, received_at=received_at)
 
-            no_of_sliders = len(slider_functions)
 
-    except Exception as e:
-        print(f"Error reading config.yaml: {e}")
-        return
+async def run_host(slider_functions, serial_protocol, max_volume_writes, serial_port=None, album_art=None,
+                   stats=None, clock=None):
+    """Everything the host does runs as tasks on this one event loop."""
+    loop = asyncio.get_running_loop()
+    no_of_sliders = len(slider_functions)
 
-    serial_obj = pyserial.SerialConnection(no_of_sliders)
-    time.sleep(1)
     volume_obj = volume_potentiometer.VolumeControl()
-    time.sleep(1)
 
-    # Pass serial_obj to Media class for direct image sending
-    media_obj = media_session.Media(serial_obj=serial_obj)
-    time.sleep(1)
+    # Blocking backends are isolated in small, bounded executors:
+    # every COM call happens on the single audio thread, serial open/write
+    # (and reads where there is no fd reader) on the serial threads.
+    audio_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="audio",
+                                        initializer=volume_obj.init_worker_thread)
+    serial_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="serial")
+    # Decoding and dithering album art must never delay serial or volume work
+    image_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="image")
+
+    serial_obj = pyserial.SerialConnection(no_of_sliders, protocol=serial_protocol,
+                                           port=serial_port, executor=serial_executor)
+    await loop.run_in_executor(audio_executor, volume_obj.initialise)
+    actuator = volume_actuator.VolumeActuator(volume_obj, audio_executor,
+                                              min_interval=1 / max_volume_writes)
+    volume_obj.sessions.subscribe(actuator.sessions_changed)
+
+    thumbnails = None
+    if album_art is not None:
+        cache = thumbnail.ThumbnailCache(album_art.get('cache_bytes', 256 * 1024), album_art.get('cache_dir'))
+        thumbnails = thumbnail.ThumbnailPipeline(serial_obj, image_executor, cache,
+                                                 album_art.get('size', thumbnail.THUMB_SIZE))
 
+    # Pass serial_obj to Media class for direct image sending
+    media_obj = media_session.Media(serial_obj=serial_obj, thumbnails=thumbnails)
+
+    tasks = [
+        asyncio.create_task(serial_obj.run(), name="serial"),
+        asyncio.create_task(volume_obj.run(audio_executor), name="audio sessions"),
+        asyncio.create_task(actuator.run(), name="volume actuator"),
+        asyncio.create_task(media_obj.run(), name="media"),
+        asyncio.create_task(process_sliders(serial_obj, actuator, no_of_sliders, slider_functions),
+                            name="sliders"),
+    ]
+    if stats is not None:
+        monitor = loop_stats.StatsMonitor(serial_obj, stats.get('interval', 10), stats.get('log'))
+        tasks.append(asyncio.create_task(monitor.run(), name="loop stats"))
+    if clock is not False:
+        clock = clock or {}
+        syncer = clock_sync.ClockSync(serial_obj, clock.get('interval', 600), clock.get('threshold_ms', 20),
+                                      clock.get('log'))
+        tasks.append(asyncio.create_task(syncer.run(), name="clock sync"))
     print("Everything Initialised")
 
     try:
-        while True:
-            process_received_data(data=serial_obj.data, volume_obj=volume_obj,
-                                  no_of_sliders=no_of_sliders, slider_functions=slider_functions)
-
-            time.sleep(0.01)
+        # Nothing returns on its own, so the first finished task means a failure
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()
 
     except Exception as e:
         print(f"Exception occurred, stopping: {e}")
 
     finally:
-        media_obj.stop()
-        serial_obj.stop()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+        audio_executor.shutdown(wait=False, cancel_futures=True)
+        serial_executor.shutdown(wait=False, cancel_futures=True)
+        image_executor.shutdown(wait=False, cancel_futures=True)
+
+        print(f"Volume writes: {actuator.stats()}")
+        print(f"Serial writes: {serial_obj.writer_stats()}")
+
+
+def main():
+    try:
+        with open('config.yaml', 'r') as file:
+            file_service = yaml.safe_load(file)
+            slider_functions = file_service['slider_functions']
+            serial_protocol = file_service.get('serial_protocol', 'binary')
+            serial_port = file_service.get('serial_port')
+            max_volume_writes = file_service.get('max_volume_writes_per_sec', 50)
+            album_art = file_service.get('album_art')
+            stats = file_service.get('loop_stats')
+            clock = file_service.get('clock_sync')
+
+    except Exception as e:
+        print(f"Error reading config.yaml: {e}")
+        return
+
+    try:
+        asyncio.run(run_host(slider_functions, serial_protocol, max_volume_writes, serial_port, album_art,
+                             stats, clock))
+    except KeyboardInterrupt:
+        pass
 
 
 if __name__ == "__main__":
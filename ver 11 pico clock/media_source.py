@@ -0,0 +1,215 @@
+import asyncio
+import time
+from collections import namedtuple
+
+# thumbnail is the provider's handle to the art (read it with read_thumbnail(state)),
+# so art that arrives after the title is a state change of its own
+MediaState = namedtuple("MediaState", ["title", "artist", "playback_status", "thumbnail"], defaults=(None,))
+NO_MEDIA = MediaState(None, None, None)
+
+
+class MediaSource:
+    """Push based "now playing" information.
+
+    Providers call _publish() whenever they learn something; subscribers are
+    called on the event loop only after the state settled for `debounce`
+    seconds and actually differs from the last emitted one.
+    """
+
+    def __init__(self, debounce=0.05):
+        self.debounce = debounce
+        self.state = NO_MEDIA
+        self.loop = None
+
+        self._subscribers = []
+        self._pending = None
+        self._flush_handle = None
+
+        # Statistics
+        self.published = 0
+        self.emitted = 0
+        self.last_emit_latency = 0.0
+        self._first_published_at = None
+
+    def subscribe(self, callback):
+        """Call callback(state) on the event loop for every change."""
+        self._subscribers.append(callback)
+
+    async def run(self):
+        """Produce updates until cancelled."""
+        raise NotImplementedError
+
+    async def read_thumbnail(self, state):
+        """Encoded image bytes of state's art, or None."""
+        return None
+
+    def _publish(self, state):
+        """Record a possibly new state; call from the event loop."""
+        self.published += 1
+        self._pending = state
+        if self._first_published_at is None:
+            self._first_published_at = time.perf_counter()
+
+        if self._flush_handle is None:
+            self._flush_handle = self.loop.call_later(self.debounce, self._flush)
+
+    def _flush(self):
+        self._flush_handle = None
+        state, self._pending = self._pending, None
+        first_published_at, self._first_published_at = self._first_published_at, None
+
+        if state is None or state == self.state:
+            return
+
+        self.state = state
+        self.emitted += 1
+        self.last_emit_latency = time.perf_counter() - first_published_at
+
+        for callback in self._subscribers:
+            try:
+                callback(state)
+            except Exception as e:
+                print(f"Media subscriber error: {e}")
+
+
+class WinRTMediaSource(MediaSource):
+    """Windows Global System Media Transport Controls, driven by its change events.
+
+    The session manager is requested once and cached. WinRT raises its events
+    on its own threads, they only wake the loop, which then reads the current
+    session once per burst of events.
+    """
+
+    def __init__(self, debounce=0.05):
+        super().__init__(debounce)
+        self.manager = None
+        self.session = None
+        self._session_tokens = None
+        self._changed = None
+
+    async def run(self):
+        from winrt.windows.media.control import \
+            GlobalSystemMediaTransportControlsSessionManager as MediaManager
+
+        self.loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+
+        self.manager = await MediaManager.request_async()
+        manager_token = self.manager.add_current_session_changed(self._on_winrt_event)
+
+        try:
+            self._changed.set()  # read the initial state
+            while True:
+                await self._changed.wait()
+                self._changed.clear()
+                try:
+                    await self._refresh()
+                except Exception as e:
+                    print(f"Error managing media session: {e}")
+                    self._publish(NO_MEDIA)
+        finally:
+            self._watch_session(None)
+            self.manager.remove_current_session_changed(manager_token)
+
+    def _on_winrt_event(self, sender, args):
+        # Called on a WinRT thread
+        self.loop.call_soon_threadsafe(self._changed.set)
+
+    def _watch_session(self, session):
+        if self.session is not None and self._session_tokens:
+            properties_token, playback_token = self._session_tokens
+            try:
+                self.session.remove_media_properties_changed(properties_token)
+                self.session.remove_playback_info_changed(playback_token)
+            except Exception as e:
+                print(f"Error unsubscribing media session: {e}")
+
+        self.session = session
+        self._session_tokens = None
+        if session is not None:
+            self._session_tokens = (
+                session.add_media_properties_changed(self._on_winrt_event),
+                session.add_playback_info_changed(self._on_winrt_event),
+            )
+
+    async def _refresh(self):
+        session = self.manager.get_current_session()
+        if session is None:
+            self._watch_session(None)
+            self._publish(NO_MEDIA)
+            return
+
+        if self.session is None or session.source_app_user_model_id != self.session.source_app_user_model_id:
+            self._watch_session(session)
+
+        media_properties = await session.try_get_media_properties_async()
+        playback_info = session.get_playback_info()
+        status = playback_info.playback_status if playback_info else None
+
+        # GSMTC often reports a new title before its thumbnail, the reference
+        # travels with the state so the art is read from the one it belongs to
+        self._publish(MediaState(media_properties.title, media_properties.artist,
+                                 getattr(status, "name", status), media_properties.thumbnail))
+
+    async def read_thumbnail(self, state, chunk_size=64 * 1024, max_size=5 * 1024 * 1024):
+        """Stream the thumbnail in chunks instead of one huge preallocated buffer."""
+        from winrt.windows.storage.streams import DataReader, Buffer, InputStreamOptions
+
+        if state.thumbnail is None:
+            return None
+
+        readable_stream = await state.thumbnail.open_read_async()
+        try:
+            data = bytearray()
+            buffer = Buffer(chunk_size)
+            while len(data) < max_size:
+                # The filled buffer is the result, which need not be the one passed in
+                result = await readable_stream.read_async(buffer, buffer.capacity, InputStreamOptions.READ_AHEAD)
+                if result.length == 0:
+                    break
+                data += bytes(DataReader.from_buffer(result).read_bytes(result.length))
+            return bytes(data)
+        finally:
+            readable_stream.close()
+
+
+class ScriptedMediaSource(MediaSource):
+    """Replays a list of (delay seconds, MediaState or None) steps, for tests and benchmarks."""
+
+    def __init__(self, steps=(), debounce=0.05, thumbnails=None):
+        super().__init__(debounce)
+        self.steps = list(steps)
+        self.thumbnails = thumbnails or {}  # title -> encoded image bytes
+
+    async def run(self):
+        self.loop = asyncio.get_running_loop()
+        for delay, state in self.steps:
+            await asyncio.sleep(delay)
+            self._publish(state or NO_MEDIA)
+
+        await asyncio.Event().wait()  # stay alive like a real provider
+
+    async def read_thumbnail(self, state):
+        return self.thumbnails.get(state.thumbnail or state.title)
+
+    def push(self, state):
+        """Publish a state right now (loop must be running)."""
+        self._publish(state or NO_MEDIA)
+
+
+# Replays a burst-y script and reports what reached subscribers
+if __name__ == "__main__":
+    track_a = MediaState("Song A", "Artist", "PLAYING")
+    track_b = MediaState("Song B", "Artist", "PLAYING")
+    script = [(0.1, track_a), (0.0, track_a), (0.01, track_a._replace(playback_status="PAUSED")),
+              (0.2, track_b), (0.0, track_b), (0.0, track_b), (0.2, None)]
+
+    async def demo():
+        source = ScriptedMediaSource(script)
+        source.subscribe(lambda state: print(f"emit after {source.last_emit_latency * 1000:5.1f} ms: {state}"))
+        task = asyncio.create_task(source.run())
+        await asyncio.sleep(1)
+        task.cancel()
+        print(f"published {source.published}, emitted {source.emitted}")
+
+    asyncio.run(demo())
@@ -1,12 +1,166 @@
 import time
+import asyncio
+import heapq
+import itertools
+import os
+import queue
 import serial
-import serial.tools.list_ports_windows
+import serial.tools.list_ports
 import logging
 import threading
+from concurrent.futures import Future
 from datetime import datetime
+import serial_protocol
+
+# Write priorities, lower is sent first
+PRIORITY_CONTROL = 0
+PRIORITY_CLOCK = 1
+PRIORITY_TITLE = 2
+PRIORITY_BULK = 3
+
+PRIORITY_NAMES = {
+    PRIORITY_CONTROL: "control",
+    PRIORITY_CLOCK: "clock",
+    PRIORITY_TITLE: "title",
+    PRIORITY_BULK: "bulk",
+}
+
+
+class OutgoingMessage:
+    def __init__(self, data, priority, key):
+        self.data = data
+        self.priority = priority
+        self.key = key
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+        self.queued = False
+
+
+class OutgoingQueue:
+    """Bounded priority queue of pending writes.
+
+    Messages sharing a key supersede each other: only the newest one is kept
+    and the older future is cancelled. When full, a new message evicts the
+    newest message of a strictly lower priority, otherwise it is refused.
+    Superseded and evicted entries stay in the heap until popped, or until
+    they outnumber the live ones and the heap is rebuilt without them.
+    Not thread safe by itself, the owner provides the locking.
+    """
+
+    def __init__(self, maxsize=64):
+        self.maxsize = maxsize
+        self._heap = []
+        self._by_key = {}
+        self._live = 0
+        self._order = itertools.count()
+
+        self.max_depth = 0
+        self.superseded = 0
+        self.evicted = 0
+
+    def __len__(self):
+        return self._live
+
+    def push(self, message):
+        """Queue message, raises queue.Full if there is no room for it."""
+        previous = self._by_key.get(message.key) if message.key is not None else None
+        if previous is not None:
+            self._discard(previous)
+            previous.future.cancel()
+            self.superseded += 1
+
+        if self._live >= self.maxsize:
+            victim = self._lowest_priority()
+            if victim is None or victim.priority <= message.priority:
+                raise queue.Full("serial write queue is full")
+            self._discard(victim)
+            victim.future.set_exception(queue.Full("evicted by a higher priority message"))
+            self.evicted += 1
+
+        heapq.heappush(self._heap, (message.priority, next(self._order), message))
+        message.queued = True
+        if message.key is not None:
+            self._by_key[message.key] = message
+        self._live += 1
+        self.max_depth = max(self.max_depth, self._live)
+        if len(self._heap) > 2 * self._live:
+            self._compact()
+
+    def pop(self):
+        """Return the most urgent message, or None if the queue is empty."""
+        while self._heap:
+            _, _, message = heapq.heappop(self._heap)
+            if not message.queued:
+                continue  # superseded or evicted, already accounted for
+
+            self._discard(message)
+            if message.future.cancelled():
+                continue  # cancelled by the caller
+            return message
+        return None
+
+    def drain(self):
+        """Remove and return every pending message."""
+        messages = []
+        message = self.pop()
+        while message is not None:
+            messages.append(message)
+            message = self.pop()
+        return messages
+
+    def _discard(self, message):
+        message.queued = False
+        if message.key is not None and self._by_key.get(message.key) is message:
+            del self._by_key[message.key]
+        self._live -= 1
+
+    def _compact(self):
+        # Keeps the heap and the _lowest_priority scan proportional to the live messages
+        self._heap = [entry for entry in self._heap if entry[2].queued]
+        heapq.heapify(self._heap)
+
+    def _lowest_priority(self):
+        victim = None
+        for priority, order, message in self._heap:
+            if not message.queued:
+                continue
+            if victim is None or (priority, order) > (victim[0], victim[1]):
+                victim = (priority, order, message)
+        return victim[2] if victim else None
+
+
+class WriteLatencyStats:
+    """Enqueue-to-written latency per priority class, in seconds."""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+
+    def add(self, latency):
+        self.count += 1
+        self.total += latency
+        self.max = max(self.max, latency)
+        self.last = latency
+
+    def as_dict(self):
+        mean = self.total / self.count if self.count else 0.0
+        return {"count": self.count, "mean_ms": mean * 1000, "max_ms": self.max * 1000,
+                "last_ms": self.last * 1000}
+
 
 class SerialConnection:
-    def __init__(self, no_of_sliders):
+    """Serial link to the pad, driven entirely by the asyncio loop that runs run().
+
+    On POSIX the port's file descriptor is registered with loop.add_reader(), so
+    bytes are decoded as soon as they arrive without any thread. Elsewhere a
+    blocking read runs in the supplied executor. Writes go through send() and a
+    single writer task; send() may be called from any thread.
+    """
+
+    def __init__(self, no_of_sliders, protocol=serial_protocol.MODE_BINARY, write_queue_size=64,
+                 port=None, executor=None):
 
         # Configure logging
         logging.basicConfig(
@@ -16,232 +170,289 @@ class SerialConnection:
         self.logger = logging.getLogger(__name__)
 
         # Serial connection parameters
-        self.COM_PORT = None
+        self.configured_port = port  # None means auto detect on every connect
+        self.COM_PORT = None  # port of the current connection
         self.BAUD_RATE = 115200
+        self.READ_TIMEOUT = 0.5  # blocking reads (non POSIX) wait at most this long
+        self.PING_INTERVAL = 5
         self.ser = None
         self.data = []
         self.connected = False
+        self.sessions = 0  # successful connections so far
         self.no_of_sliders = no_of_sliders
-        self.serial_lock = False
-
-        # Synchronization events and queues
-        self.connection_event = threading.Event()
-        self.stop_event = threading.Event()
-
-        # Existing threads (connection and read threads)
-        self.serial_connection_thread = threading.Thread(
-            target=self._start_and_check_conn_thread,
-            daemon=True
-        )
-        self.serial_read_thread = threading.Thread(
-            target=self._read_data_thread,
-            daemon=True
-        )
-
-        # Start all threads
-        self.serial_connection_thread.start()
-        self.serial_read_thread.start()
-
-    def _start_and_check_conn_thread(self):
-        """Continuously manage serial connection."""
-        while not self.stop_event.is_set():
-            try:
-                if not self.connected:
-                    self._start_connection()
-                else:
-                    self._check_connection()
-
-            except Exception as e:
-                self.logger.error(f"Connection management error: {e}")
-                self.connected = False
-
-            time.sleep(5)
+        self.decoder = serial_protocol.FrameDecoder(protocol)
+        self.executor = executor
+        self.use_fd_reader = os.name == "posix"
+
+        # Frame consumers: callbacks run on the event loop, the queue keeps only the newest sliders
+        self.frame_callbacks = []
+        self.slider_queue = None
+
+        # Outgoing messages, shared with threads calling send()
+        self.write_lock = threading.Lock()
+        self.write_queue = OutgoingQueue(write_queue_size)
+        self.write_latency = {priority: WriteLatencyStats() for priority in PRIORITY_NAMES}
+
+        self.loop = None
+        self.write_ready = None
+        self.disconnected = None
+
+    async def run(self):
+        """Keep the port open, read and write until cancelled."""
+        self.loop = asyncio.get_running_loop()
+        self.slider_queue = asyncio.Queue(maxsize=1)
+        self.write_ready = asyncio.Event()
+        self.disconnected = asyncio.Event()
+
+        writer = asyncio.create_task(self._writer_task())
+        try:
+            while True:
+                try:
+                    if await self._start_connection():
+                        await self._connected_session()
+                except Exception as e:
+                    self.logger.error(f"Connection management error: {e}")
+
+                self._close_port()
+                await asyncio.sleep(5)
+        finally:
+            writer.cancel()
+            self._close_port()
+            with self.write_lock:
+                for message in self.write_queue.drain():
+                    message.future.cancel()
 
     # noinspection PyUnresolvedReferences
-    def _start_connection(self):
-        """Find and establish connection with ESP32."""
-        while self.serial_lock:
-            print("start connection returns none, serial lock true")
-            time.sleep(1)
-
-        if self.ser and self.ser.is_open:
-            self.ser.close()
-            time.sleep(2)
-
-        self.serial_lock = True
-
-        ports = self._find_pico_port()
+    async def _start_connection(self):
+        """Find and establish connection with the pad."""
+        ports = [self.configured_port] if self.configured_port else self._find_pico_port()
         if not ports:
             self.logger.warning("No PICO ports found")
-            return
+            return False
 
         for port in ports:
             try:
-                self.ser = serial.Serial(
-                    port=port,
-                    baudrate=self.BAUD_RATE,
-                    bytesize=serial.EIGHTBITS,
-                    parity=serial.PARITY_NONE,
-                    stopbits=serial.STOPBITS_ONE,
-                    timeout=1
-                )
-                # self.ser.setRTS(False)
-                # self.ser.setDTR(False)
+                self.ser = await self.loop.run_in_executor(self.executor, self._open_port, port)
                 self.COM_PORT = port
+                self.decoder.reset()
                 self.connected = True
-                self.connection_event.set()
+                self.sessions += 1
+                self.disconnected.clear()
                 self.logger.info(f"Connected to PICO on {self.COM_PORT}")
+                return True
 
-                self.serial_lock = False
-
-                time.sleep(1)
-
-                self.send_time_to_pico()
-
-                return
             except (serial.SerialException, OSError) as e:
                 self.logger.error(f"Failed to connect to {port}: {e}")
-                self.serial_lock = False
+        return False
+
+    def _open_port(self, port):
+        return serial.Serial(
+            port=port,
+            baudrate=self.BAUD_RATE,
+            bytesize=serial.EIGHTBITS,
+            parity=serial.PARITY_NONE,
+            stopbits=serial.STOPBITS_ONE,
+            # Non blocking when the fd is watched by the loop
+            timeout=0 if self.use_fd_reader else self.READ_TIMEOUT
+        )
 
-    def _check_connection(self):
-        """Verify active serial connection."""
-        if not self.ser or not self.ser.is_open:
-            self.connected = False
-            return
+    async def _connected_session(self):
+        """Read and ping until the port goes away."""
+        reader = None
+        if self.use_fd_reader:
+            self.loop.add_reader(self.ser.fileno(), self._on_readable)
+        else:
+            reader = asyncio.create_task(self._blocking_reader_task())
 
-        while self.serial_lock:
-            print("Serial lock not acquired, check connection")
-            time.sleep(1)
+        self.write_ready.set()  # flush whatever queued up while disconnected
 
         try:
-            # Send a ping and check response
-            self.serial_lock = True
+            while self.connected:
+                # Send a ping, the pad answers with ALIVE
+                self.send("PING\n", priority=PRIORITY_CONTROL, key="PING")
+                try:
+                    await asyncio.wait_for(self.disconnected.wait(), self.PING_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            if reader:
+                reader.cancel()
+
+    def _on_readable(self):
+        """add_reader callback: drain what the OS has buffered, never blocks."""
+        try:
+            chunk = self.ser.read(self.ser.in_waiting or 1)
+        except Exception as e:
+            self.logger.error(f"Serial data reading error: {e}")
+            self._mark_disconnected()
+            return
 
-            self.ser.reset_input_buffer()
-            self.ser.write('PING\n'.encode())
+        self._handle_chunk(chunk)
 
-            self.serial_lock = False
+    async def _blocking_reader_task(self):
+        while self.connected:
+            try:
+                chunk = await self.loop.run_in_executor(self.executor, self._blocking_read)
+            except Exception as e:
+                self.logger.error(f"Serial data reading error: {e}")
+                self._mark_disconnected()
+                return
 
-        except Exception as e:
-            self.logger.error(f"Connection verification failed: {e}")
-            self.connected = False
-            self.serial_lock = False
+            self._handle_chunk(chunk)
 
+    def _blocking_read(self):
+        """Block for the next bytes (up to READ_TIMEOUT), runs in the executor."""
+        chunk = self.ser.read(self.ser.in_waiting or 1)
+        if chunk and self.ser.in_waiting:
+            chunk += self.ser.read(self.ser.in_waiting)
+        return chunk
 
-    def _read_data_thread(self):
-        """Read serial data continuously."""
-        while not self.stop_event.is_set():
-            try:
-                # Wait for connection to be established
-                self.connection_event.wait(timeout=5)
+    def _handle_chunk(self, chunk):
+        if not chunk:
+            return
 
-                if self.connected and self.ser and self.ser.is_open:
-                    data = self._read_serial_data()
-                    if data and data[0] == "ALIVE":
-                        self.connected = True
-                    elif data and len(data) == self.no_of_sliders:
-                        self.data = data
-                        ### PROCESSING RECEIVED DATA FOR BUTTONS AND SWITCHES
-                        ### IS DONE IN MAIN.PY FILE
+        errors = self.decoder.crc_errors + self.decoder.framing_errors
+        frames = self.decoder.feed(chunk)
 
-                    else:
-                        self.data = []
+        if self.decoder.crc_errors + self.decoder.framing_errors != errors:
+            self.logger.debug(
+                f"Dropped corrupt frame(s): crc={self.decoder.crc_errors}, "
+                f"framing={self.decoder.framing_errors}"
+            )
 
-                time.sleep(0.01)
+        for frame in frames:
+            self._handle_frame(frame)
 
+    def _handle_frame(self, frame):
+        if frame.type == serial_protocol.FRAME_TEXT:
+            if frame.data.startswith("ALIVE"):  # "ALIVE" or "ALIVE|<seq>|<ms>" (clock_sync.py)
+                self.connected = True
+
+        elif frame.type == serial_protocol.FRAME_SLIDERS:
+            if len(frame.data) == self.no_of_sliders:
+                self.data = frame.data
+                ### PROCESSING RECEIVED DATA FOR BUTTONS AND SWITCHES
+                ### IS DONE IN MAIN.PY FILE
+                self._publish_sliders(frame.data)
+            else:
+                self.data = []
+
+        for callback in self.frame_callbacks:
+            try:
+                callback(frame)
             except Exception as e:
-                self.logger.error(f"Data reading error: {e}")
-                self.connected = False
-                time.sleep(1)
+                self.logger.error(f"Frame callback error: {e}")
 
-    def _read_serial_data(self):
-        """Read and parse serial data."""
-        try:
-            if self.ser.in_waiting:
-                raw_data = self.ser.readline()
-                data = raw_data.decode('utf-8', errors='ignore').strip()
-                data = data.split('|')
-                # print(data)
-                if data:
-                    return data
+    def _publish_sliders(self, data):
+        """Latest value wins: replace an unconsumed slider frame instead of queueing behind it."""
+        if self.slider_queue.full():
+            self.slider_queue.get_nowait()
+        self.slider_queue.put_nowait((time.perf_counter(), data))
 
-                return None
+    def subscribe(self, callback):
+        """Call callback(frame) on the event loop for every decoded frame."""
+        self.frame_callbacks.append(callback)
 
-        except Exception as e:
-            self.logger.error(f"Serial data reading error: {e}")
-        return None
+    async def get_sliders(self):
+        """Wait for the next slider frame; returns (received_at perf_counter, values)."""
+        return await self.slider_queue.get()
 
-    def stop(self):
-        """Stop all threads and close connection."""
-        self.stop_event.set()
-        self.connection_event.set()
-        self.serial_lock = False
-        # self.media_obj.stop()
-        # self.keyboard_handler.key_listener.stop()
-        if self.ser and self.ser.is_open:
-            self.ser.close()
-            time.sleep(1)
+    def _mark_disconnected(self):
+        self.connected = False
+        if self.disconnected:
+            self.disconnected.set()
 
-    def send_title_to_pico(self, title="", sub_title=""):
-        if not self.ser:
+    def _close_port(self):
+        self.connected = False
+        if self.ser is None:
             return
 
-        while self.serial_lock:
-            print("Serial lock not acquired, send title to pico")
-            time.sleep(1)
+        if self.use_fd_reader and self.loop:
+            try:
+                self.loop.remove_reader(self.ser.fileno())
+            except Exception:
+                pass  # port already gone
 
         try:
-            self.serial_lock = True
-
-            self.ser.write(f"TITLE|{title}|SUB|{sub_title}\n".encode())
-
-            self.serial_lock = False
-
+            self.ser.close()
         except Exception as e:
-            print(f"Error in sending title to pico: {e}")
-            self.serial_lock = False
+            self.logger.error(f"Error closing port: {e}")
+        self.ser = None
 
-    def send_time_to_pico(self):
+    async def _writer_task(self):
+        """Single writer: drains the priority queue onto the port."""
+        while True:
+            await self.write_ready.wait()
 
-        try :
-            while self.serial_lock:
-                print("Serial lock not acquired, sending time to pico")
-                time.sleep(1)
+            with self.write_lock:
+                message = self.write_queue.pop() if self.connected else None
+                if message is None:
+                    self.write_ready.clear()
+                    continue
 
-            self.serial_lock = True
+            if not message.future.set_running_or_notify_cancel():
+                continue
 
-            now = datetime.now()
+            try:
+                # Blocking write off the loop, the pad may be slow to drain its buffer
+                await self.loop.run_in_executor(self.executor, self.ser.write, message.data)
 
-            string = datetime.isoformat(now)
+                latency = time.perf_counter() - message.enqueued_at
+                self.write_latency[message.priority].add(latency)
+                message.future.set_result(latency)
 
-            date = string.split('T')
+            except Exception as e:
+                self.logger.error(f"Serial write failed: {e}")
+                self._mark_disconnected()
+                message.future.set_exception(e)
 
-            time_ = date[1]
-            date = date[0]
+    def send(self, data, priority=PRIORITY_BULK, key=None):
+        """Queue data for the pad without blocking; safe to call from any thread.
 
-            year = date.split('-')
-            date = year[2]
-            month = year[1]
-            year = year[0]
+        Returns a concurrent.futures.Future that resolves to the enqueue-to-write
+        latency in seconds. A newer message with the same key cancels this one.
+        """
+        if isinstance(data, str):
+            data = data.encode()
 
-            sec = time_.split(':')
-            hour = sec[0]
-            minute = sec[1]
-            sec = sec[2][:2]
+        message = OutgoingMessage(data, priority, key)
+        with self.write_lock:
+            try:
+                self.write_queue.push(message)
+            except queue.Full as e:
+                message.future.set_exception(e)
+                return message.future
+
+        if self.loop:
+            self.loop.call_soon_threadsafe(self.write_ready.set)
+        return message.future
+
+    def writer_stats(self):
+        with self.write_lock:
+            return {
+                "queue_depth": len(self.write_queue),
+                "max_queue_depth": self.write_queue.max_depth,
+                "superseded": self.write_queue.superseded,
+                "evicted": self.write_queue.evicted,
+                "latency": {PRIORITY_NAMES[priority]: stats.as_dict()
+                            for priority, stats in self.write_latency.items()},
+            }
 
-            weekday = datetime.weekday(now)
-            string = f"CLOCK|{hour}|{minute}|{sec}|{date}|{month}|{year}|{weekday}\n"
-            print("sending time")
-            self.ser.write(string.encode())
+    def send_title_to_pico(self, title="", sub_title=""):
+        # A newer title replaces one that has not been written yet
+        return self.send(f"TITLE|{title}|SUB|{sub_title}\n", priority=PRIORITY_TITLE, key="TITLE")
 
-            self.serial_lock = False
+    def send_time_to_pico(self, when=None):
+        """Set the pad's clock to when, a local datetime (default: now).
 
-        except Exception as e:
-            print(f"Exception occurred while sending time to pico: {e}")
-            self.serial_lock = False
+        Written as soon as possible, use clock_sync.ClockSync for an accurate setting.
+        """
+        when = when or datetime.now()
+        return self.send(f"CLOCK|{when:%H|%M|%S|%d|%m|%Y}|{when.weekday()}\n",
+                         priority=PRIORITY_CLOCK, key="CLOCK")
 
     @staticmethod
     def _find_pico_port():
         """Find available ESP32 USB ports."""
-        ports = serial.tools.list_ports_windows.comports()
+        ports = serial.tools.list_ports.comports()
         return [port.device for port in ports if "USB" in str(port.hwid)]
\ No newline at end of file
@@ -0,0 +1,214 @@
+import struct
+from collections import namedtuple
+
+# Wire format shared with the pad firmware (see DataLink in pico_test.py).
+#
+# Binary mode: every frame is
+#     [version u8][type u8][seq u8][length u8][payload ...][crc16 u16 LE]
+# COBS encoded and terminated by a single 0x00 byte. The CRC is CRC-16/CCITT-FALSE
+# over header + payload.
+#
+# ASCII mode: the legacy newline terminated "v1|v2|...|vn" / "ALIVE" lines.
+
+PROTOCOL_VERSION = 1
+
+MODE_BINARY = "binary"
+MODE_ASCII = "ascii"
+
+FRAME_SLIDERS = 0x01
+FRAME_TEXT = 0x02
+FRAME_STATS = 0x03  # loop timing dump, decoded by loop_stats.py
+
+FRAME_DELIMITER = 0x00
+HEADER = struct.Struct("<BBBB")
+CRC = struct.Struct("<H")
+MAX_PAYLOAD = 255
+MAX_BUFFERED = 1024
+
+Frame = namedtuple("Frame", ["type", "seq", "data"])
+
+
+def _build_crc_table():
+    table = []
+    for byte in range(256):
+        crc = byte << 8
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+        table.append(crc & 0xFFFF)
+    return table
+
+
+_CRC_TABLE = _build_crc_table()
+
+
+def crc16_ccitt(data, crc=0xFFFF):
+    """CRC-16/CCITT-FALSE, table driven."""
+    for byte in data:
+        crc = ((crc << 8) & 0xFFFF) ^ _CRC_TABLE[(crc >> 8) ^ byte]
+    return crc
+
+
+def cobs_encode(data):
+    """Encode bytes so the result contains no 0x00 (delimiter not included)."""
+    out = bytearray(b"\x00")
+    code_index = 0
+    code = 1
+    for byte in data:
+        if byte == 0:
+            out[code_index] = code
+            code_index = len(out)
+            out.append(0)
+            code = 1
+            continue
+
+        out.append(byte)
+        code += 1
+        if code == 0xFF:
+            out[code_index] = code
+            code_index = len(out)
+            out.append(0)
+            code = 1
+
+    out[code_index] = code
+    return bytes(out)
+
+
+def cobs_decode(data):
+    """Decode a COBS block (without delimiter). Raises ValueError on bad input."""
+    out = bytearray()
+    i = 0
+    length = len(data)
+    while i < length:
+        code = data[i]
+        if code == 0 or i + code > length:
+            raise ValueError("malformed COBS block")
+
+        out += data[i + 1:i + code]
+        i += code
+        if code < 0xFF and i < length:
+            out.append(0)
+
+    return bytes(out)
+
+
+def encode_frame(frame_type, seq, payload=b""):
+    """Build a complete, delimited binary frame."""
+    if len(payload) > MAX_PAYLOAD:
+        raise ValueError(f"payload too large: {len(payload)} bytes")
+
+    body = HEADER.pack(PROTOCOL_VERSION, frame_type, seq & 0xFF, len(payload)) + bytes(payload)
+    body += CRC.pack(crc16_ccitt(body))
+    return cobs_encode(body) + bytes((FRAME_DELIMITER,))
+
+
+def encode_sliders(seq, values):
+    return encode_frame(FRAME_SLIDERS, seq, struct.pack(f"<{len(values)}H", *values))
+
+
+def encode_text(seq, text):
+    return encode_frame(FRAME_TEXT, seq, text.encode())
+
+
+class FrameDecoder:
+    """Incremental decoder for the pad's serial stream.
+
+    Feed it whatever bytes the port returned; it yields only complete, validated
+    frames and keeps partial data for the next call. Slider frames decode to a
+    list of ints and text frames to a str, in both binary and ASCII modes.
+    """
+
+    def __init__(self, mode=MODE_BINARY):
+        if mode not in (MODE_BINARY, MODE_ASCII):
+            raise ValueError(f"Unknown serial protocol mode: {mode}")
+
+        self.mode = mode
+        self._buffer = bytearray()
+        self._last_seq = None
+
+        # Statistics
+        self.frames = 0
+        self.crc_errors = 0
+        self.framing_errors = 0
+        self.lost_frames = 0
+
+    def feed(self, data):
+        """Consume raw bytes and return the list of frames they completed."""
+        self._buffer += data
+        delimiter = FRAME_DELIMITER if self.mode == MODE_BINARY else 0x0A
+        frames = []
+
+        while True:
+            end = self._buffer.find(bytes((delimiter,)))
+            if end < 0:
+                break
+
+            chunk = bytes(self._buffer[:end])
+            del self._buffer[:end + 1]
+
+            if not chunk:
+                continue
+
+            frame = self._decode_binary(chunk) if self.mode == MODE_BINARY else self._decode_ascii(chunk)
+            if frame is not None:
+                self.frames += 1
+                frames.append(frame)
+
+        if len(self._buffer) > MAX_BUFFERED:
+            # No delimiter in sight, drop the garbage instead of growing forever
+            self.framing_errors += 1
+            self._buffer.clear()
+
+        return frames
+
+    def reset(self):
+        """Drop any partial data, e.g. after a reconnect."""
+        self._buffer.clear()
+        self._last_seq = None
+
+    def _decode_binary(self, chunk):
+        try:
+            raw = cobs_decode(chunk)
+        except ValueError:
+            self.framing_errors += 1
+            return None
+
+        if len(raw) < HEADER.size + CRC.size:
+            self.framing_errors += 1
+            return None
+
+        version, frame_type, seq, length = HEADER.unpack_from(raw)
+        if version != PROTOCOL_VERSION or length != len(raw) - HEADER.size - CRC.size:
+            self.framing_errors += 1
+            return None
+
+        (crc,) = CRC.unpack_from(raw, len(raw) - CRC.size)
+        if crc != crc16_ccitt(raw[:-CRC.size]):
+            self.crc_errors += 1
+            return None
+
+        if self._last_seq is not None:
+            self.lost_frames += (seq - self._last_seq - 1) & 0xFF
+        self._last_seq = seq
+
+        payload = raw[HEADER.size:HEADER.size + length]
+        if frame_type == FRAME_SLIDERS:
+            if length % 2:
+                self.framing_errors += 1
+                return None
+            return Frame(FRAME_SLIDERS, seq, list(struct.unpack(f"<{length // 2}H", payload)))
+
+        if frame_type == FRAME_TEXT:
+            return Frame(FRAME_TEXT, seq, payload.decode("utf-8", errors="ignore"))
+
+        return Frame(frame_type, seq, payload)
+
+    def _decode_ascii(self, chunk):
+        line = chunk.decode("utf-8", errors="ignore").strip()
+        if not line:
+            return None
+
+        fields = line.split("|")
+        if all(field.isdigit() for field in fields):
+            return Frame(FRAME_SLIDERS, None, [int(field) for field in fields])
+
+        return Frame(FRAME_TEXT, None, line)
@@ -0,0 +1,282 @@
+import asyncio
+import base64
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+import serial_protocol
+import pyserial
+
+THUMB_SIZE = 48  # square, fits the 64 px tall SSD1306 next to three lines of text
+MAX_THUMB_SIZE = 64  # must match ALBUM_ART_MAX_SIZE in pico_test.py
+CHUNK_SIZE = 96  # bitmap bytes per IMG|DATA line (128 base64 characters)
+
+
+def cache_key(title, artist, image_bytes):
+    """Key of one track's art; the image itself is part of it, so art read too early never sticks."""
+    digest = hashlib.sha1(f"{title}\x1f{artist}\x1f".encode("utf-8", errors="ignore"))
+    digest.update(image_bytes)
+    return digest.hexdigest()[:16]
+
+
+def to_oled_bitmap(image_bytes, size=THUMB_SIZE):
+    """Downscale and dither an encoded image to a 1-bit bitmap.
+
+    Returns (width, height, data) with data packed row by row, MSB first,
+    1 = lit pixel, which is what the pad's album art receiver expects.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(BytesIO(image_bytes)) as img:
+        img = ImageOps.fit(img.convert("L"), (size, size), Image.LANCZOS)
+        img = ImageOps.autocontrast(img)
+        img = img.convert("1")  # Floyd-Steinberg dithering
+        return img.width, img.height, img.tobytes()
+
+
+class ThumbnailCache:
+    """LRU of converted bitmaps with a byte budget and an optional on-disk tier.
+
+    Thread safe, the pipeline calls it from its image executor.
+    """
+
+    def __init__(self, max_bytes=256 * 1024, disk_dir=None):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def get(self, key):
+        with self._lock:
+            bitmap = self._entries.get(key)
+            if bitmap is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return bitmap
+
+        bitmap = self._load(key)
+        if bitmap is None:
+            self.misses += 1
+            return None
+
+        self.disk_hits += 1
+        self._remember(key, bitmap)
+        return bitmap
+
+    def put(self, key, bitmap):
+        self._remember(key, bitmap)
+        self._store(key, bitmap)
+
+    def _remember(self, key, bitmap):
+        size = len(bitmap[2])
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[2])
+
+            self._entries[key] = bitmap
+            self._bytes += size
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted[2])
+
+    def _path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.bin")
+
+    def _load(self, key):
+        if not self.disk_dir:
+            return None
+        try:
+            with open(self._path(key), "rb") as file:
+                blob = file.read()
+        except OSError:
+            return None
+
+        if len(blob) < 2 or len(blob) - 2 != (blob[0] + 7) // 8 * blob[1]:
+            # Truncated or from another format, drop it so it is converted and stored again
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            return None
+        return blob[0], blob[1], blob[2:]
+
+    def _store(self, key, bitmap):
+        if not self.disk_dir:
+            return
+        width, height, data = bitmap
+        tmp_path = self._path(key) + ".tmp"
+        try:
+            with open(tmp_path, "wb") as file:
+                file.write(bytes((width, height)) + data)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            print(f"Thumbnail cache write error: {e}")
+
+
+class ImageTransfer:
+    """Resumable, checksummed bitmap upload to the pad over the text command channel.
+
+        host: IMG|BEGIN|id|w|h|size|crc16     pad: IMG|ACK|id|0
+        host: IMG|DATA|id|offset|b64|crc16    pad: IMG|ACK|id|next offset  (NAK|id|offset to resend)
+        host: IMG|END|id                      pad: IMG|ACK|id|size
+        host: IMG|RESUME|id                   pad: IMG|ACK|id|offset, or NAK|id|-1 if it lost the image
+
+    Stop and wait: one line in flight, every reply carries the offset the pad
+    wants next, so a lost line or a reconnect resumes where the pad left off.
+    """
+
+    ACK_TIMEOUT = 0.5
+    MAX_RETRIES = 5
+
+    def __init__(self, serial_obj):
+        self.serial_obj = serial_obj
+        self._next_id = 0
+        self._waiting_id = None
+        self._waiter = None
+
+        self.sent = 0
+        self.retries = 0
+        serial_obj.subscribe(self._on_frame)
+
+    def _on_frame(self, frame):
+        if frame.type != serial_protocol.FRAME_TEXT or not frame.data.startswith("IMG|"):
+            return
+
+        parts = frame.data.split("|")
+        if len(parts) != 4 or parts[1] not in ("ACK", "NAK"):
+            return
+
+        try:
+            image_id, offset = int(parts[2]), int(parts[3])
+        except ValueError:
+            return
+
+        if self._waiter and not self._waiter.done() and image_id == self._waiting_id:
+            self._waiter.set_result(offset)
+
+    async def _request(self, line, image_id):
+        """Send one command line and return the offset the pad answers with."""
+        self._waiting_id = image_id
+        self._waiter = asyncio.get_running_loop().create_future()
+        self.serial_obj.send(line, priority=pyserial.PRIORITY_BULK)
+        try:
+            return await asyncio.wait_for(self._waiter, self.ACK_TIMEOUT)
+        finally:
+            self._waiter = None
+
+    async def send(self, width, height, data):
+        image_id = self._next_id
+        self._next_id = (self._next_id + 1) & 0xFFFF
+        begin = f"IMG|BEGIN|{image_id}|{width}|{height}|{len(data)}|{serial_protocol.crc16_ccitt(data)}\n"
+
+        offset = -1
+        failures = 0
+        while failures <= self.MAX_RETRIES:
+            previous = offset
+            try:
+                if offset < 0:
+                    offset = await self._request(begin, image_id)
+
+                elif offset < len(data):
+                    chunk = data[offset:offset + CHUNK_SIZE]
+                    line = (f"IMG|DATA|{image_id}|{offset}|{base64.b64encode(chunk).decode()}|"
+                            f"{serial_protocol.crc16_ccitt(chunk)}\n")
+                    offset = await self._request(line, image_id)
+
+                else:
+                    if await self._request(f"IMG|END|{image_id}\n", image_id) == len(data):
+                        self.sent += 1
+                        return True
+                    offset = -1  # whole image checksum failed, start over
+
+            except asyncio.TimeoutError:
+                try:
+                    # Ask where the pad got to instead of guessing
+                    offset = await self._request(f"IMG|RESUME|{image_id}\n", image_id)
+                except asyncio.TimeoutError:
+                    pass
+
+            if offset > previous:
+                failures = 0
+            else:
+                failures += 1  # timeout, NAK or restart: no progress
+                self.retries += 1
+
+        print(f"Album art transfer {image_id} gave up")
+        return False
+
+
+class ThumbnailPipeline:
+    """Media change -> cached or freshly converted bitmap -> chunked upload.
+
+    Decoding and dithering run in `executor`, never on the serial path. A new
+    track cancels whatever the previous one was still doing.
+    """
+
+    def __init__(self, serial_obj, executor=None, cache=None, size=THUMB_SIZE):
+        self.serial_obj = serial_obj
+        self.executor = executor
+        self.cache = cache or ThumbnailCache()
+        if not 1 <= size <= MAX_THUMB_SIZE:
+            clamped = max(1, min(MAX_THUMB_SIZE, size))
+            print(f"album_art size {size} is outside 1..{MAX_THUMB_SIZE}, the pad would refuse it; using {clamped}")
+            size = clamped
+        self.size = size
+        self.transfer = ImageTransfer(serial_obj)
+        self._task = None
+        self._shown_key = None  # art the pad has, re-sent states with the same art are skipped
+
+        self.cancelled = 0
+
+    def show(self, source, state):
+        """Start showing the art of state (call from the event loop)."""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            self.cancelled += 1
+
+        if state.title is None:
+            self.clear()
+            return
+
+        self._task = asyncio.create_task(self._show(source, state))
+
+    def clear(self):
+        self._shown_key = None
+        self.serial_obj.send("IMG|CLEAR\n", priority=pyserial.PRIORITY_TITLE, key="IMG")
+
+    async def _show(self, source, state):
+        loop = asyncio.get_running_loop()
+        try:
+            # Always the art of this state, never whatever the source holds by now
+            image_bytes = await source.read_thumbnail(state)
+            if not image_bytes:
+                self.clear()
+                return
+
+            key = cache_key(state.title, state.artist, image_bytes)
+            if key == self._shown_key:
+                return
+
+            bitmap = await loop.run_in_executor(self.executor, self.cache.get, key)
+            if bitmap is None:
+                bitmap = await loop.run_in_executor(self.executor, to_oled_bitmap, image_bytes, self.size)
+                await loop.run_in_executor(self.executor, self.cache.put, key, bitmap)
+
+            await self.transfer.send(*bitmap)
+            self._shown_key = key
+
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Failed to load thumbnail: {e}")
@@ -0,0 +1,144 @@
+import asyncio
+import time
+
+
+class VolumeActuator:
+    """Applies slider levels to a VolumeControl from one asyncio task.
+
+    Every target (slider function name) has a single pending slot, so a burst of
+    updates collapses into the newest level. Levels equal to the last applied one
+    are never written, and each target is written at most once per min_interval.
+    A target that is not there (its app is closed) keeps its level pending and
+    is retried with an exponential backoff up to max_backoff, or straight away
+    once sessions_changed() reports its app.
+    The blocking COM calls run in the given executor, one at a time.
+    """
+
+    def __init__(self, volume_obj, executor=None, min_interval=0.02, max_backoff=2.0):
+        self.volume_obj = volume_obj
+        self.executor = executor
+        self.min_interval = min_interval
+        self.max_backoff = max_backoff
+
+        self._pending = {}        # target -> (newest level not yet written, received at)
+        self._applied_levels = {}  # target -> level last written successfully
+        self._last_write = {}     # target -> time.monotonic() of the last write
+        self._misses = {}         # target -> unavailable writes in a row
+        self._retry_at = {}       # target -> time.monotonic() before which it is not retried
+        self._wakeup = asyncio.Event()
+
+        # Statistics
+        self.applied = 0
+        self.unchanged = 0
+        self.coalesced = 0
+        self.unavailable = 0
+        self.failed = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+
+    @property
+    def dropped(self):
+        """Updates that never reached the backend (unchanged or superseded)."""
+        return self.unchanged + self.coalesced
+
+    def submit(self, target, level, received_at=None):
+        """Queue a level for target; never blocks on the backend. Call from the event loop.
+
+        received_at is the time.perf_counter() at which the input arrived, used
+        for the input-to-write latency statistics.
+        """
+        if target in self._pending:
+            received_at = self._pending.pop(target)[1]  # keep the oldest stamp of the burst
+            self.coalesced += 1
+
+        if self._applied_levels.get(target) == level:
+            self.unchanged += 1
+            return
+
+        self._pending[target] = (level, received_at or time.perf_counter())
+        self._wakeup.set()
+
+    def sessions_changed(self, names):
+        """The session index was rebuilt with names in it: retry those targets now. Call from the event loop."""
+        ready = [target for target in self._misses if target in names]
+        for target in ready:
+            del self._misses[target]
+            self._retry_at.pop(target, None)
+        if ready:
+            self._wakeup.set()
+
+    def stats(self):
+        return {
+            "applied": self.applied,
+            "dropped": self.dropped,
+            "unchanged": self.unchanged,
+            "coalesced": self.coalesced,
+            "unavailable": self.unavailable,
+            "failed": self.failed,
+            "pending": len(self._pending),
+            "mean_latency_ms": self.latency_total / self.applied * 1000 if self.applied else 0.0,
+            "max_latency_ms": self.latency_max * 1000,
+        }
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+
+        while True:
+            target, wait = self._next_ready()
+            if target is None:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            level, received_at = self._pending.pop(target)
+            await self._apply(loop, target, level, received_at)
+
+    def _next_ready(self):
+        """Pick a pending target whose rate limit has expired."""
+        if not self._pending:
+            return None, None
+
+        now = time.monotonic()
+        wait = None
+        for target in self._pending:
+            ready_at = max(self._last_write.get(target, 0.0) + self.min_interval,
+                           self._retry_at.get(target, 0.0))
+            remaining = ready_at - now
+            if remaining <= 0:
+                return target, None
+            wait = remaining if wait is None else min(wait, remaining)
+
+        return None, wait
+
+    async def _apply(self, loop, target, level, received_at):
+        try:
+            applied = await loop.run_in_executor(self.executor, self.volume_obj.set_volume, target, level)
+        except Exception as e:
+            print(f"Cannot set volume error: {e}")
+            self.failed += 1
+            self._last_write[target] = time.monotonic()
+            return
+
+        now = time.monotonic()
+        self._last_write[target] = now
+        if applied is False:
+            # Target not there (yet): keep the level unless a newer one came, retry later and later
+            self.unavailable += 1
+            misses = self._misses.get(target, 0) + 1
+            self._misses[target] = misses
+            self._retry_at[target] = now + min(self.min_interval * 2 ** misses, self.max_backoff)
+            if target not in self._pending:
+                self._pending[target] = (level, received_at)
+            return
+
+        self._misses.pop(target, None)
+        self._retry_at.pop(target, None)
+
+        latency = time.perf_counter() - received_at
+        self.latency_total += latency
+        self.latency_max = max(self.latency_max, latency)
+        self.applied += 1
+        self._applied_levels[target] = level
@@ -1,4 +1,4 @@
-import threading
+import audio_sessions
 
 # made this running on a separate thread
 decibels = [-65.25, -59.0, -54.0, -49.0, -46.0, -43.0, -40.0, -38.0, -37.0, -35.0, -33.0, -32.0,
@@ -12,59 +12,59 @@ decibels = [-65.25, -59.0, -54.0, -49.0, -46.0, -43.0, -40.0, -38.0, -37.0, -35.
 
 
 class VolumeControl:
-    def __init__(self):
-        self.volume = None
-        self.initialized = threading.Event()
-        self.audio_utilities = None
+    """Master and per-application volume.
 
-        # Start the initialization thread
-        threading.Thread(target=self._initialisation_thread, daemon=True).start()
-        self.initialized.wait()  # Wait until the thread signals completion
+    All calls into the backend (initialise, set_volume and the session index
+    refresh) are meant to run on one dedicated executor thread, which keeps
+    every COM object on the thread that created it.
+    """
 
-    def _initialisation_thread(self):
-        # Import inside the thread to avoid global conflicts
-        from pycaw.pycaw import AudioUtilities, IAudioEndpointVolume
-        from comtypes import CLSCTX_ALL
+    def __init__(self, session_backend=None):
+        self.volume = None
+        self.session_backend = session_backend or audio_sessions.PycawSessionBackend()
+        # Shared process name -> session index, kept fresh by run()
+        self.sessions = audio_sessions.AudioSessionIndex(self.session_backend)
 
+    def initialise(self):
+        """Blocking setup, run it on the audio executor thread."""
         try:
-            self.audio_utilities = AudioUtilities
-            self.devices = AudioUtilities.GetSpeakers()
-            self.interface = self.devices.Activate(
-                IAudioEndpointVolume._iid_, CLSCTX_ALL, None)
-            self.volume = self.interface.QueryInterface(IAudioEndpointVolume)
-        finally:
-            self.initialized.set()  # Signal that initialization is complete
+            self.session_backend.init_thread()
+            self.volume = self.session_backend.master_volume()
+            self.sessions.refresh()
+        except Exception as e:
+            print(f"Volume control initialisation error: {e}")
+
+    def init_worker_thread(self):
+        """Initialise a thread that is going to call set_volume."""
+        self.session_backend.init_thread()
+
+    async def run(self, executor=None):
+        """Keep the session index up to date."""
+        await self.sessions.run(executor)
 
     def set_volume(self, name: str, value: int):
+        """Apply value (0-100) to name. Returns False if there was nothing to apply it to."""
         if name == "MASTER_VOLUME":
             if not self.volume:
                 print("Volume interface not initialized.")
-                return
+                return False
 
             self.volume.SetMasterVolumeLevel(decibels[value], None)
-
+            return True
 
         else:
+            interfaces = self.sessions.lookup(name)
+            if not interfaces:
+                self.sessions.miss(name)  # maybe the app just started
+                return False
 
-            from pycaw.pycaw import AudioUtilities
-
-            sessions = AudioUtilities.GetAllSessions()
-
-            for session in sessions:
-
+            for interface in interfaces:
                 # noinspection PyBroadException
                 try:
+                    interface.SetMasterVolume(value / 100.0, None)
+                except Exception:
+                    # Stale interface: the process exited or the audio device changed
+                    self.sessions.invalidate(rebuild=True)
+                    return False
 
-                    if session.Process and session.Process.name() == name:
-                        interface = session.SimpleAudioVolume
-
-                        # Uncomment and modify the volume setting
-
-                        interface.SetMasterVolume(value / 100.0, None)
-
-                        # print(f"Set volume for {name} to {value}")
-
-                        # break  # Exit after setting volume for the first matching process
-
-                except:
-                    pass
+            return True
@@ -1,8 +1,6 @@
 import usb_cdc, board, displayio, busio, gc, rotaryio
 import time, analogio, asyncio, digitalio, terminalio
-from ulab.numpy import interp
-import usb_hid, usb_midi, adafruit_midi
-from adafruit_midi.control_change import ControlChange
+import usb_hid, usb_midi
 from adafruit_hid.keyboard import Keyboard
 from adafruit_hid.Keycode import Keycode as KC
 from adafruit_hid.consumer_control import ConsumerControl
@@ -11,15 +9,51 @@ from adafruit_display_text import label
 import adafruit_displayio_ssd1306
 import adafruit_ds1307
 from adafruit_debouncer import Debouncer
+from array import array
 import json
-
-
-def get_correct_keycode(key_name):
-    if hasattr(KC, key_name):
-        return getattr(KC, key_name)
-    if hasattr(CC, key_name):
-        return getattr(CC, key_name)
-    return None
+import binascii
+import os
+
+
+# Action records: (kind, codes tuple), compiled once per layout
+ACTION_NONE = 0
+ACTION_KEYBOARD = 1
+ACTION_CONSUMER = 2
+ACTION_MIDI = 3
+NO_ACTION = (ACTION_NONE, ())
+
+# Compiled layout cache (see ConfigFileManager._load_layouts)
+LAYOUT_BUTTONS = 16
+LAYOUT_ENCODERS = 4
+LAYOUT_CACHE_MAGIC = b"LYT"
+LAYOUT_CACHE_VERSION = 1  # bump whenever the record format or compile_action changes
+
+
+def compile_action(key_names):
+    """Turn key names like ["CONTROL", "C"] into an action record.
+
+    The kind comes from the namespace the name resolves in, not from its value,
+    so codes that exist in both Keycode and ConsumerControlCode are never
+    ambiguous. A record has a single kind; keys of another kind are dropped.
+    """
+    kind = ACTION_NONE
+    codes = []
+    for key_name in key_names:
+        if hasattr(KC, key_name):
+            key_kind, code = ACTION_KEYBOARD, getattr(KC, key_name)
+        elif hasattr(CC, key_name):
+            key_kind, code = ACTION_CONSUMER, getattr(CC, key_name)
+        else:
+            continue  # e.g. "NONE" placeholders
+
+        if kind == ACTION_NONE:
+            kind = key_kind
+        elif key_kind != kind:
+            print(f"Cannot mix keyboard and consumer keys, ignoring {key_name}")
+            continue
+        codes.append(code)
+
+    return (kind, tuple(codes)) if codes else NO_ACTION
 
 # Constants
 DISPLAY_WIDTH = 128
@@ -32,6 +66,196 @@ PAGE_MEDIA = "MEDIA"
 PAGE_LAYOUT = "LAYOUTS"
 MIDI_CONTROLLER_NAME = "MIDI CONTROLLER"
 
+# Host telemetry protocol (must match serial_protocol.py on the host)
+PROTOCOL_BINARY = "binary"
+PROTOCOL_ASCII = "ascii"
+PROTOCOL_VERSION = 1
+FRAME_SLIDERS = 0x01
+FRAME_TEXT = 0x02
+FRAME_STATS = 0x03
+FRAME_HEADER_SIZE = 4
+FRAME_MAX_PAYLOAD = 255
+POT_SEND_HYSTERESIS = 8  # 12 bit counts a pot must move before a new frame is sent
+POT_KEEPALIVE_S = 1.0  # resend unchanged pot values this often
+POT_FILTER_AVERAGE = "average"
+POT_FILTER_EMA = "ema"
+POT_FILTER_MEDIAN = "median"
+ALBUM_ART_MAX_SIZE = 64  # largest album art edge in pixels the pad accepts
+
+# MIDI output (see MidiManager)
+MIDI_CONTROL_CHANGE = 0xB0
+MIDI_LSB_OFFSET = 32  # CC n + 32 carries the low 7 bits of 14 bit controller n (n < 32)
+MIDI_BUFFER_MESSAGES = 64  # messages batched into one port write
+MIDI_BUTTON_CCS = list(range(20, 40))  # 16 buttons, then the 4 encoder clicks
+MIDI_POT_CCS = list(range(10, 18))
+MIDI_ENCODER_CCS = list(range(1, 5))
+
+# Encoder acceleration (see EncoderAcceleration)
+ENCODER_ACCEL_START = 8  # detents per second where acceleration begins
+ENCODER_ACCEL_FULL = 40  # detents per second where it reaches max
+ENCODER_ACCEL_MAX = 4  # step multiplier at full speed, 1 disables acceleration
+ENCODER_IDLE_NS = 250000000  # a pause this long starts a new, slow gesture
+
+# Host command input (see LineAssembler)
+SERIAL_LINE_MAX = 512  # longest accepted command line (titles, IMG|DATA lines)
+SERIAL_CHUNK = 128  # most bytes taken from the CDC buffer per pass
+SERIAL_IDLE_MIN = 0.001  # idle backoff starts here and doubles up to SERIAL_IDLE_MAX
+SERIAL_IDLE_MAX = 0.008
+
+# Clock (see RTCManager)
+RTC_RESYNC_S = 3600  # re-read the DS1307 this often, monotonic_ns carries the time in between
+RTC_EDGE_POLL_S = 0.01  # poll interval while catching the chip's next seconds tick
+RTC_WAKE_SLICE_S = 1.0  # minute waits re-check this often so a newly set time is noticed
+
+# Config persistence (see ConfigFileManager)
+CONFIG_SAVE_DELAY_S = 2.0  # settings are written once they stopped changing for this long
+EROFS = 30  # OSError number of writes while boot.py keeps the drive read-only
+
+# HID output (see HidScheduler)
+HID_PRESS = 0
+HID_RELEASE = 1
+HID_TAP = 2
+HID_REPORT_INTERVAL_MS = 8  # USB poll interval of the HID endpoint
+HID_QUEUE_MAX = 32  # queued events; taps beyond it are dropped, releases never are
+HID_MAX_REPEATS = 32  # pending repeats of one merged tap
+
+# Loop instrumentation (see LoopStats), decoded by the host's loop_stats.py
+TASK_SCAN = 0
+TASK_ENCODERS = 1
+TASK_SERIAL = 2
+TASK_DISPLAY = 3
+STATS_TASK_COUNT = 4
+STATS_BUCKETS = 11  # keeps a dump of all tasks within one frame
+STATS_FIRST_BUCKET_US = 128  # bucket i counts passes under 128 << i us, the last one the rest
+
+
+class SpriteCache:
+    """Palettes and plain bitmaps shared by every page, created once.
+
+    Bitmaps are keyed by (width, height, fill) so identical indicators share
+    one bitmap; every position still gets its own TileGrid.
+    """
+
+    def __init__(self):
+        self._palettes = {}
+        self._bitmaps = {}
+
+    def palette(self, *colors):
+        palette = self._palettes.get(colors)
+        if palette is None:
+            palette = displayio.Palette(len(colors))
+            for i, color in enumerate(colors):
+                palette[i] = color
+            self._palettes[colors] = palette
+        return palette
+
+    def bitmap(self, width, height, fill=0):
+        key = (width, height, fill)
+        bitmap = self._bitmaps.get(key)
+        if bitmap is None:
+            bitmap = displayio.Bitmap(width, height, 1)
+            if fill:
+                bitmap.fill(fill)  # bulk fill in C, new bitmaps are already 0
+            self._bitmaps[key] = bitmap
+        return bitmap
+
+    def tile(self, width, height, x, y, palette, fill=0):
+        return displayio.TileGrid(self.bitmap(width, height, fill), pixel_shader=palette, x=x, y=y)
+
+    def memory_report(self):
+        """Estimated bytes held by the cache (1 bit bitmaps in 32 bit words, 8 bytes per color)."""
+        bitmap_bytes = sum((width + 31) // 32 * 4 * height for width, height, _ in self._bitmaps)
+        palette_bytes = sum(8 * len(colors) for colors in self._palettes)
+        return {
+            "bitmaps": len(self._bitmaps),
+            "bitmap_bytes": bitmap_bytes,
+            "palettes": len(self._palettes),
+            "palette_bytes": palette_bytes,
+            "total_bytes": bitmap_bytes + palette_bytes,
+        }
+
+
+SPRITES = SpriteCache()
+
+
+class TaskTimer:
+    """Pass time histogram of one task loop, in log2 microsecond buckets.
+
+    A pass is timed from its first statement to just before the loop's idle
+    sleep, so time yielded to other tasks inside the pass counts too.
+    """
+
+    def __init__(self):
+        self.histogram = array("L", [0] * STATS_BUCKETS)
+        self.reset()
+
+    def reset(self):
+        for i in range(STATS_BUCKETS):
+            self.histogram[i] = 0
+        self.passes = 0
+        self.total_us = 0
+        self.max_us = 0
+
+    def record(self, started_ns):
+        """Account a pass that began at time.monotonic_ns() == started_ns."""
+        elapsed_us = (time.monotonic_ns() - started_ns) // 1000
+        bucket = 0
+        limit = STATS_FIRST_BUCKET_US
+        while elapsed_us >= limit and bucket < STATS_BUCKETS - 1:
+            limit <<= 1
+            bucket += 1
+
+        self.histogram[bucket] += 1
+        self.passes += 1
+        self.total_us += elapsed_us
+        if elapsed_us > self.max_us:
+            self.max_us = elapsed_us
+
+    @property
+    def mean_us(self):
+        return self.total_us // self.passes if self.passes else 0
+
+
+class LoopStats:
+    """Per task timers plus heap and GC counters, dumped by the STATS command."""
+
+    def __init__(self):
+        self.timers = [TaskTimer() for _ in range(STATS_TASK_COUNT)]
+        self.hid = None  # HidScheduler whose counters are dumped along
+        self._mem_alloc = 0
+        self.reset()
+
+    def reset(self):
+        for timer in self.timers:
+            timer.reset()
+        if self.hid is not None:
+            self.hid.reset_counters()
+        self.since_ns = time.monotonic_ns()
+        self.gc_runs = 0
+
+    def sample_heap(self):
+        """Count garbage collections: allocated memory only shrinks when one ran."""
+        mem_alloc = gc.mem_alloc()
+        if mem_alloc < self._mem_alloc:
+            self.gc_runs += 1
+        self._mem_alloc = mem_alloc
+
+    def window_ms(self):
+        return (time.monotonic_ns() - self.since_ns) // 1000000
+
+
+LOOP_STATS = LoopStats()
+
+
+class Page:
+    """A display page built once: its group plus the parts that get updated in place."""
+
+    def __init__(self, group, labels, indicators=()):
+        self.group = group
+        self.labels = labels
+        self.indicators = indicators
+        self.art = None  # album art TileGrid currently in the group (media page)
+
 
 class DisplayManager:
     def __init__(self, sda, scl, rtc_manager, configfile_manager, macropad_manager):
@@ -46,6 +270,7 @@ class DisplayManager:
         self.main_title = "No Media"
         self.sub_title = "currently playing"
         self.is_media_title_changed = False
+        self.album_art = None  # TileGrid shown left of the title, None for text only
         self.display_width = 128
         self.display_height = 64
 
@@ -64,8 +289,14 @@ class DisplayManager:
         self.last_layout = self.configfile_manager.get("last_layout")
         self.layout_names = self.configfile_manager.keyboard_layouts_names()
         self.layout_names.append(MIDI_CONTROLLER_NAME)
+        if self.last_layout not in self.layout_names:
+            self.last_layout = self.layout_names[0]  # saved layout was renamed or removed
         self.layout_index = self.layout_names.index(self.last_layout)
 
+        # Pages are built on first use and then only updated
+        self.white_palette = SPRITES.palette(0xFFFFFF)
+        self.black_palette = SPRITES.palette(0x000000)
+        self._pages = {}
 
     def _init_display(self):
         displayio.release_displays()
@@ -90,141 +321,157 @@ class DisplayManager:
         return splash
 
     def _create_background(self):
-        bitmap = displayio.Bitmap(DISPLAY_WIDTH, DISPLAY_HEIGHT, 1)
-        palette = displayio.Palette(1)
-        palette[0] = 0  # Black
-        return displayio.TileGrid(bitmap, pixel_shader=palette, x=0, y=0)
-
-    def media_page(self):
-        splash = self._create_base_group()
-
-        # Get display width
-        display_width = self.display_width
+        return SPRITES.tile(DISPLAY_WIDTH, DISPLAY_HEIGHT, 0, 0, self.black_palette)
 
-        # Add labels
-        labels = [
-            # {"text": "MEDIA", "y": 5},
-            {"text": self.main_title[:21], "y": 10},
-            {"text": self.main_title[21:42], "y": 25},
-            {"text": self.main_title[42:63], "y": 40},
-            {"text": self.sub_title[:21], "y": 55}
-        ]
+    def _create_scroll_indicator(self, width, height, x, y):
+        """Scroll indicator on a shared bitmap, black by default (swap pixel_shader to light it)"""
+        return SPRITES.tile(width, height, x, y, self.black_palette)
 
-        for label_info in labels:
-            text_label = label.Label(
-                terminalio.FONT,
-                text=label_info["text"],
-                color=0xFFFFFF
-            )
-            # Center-align text
-            text_label.x = (display_width - text_label.bounding_box[2]) // 2
-            text_label.y = label_info["y"]
+    def _create_page(self, elements, indicators=()):
+        """Group with background, indicators and one label per (y, scale) element."""
+        splash = self._create_base_group()
+        for indicator in indicators:
+            splash.append(indicator)
 
+        labels = []
+        for y, scale in elements:
+            text_label = label.Label(terminalio.FONT, text="", color=0xFFFFFF, scale=scale)
+            text_label.y = y
             splash.append(text_label)
-
-        self.display.root_group = splash
-        self.current_page = PAGE_MEDIA
-
-    async def clock_page(self):
-        # Create reusable palettes
-        white_palette = displayio.Palette(1)
-        white_palette[0] = 0xFFFFFF
-
-        black_palette = displayio.Palette(1)
-        black_palette[0] = 0x000000
-
-        def create_scroll_indicator(width, height, x, y):
-            """Create a fresh scroll indicator with its own bitmap and palette"""
-            bitmap = displayio.Bitmap(width, height, 1)
-            # Fill the bitmap completely
-            for i in range(width):
-                for j in range(height):
-                    bitmap[i, j] = 0  # Set all pixels to the first color in the palette
-
-            # Start with black by default
-            indicator = displayio.TileGrid(bitmap, pixel_shader=black_palette, x=x, y=y)
-            return indicator
-
-        # Helper function to get days in a month, accounting for leap years
-        def days_in_month(month, year):
-            if month in [4, 6, 9, 11]:
-                return 30
-            elif month == 2:
-                # Check for leap year
-                is_leap = (year % 4 == 0 and year % 100 != 0) or (year % 400 == 0)
-                return 29 if is_leap else 28
+            labels.append(text_label)
+
+        return Page(splash, labels, indicators)
+
+    def _page(self, name):
+        page = self._pages.get(name)
+        if page is None:
+            if name == PAGE_MEDIA:
+                page = self._create_page(((10, 1), (25, 1), (40, 1), (55, 1)))
+            elif name == PAGE_CLOCK:
+                # hour, minute, year, month, date indicators; clock, day, date labels
+                page = self._create_page(((33, 4), (5, 1), (59, 1)), (
+                    self._create_scroll_indicator(49, 37, 3, 15),
+                    self._create_scroll_indicator(49, 37, 74, 15),
+                    self._create_scroll_indicator(26, 16, 69, 54),
+                    self._create_scroll_indicator(14, 16, 32, 54),
+                    self._create_scroll_indicator(14, 16, 51, 54),
+                ))
             else:
-                return 31
-
-        # Helper function to get day of week from date
-        def get_day_of_week(day, month, year):
-            # Zeller's Congruence algorithm to find day of week
-            if month < 3:
-                month += 12
-                year -= 1
-
-            k = year % 100
-            j = year // 100
+                page = self._create_page(((10, 1), (40, 1)),
+                                         (self._create_scroll_indicator(128, 30, 0, 25),))
+            self._pages[name] = page
+        return page
+
+    def _show(self, page, name):
+        # Swapping root_group only when the page changes avoids a full redraw
+        if self.display.root_group is not page.group:
+            self.display.root_group = page.group
+        self.current_page = name
+
+    @staticmethod
+    def _set_label(text_label, text, left=0, width=DISPLAY_WIDTH):
+        """Update a label in place and center it; untouched when nothing changed."""
+        if text_label.text != text:
+            text_label.text = text
+        x = left + (width - text_label.bounding_box[2] * text_label.scale) // 2
+        if text_label.x != x:
+            text_label.x = x
+
+    def set_album_art(self, width, height, packed):
+        """Show a 1 bit, row major, MSB first bitmap next to the title."""
+        bitmap = displayio.Bitmap(width, height, 2)
+        row_bytes = (width + 7) // 8
+        for y in range(height):
+            row = y * row_bytes
+            for x in range(width):
+                if packed[row + (x >> 3)] & (0x80 >> (x & 7)):
+                    bitmap[x, y] = 1
+
+        palette = SPRITES.palette(0x000000, 0xFFFFFF)
+        self.album_art = displayio.TileGrid(bitmap, pixel_shader=palette, x=0,
+                                            y=(DISPLAY_HEIGHT - height) // 2)
+        self.is_media_title_changed = True
+
+    def clear_album_art(self):
+        if self.album_art is not None:
+            self.album_art = None
+            self.is_media_title_changed = True
 
-            day_of_week = (day + 13 * (month + 1) // 5 + k + k // 4 + j // 4 - 2 * j) % 7
+    def media_page(self):
+        page = self._page(PAGE_MEDIA)
+
+        if page.art is not self.album_art:
+            if page.art is not None:
+                page.group.remove(page.art)
+            if self.album_art is not None:
+                page.group.insert(1, self.album_art)  # above the background, below the text
+            page.art = self.album_art
+
+        # Text goes right of the album art when there is one
+        text_x = 0
+        if self.album_art is not None:
+            text_x = self.album_art.bitmap.width + 2
+        display_width = self.display_width - text_x
+        chars = display_width // 6
+
+        labels = page.labels
+        self._set_label(labels[0], self.main_title[:chars], text_x, display_width)
+        self._set_label(labels[1], self.main_title[chars:chars * 2], text_x, display_width)
+        self._set_label(labels[2], self.main_title[chars * 2:chars * 3], text_x, display_width)
+        self._set_label(labels[3], self.sub_title[:chars], text_x, display_width)
+
+        self._show(page, PAGE_MEDIA)
+
+    @staticmethod
+    def _days_in_month(month, year):
+        """Days in a month, accounting for leap years"""
+        if month in [4, 6, 9, 11]:
+            return 30
+        elif month == 2:
+            # Check for leap year
+            is_leap = (year % 4 == 0 and year % 100 != 0) or (year % 400 == 0)
+            return 29 if is_leap else 28
+        else:
+            return 31
+
+    @staticmethod
+    def _get_day_of_week(day, month, year):
+        # Zeller's Congruence algorithm to find day of week
+        if month < 3:
+            month += 12
+            year -= 1
 
-            # Convert from Zeller's result (0=Saturday) to standard weekday (0=Monday)
-            day_of_week = (day_of_week + 5) % 7
+        k = year % 100
+        j = year // 100
 
-            return day_of_week
+        day_of_week = (day + 13 * (month + 1) // 5 + k + k // 4 + j // 4 - 2 * j) % 7
 
-        # Create base display group
-        splash = self._create_base_group()
+        # Convert from Zeller's result (0=Saturday) to standard weekday (0=Monday)
+        day_of_week = (day_of_week + 5) % 7
 
-        # Create all indicators with their positions
-        hr_scroll = create_scroll_indicator(49, 37, 3, 15)
-        min_scroll = create_scroll_indicator(49, 37, 74, 15)
-        year_scroll = create_scroll_indicator(26, 16, 69, 54)
-        mon_scroll = create_scroll_indicator(14, 16, 32, 54)
-        dt_scroll = create_scroll_indicator(14, 16, 51, 54)
+        return day_of_week
 
+    async def clock_page(self):
+        white_palette = self.white_palette
+        black_palette = self.black_palette
+        days_in_month = self._days_in_month
+        get_day_of_week = self._get_day_of_week
 
-        # Add indicators to the display group
-        splash.append(hr_scroll)
-        splash.append(min_scroll)
-        splash.append(year_scroll)
-        splash.append(mon_scroll)
-        splash.append(dt_scroll)
+        page = self._page(PAGE_CLOCK)
+        splash = page.group
+        hr_scroll, min_scroll, year_scroll, mon_scroll, dt_scroll = page.indicators
+        text_labels = page.labels
 
         # Get display width
         display_width = self.display_width
 
         # Get current time data
         hour, minute, date, month, year, day = self.rtc_manager.current_time()
-        clock_text = f"{hour:02d}:{minute:02d}"
-        date_text = f"{date:02d}/{month:02d}/{year:02d}"
-
-        # Add clock elements
-        elements = [
-            {"text": clock_text, "y": 33, "scale": 4},  # Larger clock
-            {"text": day, "y": 5, "scale": 1},  # Normal size day
-            {"text": date_text, "y": 59, "scale": 1}  # Normal size date
-        ]
-
-        text_labels = []
-
-        for element in elements:
-            text_label = label.Label(
-                terminalio.FONT,
-                text=element["text"],
-                color=0xFFFFFF,
-                scale=element["scale"]  # Apply scaling
-            )
-            # Center-align text based on scaled width
-            text_label.x = (display_width - text_label.bounding_box[2] * element["scale"]) // 2
-            text_label.y = element["y"]
-
-            splash.append(text_label)
-            text_labels.append(text_label)
+        self._set_label(text_labels[0], f"{hour:02d}:{minute:02d}")
+        self._set_label(text_labels[1], day)
+        self._set_label(text_labels[2], f"{date:02d}/{month:02d}/{year:02d}")
 
-        # Set the display's root group
-        self.display.root_group = splash
-        self.current_page = PAGE_CLOCK
+        self._show(page, PAGE_CLOCK)
 
         # Handle settings mode
         if self.clock_click:
@@ -407,63 +654,20 @@ class DisplayManager:
                 await asyncio.sleep(0.1)
 
     async def layout_page(self):
-        white_palette = displayio.Palette(1)
-        white_palette[0] = 0xFFFFFF
-
-        black_palette = displayio.Palette(1)
-        black_palette[0] = 0x000000
-
-        def create_scroll_indicator(width, height, x, y):
-            """Create a fresh scroll indicator with its own bitmap and palette"""
-            bitmap = displayio.Bitmap(width, height, 1)
-            # Fill the bitmap completely
-            for i in range(width):
-                for j in range(height):
-                    bitmap[i, j] = 0  # Set all pixels to the first color in the palette
-
-            # Start with black by default
-            indicator = displayio.TileGrid(bitmap, pixel_shader=black_palette, x=x, y=y)
-            return indicator
-
-        # Create base display group
-        splash = self._create_base_group()
-
-        # Create all indicators with their positions
-        layout_scroll = create_scroll_indicator(128, 30, 0, 25)
+        white_palette = self.white_palette
+        black_palette = self.black_palette
 
-        # Add indicators to the display group
-        splash.append(layout_scroll)
+        page = self._page(PAGE_LAYOUT)
+        layout_scroll = page.indicators[0]
+        text_labels = page.labels
 
         # Get display width
         display_width = self.display_width
 
-        lyt_text = "Layouts"
-
-        # Add clock elements
-        elements = [
-            {"text": lyt_text, "y": 10, "scale": 1},  # Normal size date
-            {"text": self.layout_names[self.layout_index], "y": 40, "scale": 1}
-        ]
-
-        text_labels = []
+        self._set_label(text_labels[0], "Layouts")
+        self._set_label(text_labels[1], self.layout_names[self.layout_index])
 
-        for element in elements:
-            text_label = label.Label(
-                terminalio.FONT,
-                text=element["text"],
-                color=0xFFFFFF,
-                scale=element["scale"]  # Apply scaling
-            )
-            # Center-align text based on scaled width
-            text_label.x = (display_width - text_label.bounding_box[2] * element["scale"]) // 2
-            text_label.y = element["y"]
-
-            splash.append(text_label)
-            text_labels.append(text_label)
-
-        # Set the display's root group
-        self.display.root_group = splash
-        self.current_page = PAGE_LAYOUT
+        self._show(page, PAGE_LAYOUT)
 
         if self.layout_click:
             self.encoder_position = ""
@@ -492,20 +696,9 @@ class DisplayManager:
                         self.encoder_position = None
 
                         self.last_layout = self.layout_names[self.layout_index]
-                        
-                        if self.last_layout != MIDI_CONTROLLER_NAME:
-
-                            current_layout = (self.configfile_manager.
-                                              keyboard_layout_values(self.layout_index, self.last_layout))
-                            self.macropad_manager.update_keyboard_layout(current_layout[0])
-                            self.macropad_manager.update_rotary_layout(current_layout[1])
-                            self.macropad_manager.current_layout = self.last_layout
-                        
-                        else:
-                            self.macropad_manager.current_layout = MIDI_CONTROLLER_NAME
+                        self.macropad_manager.use_layout(self.last_layout)
 
                         self.configfile_manager.set("last_layout", self.last_layout)
-                        self.configfile_manager.save()
 
                         break
 
@@ -523,12 +716,15 @@ class DisplayManager:
 
 
     async def update_display(self):
+        timer = LOOP_STATS.timers[TASK_DISPLAY]
         while True:
             try:
                 if self.clock_click or self.layout_click:
                     await asyncio.sleep(0.1)
                     continue
 
+                started = time.monotonic_ns()
+
                 if self.encoder_position in ["NEXT", "PREV"]:
                     await self._change_page(self.encoder_position)
 
@@ -557,14 +753,15 @@ class DisplayManager:
                     self.is_min_changed = False
                     self.encoder_position = None
 
+                timer.record(started)
                 await asyncio.sleep(0.1)
             except Exception as e:
                 print(f"Display update error: {e}")
                 await asyncio.sleep(1)
 
     def update_last_visited_page(self):
+        # Only marks it dirty, ConfigFileManager.run() writes it once paging stops
         self.configfile_manager.set("last_page", self.current_page)
-        self.configfile_manager.save()
 
     async def check_curr_time(self):
         while True:
@@ -576,7 +773,7 @@ class DisplayManager:
                 self.is_min_changed = True
                 # print("Minute changed! Triggering display update.")  # Debug print
 
-            await asyncio.sleep(5)
+            await self.rtc_manager.wait_next_minute()
 
     async def _change_page(self, position):
         # IDK why but the NEXT and previous tags are inverted
@@ -606,10 +803,25 @@ class DisplayManager:
 
             self.encoder_position = None
 
-        # acts as a memory to stay on the last visited page, file operation
+        # acts as a memory to stay on the last visited page
         self.update_last_visited_page()
 
 
+class ScanPlan:
+    """Precomputed order and pin toggles for reading a set of mux channels.
+
+    steps holds (slot, toggles, samples) where toggles are the (pin, value)
+    writes needed to get from the previous step to this one. The plan is
+    cyclic: step 0 toggles from the last step, so back to back scans need no
+    extra writes.
+    """
+
+    def __init__(self, steps, last, writes):
+        self.steps = steps
+        self.last = last  # (channel, mux_sel) selected after a scan
+        self.writes = writes  # GPIO writes per scan
+
+
 class MultiplexerManager:
     def __init__(self, S0, S1, S2, S3, SIG, MUX_SEL):
         self.select_pins = [
@@ -617,6 +829,7 @@ class MultiplexerManager:
         ]
         for pin in self.select_pins:
             pin.direction = digitalio.Direction.OUTPUT
+            pin.value = False
 
         self.analog_input = analogio.AnalogIn(SIG)
 
@@ -624,62 +837,392 @@ class MultiplexerManager:
         for pin in MUX_SEL:
             mux_pin = digitalio.DigitalInOut(pin)
             mux_pin.direction = digitalio.Direction.OUTPUT
+            mux_pin.value = True  # enable is active low, start with all disabled
             self.mux_sel.append(mux_pin)
 
+        # What the pins are currently set to, so only changed bits get written
+        self._channel = 0
+        self._mux = None
+
+    def select(self, channel, mux_sel):
+        if mux_sel != self._mux:
+            # Disable the old chip before enabling the new one, they share SIG
+            if self._mux is not None:
+                self.mux_sel[self._mux].value = True
+            self.mux_sel[mux_sel].value = False
+            self._mux = mux_sel
+
+        changed = channel ^ self._channel
+        if changed:
+            for i, pin in enumerate(self.select_pins):
+                if changed & (1 << i):
+                    pin.value = bool(channel & (1 << i))
+            self._channel = channel
+
     def read_channel(self, channel, mux_sel):
 
         try:
             if mux_sel >= len(self.mux_sel):
                 return 0
 
-            # Enable selected multiplexer, disable others
-            for i, mux in enumerate(self.mux_sel):
-                mux.value = (i != mux_sel)
-
-            # Set channel select pins
-            for i, pin in enumerate(self.select_pins):
-                pin.value = bool(channel & (1 << i))
-
+            self.select(channel, mux_sel)
             return self.analog_input.value
 
         except Exception as e:
             print(f"MUX error: {e}")
             return 0
 
+    @staticmethod
+    def _gray_rank(channel):
+        """Position of channel in the 4 bit Gray code sequence."""
+        return channel ^ (channel >> 1) ^ (channel >> 2) ^ (channel >> 3)
+
+    def build_scan_plan(self, channels):
+        """Plan a scan of channels, a list of (slot, channel, mux_sel, samples).
+
+        Channels of one chip are visited in Gray code order so consecutive
+        reads mostly differ in a single select bit, and each chip is visited
+        once, so the enable pins only switch between chips.
+        """
+        groups = []
+        for slot, channel, mux_sel, samples in channels:
+            for group in groups:
+                if group[0] == mux_sel:
+                    group[1].append((self._gray_rank(channel), channel, slot, samples))
+                    break
+            else:
+                groups.append((mux_sel, [(self._gray_rank(channel), channel, slot, samples)]))
+
+        order = []
+        for mux_sel, entries in groups:
+            entries.sort()
+            if order:
+                # Walk the chip in whichever direction starts closest to where the last one ended
+                last = order[-1][0]
+                if self._bit_count(entries[-1][1] ^ last) < self._bit_count(entries[0][1] ^ last):
+                    entries.reverse()
+            for _, channel, slot, samples in entries:
+                order.append((channel, mux_sel, slot, samples))
+
+        steps = []
+        writes = 0
+        channel_now, mux_now = order[-1][0], order[-1][1]
+        for channel, mux_sel, slot, samples in order:
+            toggles = []
+            if mux_sel != mux_now:
+                toggles.append((self.mux_sel[mux_now], True))
+                toggles.append((self.mux_sel[mux_sel], False))
+            changed = channel ^ channel_now
+            for i, pin in enumerate(self.select_pins):
+                if changed & (1 << i):
+                    toggles.append((pin, bool(channel & (1 << i))))
+
+            writes += len(toggles)
+            steps.append((slot, tuple(toggles), samples))
+            channel_now, mux_now = channel, mux_sel
+
+        return ScanPlan(tuple(steps), (channel_now, mux_now), writes)
+
+    @staticmethod
+    def _bit_count(value):
+        count = 0
+        while value:
+            count += value & 1
+            value >>= 1
+        return count
+
+    def scan(self, plan, out):
+        """Run plan once, storing the (averaged) reading of each step in out[slot]."""
+        if (self._channel, self._mux) != plan.last:
+            self.select(*plan.last)
+
+        analog_input = self.analog_input
+        for slot, toggles, samples in plan.steps:
+            for pin, value in toggles:
+                pin.value = value
+
+            if samples == 1:
+                out[slot] = analog_input.value
+            else:
+                total = 0
+                for _ in range(samples):
+                    total += analog_input.value
+                out[slot] = total // samples
+
+        self._channel, self._mux = plan.last
+
+
+class PotFilter:
+    """Integer smoothing of pot readings that never allocates per sample.
+
+    average: moving average over the last `depth` scans (running sum)
+    ema:     exponential average, new = old + (x - old) / 2**strength
+    median:  median of the last `depth` scans, rejects single spikes
+
+    All history lives in preallocated arrays, one ring of `depth` slots per pot.
+    """
+
+    def __init__(self, channels, mode=POT_FILTER_EMA, depth=5, strength=2):
+        if mode not in (POT_FILTER_AVERAGE, POT_FILTER_EMA, POT_FILTER_MEDIAN):
+            print(f"Unknown pot filter {mode}, using {POT_FILTER_EMA}")
+            mode = POT_FILTER_EMA
+
+        self.mode = mode
+        self.depth = max(1, depth)
+        self.strength = max(0, min(strength, 15))
+
+        self._ring = array("H", [0] * (channels * self.depth))
+        self._index = array("B", [0] * channels)
+        self._sums = array("L", [0] * channels)  # moving average running sums
+        self._ema = array("L", [0] * channels)   # EMA scaled by 2**strength
+        self._sorted = array("H", [0] * self.depth)
+        self._primed = bytearray(channels)
+
+        self.update = {
+            POT_FILTER_AVERAGE: self._update_average,
+            POT_FILTER_EMA: self._update_ema,
+            POT_FILTER_MEDIAN: self._update_median,
+        }[mode]
+
+    def _prime(self, channel, value):
+        """Start from the first reading instead of ramping up from zero."""
+        base = channel * self.depth
+        for i in range(self.depth):
+            self._ring[base + i] = value
+        self._sums[channel] = value * self.depth
+        self._ema[channel] = value << self.strength
+        self._primed[channel] = 1
+
+    def _push(self, channel, value):
+        """Store value in the channel's ring and return the value it replaced."""
+        i = self._index[channel]
+        slot = channel * self.depth + i
+        old = self._ring[slot]
+        self._ring[slot] = value
+        self._index[channel] = i + 1 if i + 1 < self.depth else 0
+        return old
+
+    def _update_average(self, channel, value):
+        if not self._primed[channel]:
+            self._prime(channel, value)
+        total = self._sums[channel] + value - self._push(channel, value)
+        self._sums[channel] = total
+        return total // self.depth
+
+    def _update_ema(self, channel, value):
+        if not self._primed[channel]:
+            self._prime(channel, value)
+        scaled = self._ema[channel]
+        scaled += value - (scaled >> self.strength)
+        self._ema[channel] = scaled
+        return scaled >> self.strength
+
+    def _update_median(self, channel, value):
+        if not self._primed[channel]:
+            self._prime(channel, value)
+        self._push(channel, value)
+
+        # Insertion sort of a copy, depth is small
+        ring = self._ring
+        ordered = self._sorted
+        base = channel * self.depth
+        for i in range(self.depth):
+            item = ring[base + i]
+            j = i
+            while j > 0 and ordered[j - 1] > item:
+                ordered[j] = ordered[j - 1]
+                j -= 1
+            ordered[j] = item
+        return ordered[self.depth // 2]
+
+
+class EncoderAcceleration:
+    """Turns an encoder's detent delta into steps, faster turns giving more steps.
+
+    The rate is taken from the time between passes that saw movement: below
+    `start` detents/s one detent is one step, from there the multiplier rises
+    linearly to `maximum` at `full` detents/s. Fractions carry over to the next
+    movement in the same direction, so nothing is lost to rounding.
+    """
+
+    def __init__(self, start=ENCODER_ACCEL_START, full=ENCODER_ACCEL_FULL, maximum=ENCODER_ACCEL_MAX):
+        self.start = start
+        self.full = max(full, start + 1)
+        self.maximum = max(1, maximum)
+        self.rate = 0.0
+        self._moved_at = 0
+        self._remainder = 0.0
+
+    @classmethod
+    def from_config(cls, settings):
+        settings = settings or {}
+        return cls(settings.get("start", ENCODER_ACCEL_START), settings.get("full", ENCODER_ACCEL_FULL),
+                   settings.get("max", ENCODER_ACCEL_MAX))
+
+    def steps(self, delta):
+        now = time.monotonic_ns()
+        elapsed = now - self._moved_at
+        self._moved_at = now
+
+        if elapsed >= ENCODER_IDLE_NS:
+            self.rate = 0.0
+            self._remainder = 0.0
+        else:
+            rate = abs(delta) * 1000000000 / elapsed
+            self.rate = (self.rate + rate) / 2  # light smoothing, poll jitter is large
+
+        multiplier = 1.0
+        if self.maximum > 1 and self.rate > self.start:
+            position = min(1.0, (self.rate - self.start) / (self.full - self.start))
+            multiplier += (self.maximum - 1) * position
+
+        if (self._remainder < 0) != (delta < 0):
+            self._remainder = 0.0  # direction changed
+        total = delta * multiplier + self._remainder
+        steps = int(total)
+        self._remainder = total - steps
+        return steps
+
+
+class HidScheduler:
+    """Single task that sends every keyboard and consumer report.
+
+    The scan only queues events and never waits on USB. A press or release is
+    one report with all keys of the chord; a tap (encoder step) is a press and
+    a release report, and taps of the same keys queued back to back merge into
+    one counted repeat. Reports are paced to the endpoint's poll interval.
+    """
+
+    def __init__(self, keyboard, consumer, interval_ms=HID_REPORT_INTERVAL_MS):
+        self.keyboard = keyboard
+        self.consumer = consumer
+        self.interval = interval_ms / 1000
+        self._queue = []  # [kind, op, codes, count]
+        self._wakeup = asyncio.Event()
+        self.reset_counters()
+
+    def reset_counters(self):
+        self.reports = 0
+        self.merged = 0
+        self.dropped = 0
+
+    def press(self, kind, codes):
+        self._queue_event(kind, HID_PRESS, codes, 1)
+
+    def release(self, kind, codes):
+        self._queue_event(kind, HID_RELEASE, codes, 1)
+
+    def tap(self, kind, codes, count=1):
+        if self._queue:
+            last = self._queue[-1]
+            if last[1] == HID_TAP and last[0] == kind and last[2] == codes:
+                merged = min(count, HID_MAX_REPEATS - last[3])
+                last[3] += merged
+                self.merged += merged
+                self.dropped += count - merged
+                return
+        self._queue_event(kind, HID_TAP, codes, min(count, HID_MAX_REPEATS))
+
+    def _queue_event(self, kind, op, codes, count):
+        if len(self._queue) >= HID_QUEUE_MAX and op != HID_RELEASE:
+            self.dropped += count
+            return
+        self._queue.append([kind, op, codes, count])
+        self._wakeup.set()
+
+    def _report(self, kind, op, codes):
+        try:
+            if kind == ACTION_KEYBOARD:
+                if op == HID_PRESS:
+                    self.keyboard.press(*codes)
+                else:
+                    self.keyboard.release(*codes)
+            elif op == HID_PRESS:
+                self.consumer.press(codes[0])
+            else:
+                self.consumer.release()
+            self.reports += 1
+        except OSError as e:
+            print(f"HID report error: {e}")  # host not ready (e.g. asleep)
+
+    async def run(self):
+        while True:
+            if not self._queue:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            event = self._queue[0]
+            kind, op, codes = event[0], event[1], event[2]
+            if op == HID_TAP:
+                self._report(kind, HID_PRESS, codes)
+                await asyncio.sleep(self.interval)
+                self._report(kind, HID_RELEASE, codes)
+                event[3] -= 1
+                if event[3] <= 0:
+                    self._queue.pop(0)
+            else:
+                self._report(kind, op, codes)
+                self._queue.pop(0)
+
+            await asyncio.sleep(self.interval)
+
 
 class MacroPad:
-    def __init__(self, multiplexer, configfile_manager, midi_manager):
+    def __init__(self, multiplexer, configfile_manager, midi_manager, data_link):
         self.multiplexer = multiplexer
         self.configfile_manager = configfile_manager
         self.midi_manager = midi_manager
-        self.kbd = Keyboard(usb_hid.devices)
-        self.consumer = ConsumerControl(usb_hid.devices)
+        self.data_link = data_link
+        self.hid = HidScheduler(Keyboard(usb_hid.devices), ConsumerControl(usb_hid.devices),
+                                configfile_manager.get("hid_report_interval_ms", HID_REPORT_INTERVAL_MS))
+        LOOP_STATS.hid = self.hid
         self.kbd_layout = None
         self.rotary_layout = None
 
         # Constants
-        self.BUTTON_COUNT = 16
+        self.BUTTON_COUNT = LAYOUT_BUTTONS
         self.POT_COUNT = 8
-        self.ENC_BTN_COUNT = 4
+        self.ENC_BTN_COUNT = LAYOUT_ENCODERS
+        self.POT_SAMPLES = max(1, self.configfile_manager.get("pot_oversample", 10))
         self.BTN_THRESHOLD_LOW = 5000
         self.BTN_THRESHOLD_HIGH = 50000
         self.midi_enc_values = [64] * self.ENC_BTN_COUNT
 
+        # One setting for all encoders or a list with one per encoder
+        accel = self.configfile_manager.get("encoder_acceleration")
+        if not isinstance(accel, list):
+            accel = [accel] * self.ENC_BTN_COUNT
+        self.encoder_accel = [EncoderAcceleration.from_config(accel[i] if i < len(accel) else None)
+                              for i in range(self.ENC_BTN_COUNT)]
+
+        # Indexed by action kind
+        self._press_handlers = (self._ignore, self._press_keyboard, self._press_consumer, self._press_midi)
+        self._release_handlers = (self._ignore, self._release_keyboard, self._release_consumer,
+                                  self._release_midi)
+        self._turn_handlers = (self._ignore_turn, self._turn_keyboard, self._turn_consumer, self._turn_midi)
+
+        self._midi_layout = self._build_midi_layout()
+
         last_layout = self.configfile_manager.get("last_layout")
-        layout_names = self.configfile_manager.keyboard_layouts_names()
-        layout_names.append(MIDI_CONTROLLER_NAME)
-        index = layout_names.index(last_layout)
-        
-        self.current_layout = last_layout
+        if last_layout != MIDI_CONTROLLER_NAME and last_layout not in self.configfile_manager.layouts:
+            last_layout = self.configfile_manager.layout_names[0]  # same fallback as the layout page
+        self.use_layout(last_layout)
         print("CURRENT LAYOUT: ", self.current_layout)
-        
-        if self.current_layout != MIDI_CONTROLLER_NAME:
 
-            current_kbd_layout, current_rotary_layout = (self.configfile_manager.
-                                   keyboard_layout_values(index, last_layout))
-    
-            self.update_keyboard_layout(current_kbd_layout)
-            self.update_rotary_layout(current_rotary_layout)
+        # One scan reads buttons (chip 0), then pots and encoder buttons (chip 1)
+        # into scan_values: slots [buttons | pots | encoder buttons]
+        self.POT_SLOT = self.BUTTON_COUNT
+        self.ENC_BTN_SLOT = self.BUTTON_COUNT + self.POT_COUNT
+        scan_channels = [(i, i, 0, 1) for i in range(self.BUTTON_COUNT)]
+        scan_channels += [(self.POT_SLOT + i, i, 1, self.POT_SAMPLES) for i in range(self.POT_COUNT)]
+        scan_channels += [(self.ENC_BTN_SLOT + i, self.POT_COUNT + i, 1, 1) for i in range(self.ENC_BTN_COUNT)]
+        self.scan_plan = self.multiplexer.build_scan_plan(scan_channels)
+        self.scan_values = array("H", [0] * len(scan_channels))
+        self.pot_filter = PotFilter(self.POT_COUNT,
+                                    self.configfile_manager.get("pot_filter", POT_FILTER_EMA),
+                                    self.configfile_manager.get("pot_filter_depth", 5),
+                                    self.configfile_manager.get("pot_filter_strength", 2))
 
         # Initialize states
         self.pot_values = [0] * self.POT_COUNT
@@ -687,20 +1230,21 @@ class MacroPad:
         self.encoder_button_states = [{"value": 0, "pressed": False} for _ in range(self.ENC_BTN_COUNT)]
 
     async def update_values(self):
+        timer = LOOP_STATS.timers[TASK_SCAN]
         while True:
             try:
+                started = time.monotonic_ns()
+                self.multiplexer.scan(self.scan_plan, self.scan_values)
                 await self._update_buttons()
                 await self._update_pots()
                 await self._update_encoder_buttons()
 
                 if ConfigFileManager.print_pot_values:
-                    pot_values_str = "|".join(
-                        str(int(interp(val, [0, 63535], [0, 4095])[0]))
-                        for val in self.pot_values
-                    )
-                    # print(pot_values_str)
-                    usb_cdc.data.write(f"{pot_values_str}\n".encode())
+                    self.data_link.send_pots(self.pot_values)
+                self.midi_manager.flush()  # everything this scan produced, one USB write
 
+                LOOP_STATS.sample_heap()
+                timer.record(started)
                 await asyncio.sleep(0.01)
             except Exception as e:
                 print(f"Update error: {e}")
@@ -708,67 +1252,40 @@ class MacroPad:
 
     async def _update_buttons(self):
         for i in range(self.BUTTON_COUNT):
-            value = self.multiplexer.read_channel(i, 0)
-            self._process_button(i, value)
-            await asyncio.sleep(0.001)
+            self._process_button(i, self.scan_values[i])
+        await asyncio.sleep(0)
 
     async def _update_pots(self):
         for i in range(self.POT_COUNT):
             try:
-                readings = [self.multiplexer.read_channel(i, 1) for _ in range(10)]
-                self.pot_values[i] = sum(readings) // len(readings)  # Avoid division by zero
+                # Oversampled by the scan, smoothed across scans by the filter
+                self.pot_values[i] = self.pot_filter.update(i, self.scan_values[self.POT_SLOT + i])
 
                 if self.current_layout == MIDI_CONTROLLER_NAME:
-                    self._process_pots(i)
+                    self.midi_manager.send_pot(i, self.pot_values[i])
 
-                await asyncio.sleep(0.001)
             except Exception as e:
                 print(f"Potentiometer read error: {e}")
+        await asyncio.sleep(0)
 
     async def _update_encoder_buttons(self):
         for i in range(self.ENC_BTN_COUNT):
-            value = self.multiplexer.read_channel(i + self.POT_COUNT, 1)
-            await asyncio.sleep(0.001)
-            self._process_encoder_button(i, value)
-
-    def _process_pots(self, index):
-        value = self.pot_values[index]
-        value = int(interp(value, [0, 63535], [0, 127])[0])
-        self.midi_manager.send_pots_value(index, value)
+            self._process_encoder_button(i, self.scan_values[self.ENC_BTN_SLOT + i])
+        await asyncio.sleep(0)
 
     def _process_button(self, index, value):
         state = self.button_states[index]
 
         if value < self.BTN_THRESHOLD_LOW and not state["pressed"]:
             print(f"Button {index} pressed")
-
-            if self.current_layout != MIDI_CONTROLLER_NAME:
-                for btns in self.kbd_layout[index]:
-                    if btns is not None:
-                        if btns in KC.__dict__.values():
-                            self.kbd.press(btns)
-                        elif btns in CC.__dict__.values():
-                            self.consumer.press(btns)
-
-            else:
-                self.midi_manager.send_btn_value(self.BUTTON_COUNT + index, 127)
-
+            kind, codes = self.kbd_layout[index]
+            self._press_handlers[kind](codes)
             state["pressed"] = True
 
         elif value > self.BTN_THRESHOLD_HIGH and state["pressed"]:
             print(f"Button {index} released")
-
-            if self.current_layout != MIDI_CONTROLLER_NAME:
-                for btns in self.kbd_layout[index]:
-                    if btns is not None:
-                        if btns in KC.__dict__.values():
-                            self.kbd.release(btns)
-                        elif btns in CC.__dict__.values():
-                            self.consumer.release()
-
-            else:
-                self.midi_manager.send_btn_value(self.BUTTON_COUNT + index, 127)
-
+            kind, codes = self.kbd_layout[index]
+            self._release_handlers[kind](codes)
             state["pressed"] = False
 
     def _process_encoder_button(self, index, value):
@@ -776,145 +1293,572 @@ class MacroPad:
 
         if value < self.BTN_THRESHOLD_LOW and not state["pressed"]:
             print(f"Encoder button {index} pressed")
-
-            if self.current_layout != MIDI_CONTROLLER_NAME:
-                for btns in self.rotary_layout[3 * index + 1]:  # AP formula
-                    if btns is not None:
-                        if btns in KC.__dict__.values():
-                            self.kbd.press(btns)
-                        elif btns in CC.__dict__.values():
-                            self.consumer.press(btns)
-
-            else:
-                self.midi_manager.send_btn_value(self.BUTTON_COUNT + index, 127)
-
+            kind, codes = self.rotary_layout[3 * index + 1]  # AP formula
+            self._press_handlers[kind](codes)
             state["pressed"] = True
 
         elif value > self.BTN_THRESHOLD_HIGH and state["pressed"]:
             print(f"Encoder button {index} released")
+            kind, codes = self.rotary_layout[3 * index + 1]  # AP formula
+            self._release_handlers[kind](codes)
+            state["pressed"] = False
 
-            if self.current_layout != MIDI_CONTROLLER_NAME:
-                for btns in self.rotary_layout[3 * index + 1]:  # AP formula
-                    if btns is not None:
-                        if btns in KC.__dict__.values():
-                            self.kbd.release(btns)
-                        elif btns in CC.__dict__.values():
-                            self.consumer.release()
+    def process_enc_direction(self, index, delta):
+        """Called by the rotary manager with every detent counted since its last pass."""
+        steps = self.encoder_accel[index].steps(delta)
+        if steps < 0:  # Left turn on the encoder
+            kind, codes = self.rotary_layout[3 * index]
+            self._turn_handlers[kind](codes, steps)
 
-            else:
-                self.midi_manager.send_btn_value(self.BUTTON_COUNT + index, 0)
+        elif steps > 0:  # Right turn on the encoder
+            kind, codes = self.rotary_layout[3 * index + 2]
+            self._turn_handlers[kind](codes, steps)
 
-            state["pressed"] = False
+    def _ignore(self, codes):
+        pass
 
-    def process_enc_direction(self, index, direction):
-        # function called in rotary enc manager
+    def _ignore_turn(self, codes, steps):
+        pass
 
-        if direction == -1:  # Left turn on the encoder
-            if self.current_layout != MIDI_CONTROLLER_NAME:
-                keys_to_press = [vals for vals in self.rotary_layout[3 * index] if vals is not None]
+    def _press_keyboard(self, codes):
+        self.hid.press(ACTION_KEYBOARD, codes)
 
-                if keys_to_press and keys_to_press[0] is not None:
-                    if keys_to_press[0] in KC.__dict__.values():
-                        for key in keys_to_press:
-                            self.kbd.send(key)
+    def _release_keyboard(self, codes):
+        self.hid.release(ACTION_KEYBOARD, codes)
 
-                    elif keys_to_press[0] in CC.__dict__.values():
-                        for key in keys_to_press:
-                            self.consumer.send(key)
+    def _press_consumer(self, codes):
+        self.hid.press(ACTION_CONSUMER, codes)
 
-            else:
-                self.midi_enc_values[index] = max(0, self.midi_enc_values[index] - 1)
-                self.midi_manager.send_enc_value(index, self.midi_enc_values[index])
+    def _release_consumer(self, codes):
+        self.hid.release(ACTION_CONSUMER, codes)
 
-        if direction == 1:  # Right turn on the encoder
-            if self.current_layout != MIDI_CONTROLLER_NAME:
-                keys_to_press = [vals for vals in self.rotary_layout[3 * index + 2] if vals is not None]
+    def _press_midi(self, codes):
+        self.midi_manager.send_btn_value(codes[0], 127)
 
-                if keys_to_press and keys_to_press[0] is not None:
-                    if keys_to_press[0] in KC.__dict__.values():
-                        for key in keys_to_press:
-                            self.kbd.send(key)
+    def _release_midi(self, codes):
+        self.midi_manager.send_btn_value(codes[0], 0)
 
-                    elif keys_to_press[0] in CC.__dict__.values():
-                        for key in keys_to_press:
-                            self.consumer.send(key)
+    def _turn_keyboard(self, codes, steps):
+        self.hid.tap(ACTION_KEYBOARD, codes, abs(steps))
 
-            else:
-                self.midi_enc_values[index] = min(127, self.midi_enc_values[index] + 1)
-                self.midi_manager.send_enc_value(index, self.midi_enc_values[index])
+    def _turn_consumer(self, codes, steps):
+        self.hid.tap(ACTION_CONSUMER, codes, abs(steps))
 
-    def update_keyboard_layout(self, layout):
-        self.kbd_layout = {
-            i: [get_correct_keycode(key) for key in layout[i] if get_correct_keycode(key) is not None]
-            for i in range(self.BUTTON_COUNT)
-        }
-        print("keyboard layout updated")
-        # print(self.kbd_layout)
+    def _turn_midi(self, codes, steps):
+        index = codes[0]
+        value = max(0, min(127, self.midi_enc_values[index] + steps))
+        if value != self.midi_enc_values[index]:
+            self.midi_enc_values[index] = value
+            self.midi_manager.send_enc_value(index, value)
 
-    def update_rotary_layout(self, layout):
-        self.rotary_layout = {
-            i: [get_correct_keycode(key) for key in layout[i] if get_correct_keycode(key) is not None]
-            for i in range(self.ENC_BTN_COUNT*3)
-        }
-        print("rotary layout updated")
+    def use_layout(self, name):
+        """Switch layouts; they are precompiled, so this only swaps two references."""
+        if name == MIDI_CONTROLLER_NAME:
+            self.kbd_layout, self.rotary_layout = self._midi_layout
+            self.midi_manager.reset()  # send every pot's position once
+        else:
+            self.kbd_layout, self.rotary_layout = self.configfile_manager.compiled_layout(name)
+        self.current_layout = name
 
+    def _build_midi_layout(self):
+        """Buttons and encoders send MIDI CCs instead of keys."""
+        kbd_layout = tuple((ACTION_MIDI, (i,)) for i in range(self.BUTTON_COUNT))
 
-class MidiManager:
+        rotary_layout = []
+        for i in range(self.ENC_BTN_COUNT):
+            rotary_layout.append((ACTION_MIDI, (i,)))  # left turn: encoder i
+            rotary_layout.append((ACTION_MIDI, (self.BUTTON_COUNT + i,)))  # click: button CC
+            rotary_layout.append((ACTION_MIDI, (i,)))  # right turn
+        return kbd_layout, tuple(rotary_layout)
 
-    def __init__(self):
-        self.midi = adafruit_midi.MIDI(midi_out=usb_midi.ports[1], out_channel=0)
-        self.button_ccs = range(20, 40)
-        self.pot_ccs = range(10, 18)
-        self.encoder_ccs = range(1,5)
 
-    def send_btn_value(self, btn_index, value):
-        self.midi.send(ControlChange(self.button_ccs[btn_index], value))
+class MidiManager:
+    """Control changes, batched into one usb_midi write per scan.
+
+    Pots are change-only: a pot is sent when it moved at least the configured
+    hysteresis, as a 7 bit CC or, with midi_pot_14bit, as an MSB/LSB pair that
+    keeps the filtered ADC's resolution (only the LSB when the MSB is unchanged).
+    Every message carries its status byte: usb_midi packs each event into its
+    own 4 byte USB MIDI packet, where running status would desync the host.
+    """
+
+    def __init__(self, configfile_manager):
+        self.port = usb_midi.ports[1]
+        self.status = MIDI_CONTROL_CHANGE | (max(1, min(16, configfile_manager.get("midi_channel", 1))) - 1)
+        self.button_ccs = configfile_manager.get("midi_button_ccs", MIDI_BUTTON_CCS)
+        self.pot_ccs = configfile_manager.get("midi_pot_ccs", MIDI_POT_CCS)
+        self.encoder_ccs = configfile_manager.get("midi_encoder_ccs", MIDI_ENCODER_CCS)
+        self.pot_hysteresis = configfile_manager.get("midi_pot_hysteresis", 32)  # in 14 bit counts
+
+        # 14 bit only works for controllers 0-31, the others stay 7 bit
+        high_res = configfile_manager.get("midi_pot_14bit", False)
+        self.pot_14bit = [high_res and cc < MIDI_LSB_OFFSET for cc in self.pot_ccs]
+        if high_res and not all(self.pot_14bit):
+            print("14 bit MIDI needs pot CCs below 32, the others send 7 bit")
+
+        self._sent = array("h", [-1] * len(self.pot_ccs))  # last 14 bit value sent per pot
+        self._buffer = bytearray(3 * MIDI_BUFFER_MESSAGES)
+        self._length = 0
+
+        self.messages = 0
+        self.writes = 0
+
+    def reset(self):
+        """Forget what was sent, so every pot goes out again on the next scan."""
+        for i in range(len(self._sent)):
+            self._sent[i] = -1
 
-    def send_pots_value(self, pot_index, value):
-        self.midi.send(ControlChange(self.pot_ccs[pot_index], value))
+    def send_btn_value(self, btn_index, value):
+        self._queue(self.button_ccs[btn_index], value)
 
     def send_enc_value(self, enc_index, value):
-        self.midi.send(ControlChange(self.encoder_ccs[enc_index], value))
+        self._queue(self.encoder_ccs[enc_index], value)
+
+    def send_pot(self, pot_index, raw_value):
+        """raw_value is the filtered 16 bit reading; sends only when it moved."""
+        value = min(16383, raw_value * 16383 // 63535)
+        previous = self._sent[pot_index]
+        if value == previous:
+            return
+        if previous >= 0 and abs(value - previous) < self.pot_hysteresis and value not in (0, 16383):
+            return  # noise; the ends of the travel always get through
+
+        cc = self.pot_ccs[pot_index]
+        if self.pot_14bit[pot_index]:
+            if previous < 0 or value >> 7 != previous >> 7:
+                self._queue(cc, value >> 7)
+            self._queue(cc + MIDI_LSB_OFFSET, value & 0x7F)
+        elif previous < 0 or value >> 7 != previous >> 7:
+            self._queue(cc, value >> 7)
+        else:
+            return  # moved, but not across a 7 bit step
+
+        self._sent[pot_index] = value
+
+    def _queue(self, control, value):
+        if self._length + 3 > len(self._buffer):
+            self.flush()
+
+        buffer = self._buffer
+        n = self._length
+        buffer[n] = self.status
+        buffer[n + 1] = control & 0x7F
+        buffer[n + 2] = value & 0x7F
+        self._length = n + 3
+        self.messages += 1
+
+    def flush(self):
+        if not self._length:
+            return
+        self.port.write(self._buffer, self._length)
+        self.writes += 1
+        self._length = 0
+
+
+class DataLink:
+    """Pad -> host telemetry over usb_cdc.data.
+
+    Binary mode sends [version][type][seq][length][payload][crc16] frames, COBS
+    encoded and terminated by 0x00. ASCII mode keeps the legacy "v1|v2|..." lines.
+    All buffers are preallocated so sending a frame does not allocate.
+    Pot values are only sent when one moved, plus a keepalive, so an idle pad
+    keeps the host idle too.
+    """
+
+    def __init__(self, protocol=PROTOCOL_BINARY, pot_count=8):
+        self.binary = protocol != PROTOCOL_ASCII
+        self.seq = 0
+        self._pots = array("H", [0] * pot_count)  # last values sent
+        self._scaled = array("H", [0] * pot_count)
+        self._pots_sent_at = -POT_KEEPALIVE_S
+
+        raw_size = FRAME_HEADER_SIZE + FRAME_MAX_PAYLOAD + 2
+        self._raw = bytearray(raw_size)
+        self._out = bytearray(raw_size + raw_size // 254 + 2)
+        self._out_view = memoryview(self._out)
+
+        self._crc_table = array("H", [0] * 256)
+        for byte in range(256):
+            crc = byte << 8
+            for _ in range(8):
+                crc = ((crc << 1) ^ 0x1021) if crc & 0x8000 else (crc << 1)
+            self._crc_table[byte] = crc & 0xFFFF
+
+    def send_pots(self, pot_values):
+        if not self._pots_changed(pot_values):
+            return
+
+        if not self.binary:
+            pot_values_str = "|".join(str(val) for val in self._pots)
+            usb_cdc.data.write(f"{pot_values_str}\n".encode())
+            return
+
+        raw = self._raw
+        n = FRAME_HEADER_SIZE
+        for val in self._pots:
+            raw[n] = val & 0xFF
+            raw[n + 1] = val >> 8
+            n += 2
+
+        self._send_frame(FRAME_SLIDERS, n - FRAME_HEADER_SIZE)
+
+    def _pots_changed(self, pot_values):
+        """Scale to 12 bit into _pots and tell whether a frame is due."""
+        changed = False
+        pots = self._pots
+        scaled = self._scaled
+        for i, val in enumerate(pot_values):
+            # Same 0..63535 -> 0..4095 mapping as interp(), in integer math
+            val = min(4095, val * 4095 // 63535)
+            scaled[i] = val
+            if abs(val - pots[i]) >= POT_SEND_HYSTERESIS:
+                changed = True
+
+        now = time.monotonic()
+        if not changed and now - self._pots_sent_at < POT_KEEPALIVE_S:
+            return False
+
+        for i in range(len(pots)):
+            pots[i] = scaled[i]
+        self._pots_sent_at = now
+        return True
+
+    def send_text(self, text):
+        """Send a short status line (bytes, no newline), e.g. b"ALIVE"."""
+        if not self.binary:
+            usb_cdc.data.write(text + b"\n")
+            return
+
+        length = min(len(text), FRAME_MAX_PAYLOAD)
+        self._raw[FRAME_HEADER_SIZE:FRAME_HEADER_SIZE + length] = text[:length]
+        self._send_frame(FRAME_TEXT, length)
+
+    def send_stats(self, stats):
+        """Dump LoopStats: window, heap, GC runs, then passes/max/mean/histogram per task."""
+        if not self.binary:
+            fields = [str(stats.window_ms()), str(gc.mem_free()), str(gc.mem_alloc()), str(stats.gc_runs)]
+            for timer in stats.timers:
+                fields.append(",".join([str(timer.passes), str(timer.max_us), str(timer.mean_us)] +
+                                       [str(count) for count in timer.histogram]))
+            if stats.hid is not None:
+                fields.append(f"HID:{stats.hid.reports},{stats.hid.merged},{stats.hid.dropped}")
+            usb_cdc.data.write(("STATS|" + "|".join(fields) + "\n").encode())
+            return
+
+        # [window_ms u32][mem_free u32][mem_alloc u32][gc_runs u16][tasks u8][buckets u8]
+        # then per task [passes u32][max_us u32][mean_us u32][buckets x u32]
+        # and [hid reports u32][hid merged u32][hid dropped u16], little endian
+        n = self._put(FRAME_HEADER_SIZE, stats.window_ms(), 4)
+        n = self._put(n, gc.mem_free(), 4)
+        n = self._put(n, gc.mem_alloc(), 4)
+        n = self._put(n, stats.gc_runs, 2)
+        n = self._put(n, len(stats.timers), 1)
+        n = self._put(n, STATS_BUCKETS, 1)
+        for timer in stats.timers:
+            n = self._put(n, timer.passes, 4)
+            n = self._put(n, timer.max_us, 4)
+            n = self._put(n, timer.mean_us, 4)
+            for count in timer.histogram:
+                n = self._put(n, count, 4)
+        if stats.hid is not None:
+            n = self._put(n, stats.hid.reports, 4)
+            n = self._put(n, stats.hid.merged, 4)
+            n = self._put(n, stats.hid.dropped, 2)
+
+        self._send_frame(FRAME_STATS, n - FRAME_HEADER_SIZE)
+
+    def _put(self, n, value, size):
+        """Store value little endian at _raw[n:n + size], saturating; return the next index."""
+        value = min(value, (1 << (8 * size)) - 1)
+        for i in range(size):
+            self._raw[n + i] = (value >> (8 * i)) & 0xFF
+        return n + size
+
+    def _send_frame(self, frame_type, length):
+        raw = self._raw
+        raw[0] = PROTOCOL_VERSION
+        raw[1] = frame_type
+        raw[2] = self.seq
+        raw[3] = length
+        self.seq = (self.seq + 1) & 0xFF
+
+        n = FRAME_HEADER_SIZE + length
+        crc = self.crc16(raw, n)
+        raw[n] = crc & 0xFF
+        raw[n + 1] = crc >> 8
+
+        size = self._cobs_encode(n + 2)
+        usb_cdc.data.write(self._out_view[:size])
+
+    def crc16(self, data, length):
+        """CRC-16/CCITT-FALSE of data[:length], shared with the host's serial_protocol."""
+        table = self._crc_table
+        crc = 0xFFFF
+        for i in range(length):
+            crc = ((crc << 8) & 0xFFFF) ^ table[(crc >> 8) ^ data[i]]
+        return crc
+
+    def _cobs_encode(self, length):
+        """COBS encode _raw[:length] into _out, append the 0x00 delimiter, return size."""
+        raw = self._raw
+        out = self._out
+        code_index = 0
+        code = 1
+        o = 1
+        for i in range(length):
+            byte = raw[i]
+            if byte == 0:
+                out[code_index] = code
+                code_index = o
+                o += 1
+                code = 1
+            else:
+                out[o] = byte
+                o += 1
+                code += 1
+                if code == 0xFF:
+                    out[code_index] = code
+                    code_index = o
+                    o += 1
+                    code = 1
+
+        out[code_index] = code
+        out[o] = 0
+        return o + 1
+
+
+class AlbumArtReceiver:
+    """Receives the host's chunked IMG|... bitmap upload (see thumbnail.py on the host).
+
+    The bitmap is assembled in one preallocated buffer. Every reply carries the
+    offset expected next, so the host can resend a lost or corrupt chunk or
+    resume after a reconnect without starting over.
+    """
+
+    def __init__(self, display_manager, data_link):
+        self.display_manager = display_manager
+        self.data_link = data_link
+        self.buffer = bytearray((ALBUM_ART_MAX_SIZE + 7) // 8 * ALBUM_ART_MAX_SIZE)
+        self.image_id = None
+        self.width = 0
+        self.height = 0
+        self.size = 0
+        self.crc = 0
+        self.offset = 0
+
+    def _reply(self, ok, image_id, offset):
+        kind = "ACK" if ok else "NAK"
+        self.data_link.send_text(f"IMG|{kind}|{image_id}|{offset}".encode())
+
+    def handle(self, data):
+        parts = data.split('|')
+        command = parts[1]
+
+        if command == "CLEAR":
+            self.image_id = None
+            self.display_manager.clear_album_art()
+            return
+
+        image_id = int(parts[2])
+        if command == "BEGIN":
+            width, height, size = int(parts[3]), int(parts[4]), int(parts[5])
+            if (width > ALBUM_ART_MAX_SIZE or height > ALBUM_ART_MAX_SIZE
+                    or size != (width + 7) // 8 * height):
+                self._reply(False, image_id, -1)
+                return
+            self.image_id = image_id
+            self.width, self.height, self.size = width, height, size
+            self.crc = int(parts[6])
+            self.offset = 0
+            self._reply(True, image_id, 0)
+            return
+
+        if image_id != self.image_id:
+            # Lost the image (e.g. the pad restarted), the host has to begin again
+            self._reply(False, image_id, -1)
+            return
+
+        if command == "DATA":
+            offset = int(parts[3])
+            if offset == self.offset:
+                chunk = binascii.a2b_base64(parts[4])
+                if (len(chunk) and offset + len(chunk) <= self.size
+                        and self.data_link.crc16(chunk, len(chunk)) == int(parts[5])):
+                    self.buffer[offset:offset + len(chunk)] = chunk
+                    self.offset += len(chunk)
+                    self._reply(True, image_id, self.offset)
+                    return
+            self._reply(False, image_id, self.offset)
+
+        elif command == "RESUME":
+            self._reply(True, image_id, self.offset)
+
+        elif command == "END":
+            if self.offset != self.size or self.data_link.crc16(self.buffer, self.size) != self.crc:
+                self.image_id = None
+                self._reply(False, image_id, -1)
+                return
+            self.display_manager.set_album_art(self.width, self.height, self.buffer)
+            self._reply(True, image_id, self.size)
+
+
+class LineAssembler:
+    """Newline framing of the host's command stream in one bounded buffer.
+
+    feed() takes whatever bytes arrived and returns the complete lines, so a
+    partial line never blocks. A line longer than the buffer is dropped up to
+    its newline, and lines that are not valid UTF-8 are dropped too.
+    """
+
+    def __init__(self, size=SERIAL_LINE_MAX):
+        self.buffer = bytearray(size)
+        self.length = 0
+        self.discarding = False  # inside an oversized line
+
+        self.lines = 0
+        self.oversized = 0
+        self.garbage = 0
+
+    def feed(self, data):
+        lines = []
+        start = 0
+        count = len(data)
+        while start < count:
+            end = data.find(b"\n", start, count)
+            last = end < 0
+            if last:
+                end = count
+
+            size = end - start
+            if not self.discarding:
+                if self.length + size > len(self.buffer):
+                    self.discarding = True
+                    self.oversized += 1
+                else:
+                    self.buffer[self.length:self.length + size] = data[start:end]
+                    self.length += size
+
+            if last:
+                break
 
+            if not self.discarding:
+                line = self._decode()
+                if line:
+                    lines.append(line)
+            self.discarding = False
+            self.length = 0
+            start = end + 1
+
+        return lines
+
+    def _decode(self):
+        try:
+            line = str(self.buffer[:self.length], "utf-8").strip()
+        except UnicodeError:
+            self.garbage += 1
+            return None
+        self.lines += 1
+        return line
 
 
 class SerialManager:
-    def __init__(self, display_manager):
+    def __init__(self, display_manager, data_link):
         self.display_manager = display_manager
         self.rtc_manager = display_manager.rtc_manager
+        self.data_link = data_link
+        self.album_art = AlbumArtReceiver(display_manager, data_link)
+
+        usb_cdc.data.timeout = 0  # reads return what is there, never wait for more
+        self.assembler = LineAssembler()
+        self.unknown = 0
+        self.failed = 0
+
+        # Command word (text before the first "|") -> handler(line)
+        self.commands = {
+            "PING": self._on_ping,
+            "TITLE": self._on_title,
+            "IMG": self.album_art.handle,
+            "STATS": self._on_stats,
+            "CLOCK": self._on_clock,
+            "RTC": self._on_rtc,
+        }
 
     async def handle_serial(self):
+        timer = LOOP_STATS.timers[TASK_SERIAL]
+        idle = SERIAL_IDLE_MIN
         while True:
+            started = time.monotonic_ns()
+            received = 0
             try:
-                if usb_cdc.data.in_waiting > 0:
-                    data = usb_cdc.data.readline().decode().strip()
-                    await self._process_serial_data(data)
+                waiting = usb_cdc.data.in_waiting
+                if waiting > 0:
+                    data = usb_cdc.data.read(min(waiting, SERIAL_CHUNK))
+                    received = len(data)
+                    for line in self.assembler.feed(data):
+                        self._process_serial_data(line)
             except Exception as e:
                 print(f"Serial error: {e}")
-            await asyncio.sleep(0)
-
-    async def _process_serial_data(self, data):
-        if data.startswith("PING"):
-            usb_cdc.data.write(b"ALIVE\n")
+            timer.record(started)
 
-        elif data.startswith("TITLE"):
-            title_data = data.split('|')
-            self.display_manager.main_title = title_data[1]
-            self.display_manager.sub_title = title_data[3]
-            self.display_manager.is_media_title_changed = True
+            if received:
+                idle = SERIAL_IDLE_MIN
+                await asyncio.sleep(0)  # more may be waiting, come straight back
+            else:
+                await asyncio.sleep(idle)
+                idle = min(idle * 2, SERIAL_IDLE_MAX)
 
-        elif data.startswith("CLOCK"):
-            data = data.split('|')
-            hour = data[1]
-            minute = data[2]
-            sec = data[3]
-            date = data[4]
-            month = data[5]
-            year = data[6]
-            week_day = data[7]
+    def _process_serial_data(self, data):
+        separator = data.find("|")
+        handler = self.commands.get(data if separator < 0 else data[:separator])
+        if handler is None:
+            self.unknown += 1
+            return
 
-            print("setting time triggered")
-            self.rtc_manager.set_time(hour, minute, date, month, year,sec, week_day)
+        try:
+            handler(data)
+        except Exception as e:  # one bad line must not cost the rest of the read
+            self.failed += 1
+            print(f"Bad command {data[:16]}: {e}")
+
+    def _on_ping(self, data):
+        # "PING|<seq>" is the host's clock sync and also wants our clock in ms,
+        # with how long it has run on monotonic_ns since the DS1307 was read
+        parts = data.split("|")
+        if len(parts) > 1:
+            rtc = self.rtc_manager
+            self.data_link.send_text(f"ALIVE|{parts[1]}|{rtc.now_ms()}|{rtc.snapshot_age_ms()}".encode())
+        else:
+            self.data_link.send_text(b"ALIVE")
+
+    def _on_rtc(self, data):
+        # "RTC|RESYNC": read the DS1307 again, the host's clock sync measures after it
+        if data == "RTC|RESYNC":
+            self.rtc_manager.request_resync()
+
+    def _on_title(self, data):
+        title_data = data.split('|')
+        self.display_manager.main_title = title_data[1]
+        self.display_manager.sub_title = title_data[3]
+        self.display_manager.is_media_title_changed = True
+
+    def _on_stats(self, data):
+        # "STATS" dumps the counters, "STATS|RESET" also starts a new window
+        self.data_link.send_stats(LOOP_STATS)
+        if data.endswith("|RESET"):
+            LOOP_STATS.reset()
+
+    def _on_clock(self, data):
+        data = data.split('|')
+        hour = data[1]
+        minute = data[2]
+        sec = data[3]
+        date = data[4]
+        month = data[5]
+        year = data[6]
+        week_day = data[7]
+
+        print("setting time triggered")
+        self.rtc_manager.set_time(hour, minute, date, month, year,sec, week_day)
 
 
 class RotaryManager:
@@ -946,10 +1890,13 @@ class RotaryManager:
         return encoders
 
     async def process_encoders(self):
+        timer = LOOP_STATS.timers[TASK_ENCODERS]
         while True:
             try:
+                started = time.monotonic_ns()
                 await self._process_control_encoder()
                 await self._process_subsidiary_encoders()
+                timer.record(started)
                 await asyncio.sleep(0.01)
             except Exception as e:
                 print(f"Encoder error: {e}")
@@ -974,25 +1921,56 @@ class RotaryManager:
             position = encoder.position
 
             if position != self.previous_positions[i]:
-
-                if position > self.previous_positions[i]:
-                    self.macropad_manager.process_enc_direction(i-1, 1)
-
-                else:
-                    self.macropad_manager.process_enc_direction(i-1, -1)
-
+                # Keep the whole delta, fast turns move several detents between passes
+                self.macropad_manager.process_enc_direction(i - 1, position - self.previous_positions[i])
                 self.previous_positions[i] = 0
                 encoder.position = 0
 
+        self.macropad_manager.midi_manager.flush()
         await asyncio.sleep(0.001)
 
 
 
 class RTCManager:
-    def __init__(self, sda, scl):
+    """DS1307 time from a snapshot.
+
+    The chip is read once and the time then advances on monotonic_ns, so
+    current_time() costs no I2C traffic. run() re-reads the chip every
+    resync_s seconds, catching its seconds tick so the snapshot is good to
+    half of RTC_EDGE_POLL_S instead of a whole second. The host's clock sync
+    asks for a resync with request_resync() before it measures, so what it
+    sees is the chip's time and not the Pico crystal's.
+    """
+
+    def __init__(self, sda, scl, resync_s=RTC_RESYNC_S):
         self.i2c = busio.I2C(scl, sda)
         self.rtc = adafruit_ds1307.DS1307(self.i2c)
         self.days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+        self.resync_s = resync_s
+
+        self.reads = 0
+        self.changes = 0  # bumped by set_time so waiting tasks notice
+        self._resyncing = False
+        self._snapshot(self._read_chip())
+
+    def _read_chip(self):
+        self.reads += 1
+        return time.mktime(self.rtc.datetime)
+
+    def _snapshot(self, secs, at_ns=None):
+        self.base_secs = secs
+        self.base_ns = time.monotonic_ns() if at_ns is None else at_ns
+
+    def now(self):
+        """Seconds since the epoch, advanced from the last snapshot."""
+        return self.base_secs + (time.monotonic_ns() - self.base_ns) // 1000000000
+
+    def now_ms(self):
+        return self.base_secs * 1000 + (time.monotonic_ns() - self.base_ns) // 1000000
+
+    def snapshot_age_ms(self):
+        """How long now() has been running on monotonic_ns since the chip was read or set."""
+        return (time.monotonic_ns() - self.base_ns) // 1000000
 
     def set_time(self, hour, minute, date, month, year, sec=0, week_day=-1):
         """
@@ -1004,21 +1982,69 @@ class RTCManager:
             # Calculate day of week if not provided
             week_day = self._get_day_of_week(date, month, year)
 
-        self.rtc.datetime = time.struct_time((int(year), int(month), int(date),
-                                              int(hour), int(minute), int(sec),
-                                              int(week_day), -1, -1))
+        new_time = time.struct_time((int(year), int(month), int(date),
+                                     int(hour), int(minute), int(sec),
+                                     int(week_day), -1, -1))
+        set_ns = time.monotonic_ns()
+        self.rtc.datetime = new_time  # writing the seconds restarts the chip's second
+        self._snapshot(time.mktime(new_time), set_ns)
+        self.changes += 1
 
     def current_time(self):
-        """Get current time from RTC"""
-        hour = self.rtc.datetime.tm_hour
-        minute = self.rtc.datetime.tm_min
-        sec = self.rtc.datetime.tm_sec
-        date = self.rtc.datetime.tm_mday
-        month = self.rtc.datetime.tm_mon
-        year = self.rtc.datetime.tm_year
-        day = self.days[self.rtc.datetime.tm_wday]
+        """Get current time from the snapshot"""
+        now = time.localtime(self.now())
+        return now.tm_hour, now.tm_min, now.tm_mday, now.tm_mon, now.tm_year, self.days[now.tm_wday]
+
+    async def resync(self):
+        """Take a new snapshot at the chip's next seconds tick."""
+        if self._resyncing:
+            return
+        self._resyncing = True
+        try:
+            changes = self.changes
+            before_ns = time.monotonic_ns()
+            first = self._read_chip()
+            give_up_ns = before_ns + 1500000000
+            while True:
+                await asyncio.sleep(RTC_EDGE_POLL_S)
+                read_ns = time.monotonic_ns()
+                secs = self._read_chip()
+                if secs != first or read_ns > give_up_ns:
+                    break
+                before_ns = read_ns
+
+            if self.changes == changes:  # otherwise set_time's snapshot is newer
+                # The tick came between the last two reads, take the middle
+                self._snapshot(secs, (before_ns + read_ns) // 2 if secs != first else read_ns)
+        finally:
+            self._resyncing = False
+
+    def request_resync(self):
+        """Resync in the background now, e.g. for the host's clock sync."""
+        if not self._resyncing:
+            asyncio.create_task(self._resync_logged())
+
+    async def _resync_logged(self):
+        # A failed read keeps the old snapshot, resync's finally lets the next one run
+        try:
+            await self.resync()
+        except Exception as e:
+            print(f"RTC read error: {e}")
 
-        return hour, minute, date, month, year, day
+    async def run(self):
+        while True:
+            await self._resync_logged()
+            await asyncio.sleep(self.resync_s)
+
+    async def wait_next_minute(self):
+        """Sleep until the next minute starts, or until the time is set."""
+        changes = self.changes
+        target = (self.now() // 60 + 1) * 60
+        while self.changes == changes:
+            remaining_ns = (target - self.base_secs) * 1000000000 - (time.monotonic_ns() - self.base_ns)
+            if remaining_ns <= 0:
+                return
+            await asyncio.sleep(min(remaining_ns / 1e9, RTC_WAKE_SLICE_S))
 
     def _get_day_of_week(self, day, month, year):
         """Calculate day of week using Zeller's Congruence algorithm"""
@@ -1037,13 +2063,38 @@ class RTCManager:
         return day_of_week
 
 class ConfigFileManager:
+    """config.json and the keyboard layouts.
+
+    Settings are written behind: set() only marks a key dirty and run()
+    saves once nothing changed for CONFIG_SAVE_DELAY_S, so paging through
+    the display costs no flash writes. save() replaces the file through a
+    temp file and skips content that is already on the drive.
+    """
 
     def __init__(self):
         self.config_file_pth = "/config.json"
+        self.config_tmp_pth = self.config_file_pth + ".tmp"
         self.keyboard_file_pth = "/keyboard_layouts.json"
+        self.layout_cache_pth = "/keyboard_layouts.bin"
 
         self.config_data = self._load_json(self.config_file_pth)
-        self.keyboard_data = self._load_json(self.keyboard_file_pth)
+        self._saved_json = json.dumps(self.config_data)
+        self.dirty = set()  # keys changed since the last save
+        self._changed_at = 0
+        if not self.config_data:
+            # Power lost between remove and rename in save() leaves only the temp file;
+            # run from it and let run() write config.json back
+            self.config_data = self._load_json(self.config_tmp_pth)
+            self.dirty.update(self.config_data)
+            self._changed_at = time.monotonic()
+        self.readonly = False  # set by the first save that hits a read-only drive
+        self.writes = 0
+
+        self.keyboard_data = {}  # only parsed when the layout cache is stale
+        self.layout_names = []
+        self.layouts = {}  # name -> (button records, rotary records)
+        self._empty_layout = ((NO_ACTION,) * LAYOUT_BUTTONS, (NO_ACTION,) * (LAYOUT_ENCODERS * 3))
+        self._load_layouts()
 
         # self.keyboard_layout_values(0, "DEFAULT")
 
@@ -1062,22 +2113,173 @@ class ConfigFileManager:
         return self.config_data.get(key, default)
 
     def set(self, key, value):
-        """Set a value in the JSON data (memory only)."""
+        """Set a value in the JSON data, run() writes it to the file later."""
+        if key in self.config_data and self.config_data[key] == value:
+            return
         self.config_data[key] = value
+        self.dirty.add(key)
+        self._changed_at = time.monotonic()
 
     def save(self):
-        """Write the JSON data back to the file safely."""
-        json_string = json.dumps(self.config_data)  # Convert dict to JSON string
+        """Write the JSON data to the file now. True if the file was written."""
+        if self.readonly:
+            return False
+
+        json_string = json.dumps(self.config_data)
+        if json_string == self._saved_json:
+            self.dirty.clear()  # changed and changed back
+            return False
+
+        try:
+            with open(self.config_tmp_pth, "w") as file:
+                file.write(json_string)
+            try:
+                os.remove(self.config_file_pth)  # FAT rename does not overwrite
+            except OSError:
+                pass
+            os.rename(self.config_tmp_pth, self.config_file_pth)
+        except OSError as e:
+            if e.args and e.args[0] == EROFS:
+                # Read-only filesystem (see boot.py): keep the settings in memory only
+                self.readonly = True
+                print(f"Config is read-only, not saving {', '.join(sorted(self.dirty))}")
+            else:
+                print(f"Config not saved: {e}")
+                self._changed_at = time.monotonic()  # try again after another quiet period
+            return False
 
-        # Overwrite file completely to avoid null characters
-        with open(self.config_file_pth, "w") as file:
-            file.write(json_string)  # Write the JSON string directly
+        self._saved_json = json_string
+        self.dirty.clear()
+        self.writes += 1
+        return True
+
+    async def run(self):
+        while True:
+            wait = CONFIG_SAVE_DELAY_S
+            if self.dirty and not self.readonly:
+                wait -= time.monotonic() - self._changed_at
+                if wait <= 0:
+                    self.save()
+                    wait = CONFIG_SAVE_DELAY_S
+            await asyncio.sleep(wait)
 
     def print_pot_values(self):
         return self.config_data["print_pot_values"]
 
     def keyboard_layouts_names(self):
-        return list(self.keyboard_data.keys())
+        return list(self.layout_names)
+
+    def compiled_layout(self, name):
+        return self.layouts.get(name, self._empty_layout)
+
+    def _load_layouts(self):
+        """Load the compiled layouts, recompiling the JSON only when it changed."""
+        try:
+            with open(self.keyboard_file_pth, "rb") as file:
+                raw = file.read()
+        except OSError:
+            raw = b""
+        crc = binascii.crc32(raw) & 0xFFFFFFFF
+
+        if self._read_layout_cache(crc):
+            return
+
+        print("Compiling keyboard layouts")
+        try:
+            self.keyboard_data = json.loads(raw.decode())
+        except ValueError:
+            self.keyboard_data = {}
+
+        self.layout_names = list(self.keyboard_data.keys())
+        self.layouts = {}
+        for index, name in enumerate(self.layout_names):
+            kbd_names, rotary_names = self.keyboard_layout_values(index, name)
+            self.layouts[name] = (
+                tuple(compile_action(kbd_names[i]) if i < len(kbd_names) else NO_ACTION
+                      for i in range(LAYOUT_BUTTONS)),
+                tuple(compile_action(rotary_names[i]) if i < len(rotary_names) else NO_ACTION
+                      for i in range(LAYOUT_ENCODERS * 3)),
+            )
+
+        self._write_layout_cache(crc)
+
+    def _read_layout_cache(self, crc):
+        """Cache file: "LYT", u8 version, u32 crc32 of the JSON, u8 button and
+        rotary record counts, u8 layout count, then per layout u8 name length,
+        name and its records as u8 kind, u8 code count, u16 LE codes.
+        """
+        try:
+            with open(self.layout_cache_pth, "rb") as file:
+                blob = file.read()
+        except OSError:
+            return False
+
+        if (blob[:3] != LAYOUT_CACHE_MAGIC or len(blob) < 11 or blob[3] != LAYOUT_CACHE_VERSION
+                or int.from_bytes(blob[4:8], "little") != crc
+                or blob[8] != LAYOUT_BUTTONS or blob[9] != LAYOUT_ENCODERS * 3):
+            return False
+
+        names = []
+        layouts = {}
+        pos = 11
+        try:
+            for _ in range(blob[10]):
+                length = blob[pos]
+                name = blob[pos + 1:pos + 1 + length].decode()
+                pos += 1 + length
+
+                records = []
+                for _ in range(LAYOUT_BUTTONS + LAYOUT_ENCODERS * 3):
+                    kind, count = blob[pos], blob[pos + 1]
+                    pos += 2
+                    if kind == ACTION_NONE:
+                        records.append(NO_ACTION)
+                        continue
+                    codes = tuple(blob[pos + 2 * i] | (blob[pos + 2 * i + 1] << 8) for i in range(count))
+                    pos += 2 * count
+                    records.append((kind, codes))
+
+                names.append(name)
+                layouts[name] = (tuple(records[:LAYOUT_BUTTONS]), tuple(records[LAYOUT_BUTTONS:]))
+        except (IndexError, UnicodeError):
+            return False  # truncated, e.g. power loss while writing
+
+        self.layout_names = names
+        self.layouts = layouts
+        return True
+
+    def _write_layout_cache(self, crc):
+        blob = bytearray(LAYOUT_CACHE_MAGIC)
+        blob.append(LAYOUT_CACHE_VERSION)
+        blob += crc.to_bytes(4, "little")
+        blob.append(LAYOUT_BUTTONS)
+        blob.append(LAYOUT_ENCODERS * 3)
+        blob.append(len(self.layout_names))
+
+        for name in self.layout_names:
+            encoded = name.encode()
+            blob.append(len(encoded))
+            blob += encoded
+            kbd_layout, rotary_layout = self.layouts[name]
+            for kind, codes in kbd_layout + rotary_layout:
+                blob.append(kind)
+                blob.append(len(codes))
+                for code in codes:
+                    blob.append(code & 0xFF)
+                    blob.append(code >> 8)
+
+        tmp_pth = self.layout_cache_pth + ".tmp"
+        try:
+            with open(tmp_pth, "wb") as file:
+                file.write(blob)
+            try:
+                os.remove(self.layout_cache_pth)  # FAT rename does not overwrite
+            except OSError:
+                pass
+            os.rename(tmp_pth, self.layout_cache_pth)
+        except OSError as e:
+            # Read-only filesystem (see boot.py): keep the compiled layouts in memory only
+            print(f"Layout cache not written: {e}")
 
     def keyboard_layout_values(self, layout_index, layout_name):
         # Access the correct dictionary directly
@@ -1105,6 +2307,7 @@ class ConfigFileManager:
         return kbd_layout, rotary_layout
 
 async def main():
+    configfile_manager = None
     try:
         # Initialize components
         time.sleep(3)
@@ -1118,13 +2321,15 @@ async def main():
         )
         # print("MULTIPLEXER MANAGER DONE")
         
-        midi_manager = MidiManager()
+        midi_manager = MidiManager(configfile_manager)
+        data_link = DataLink(configfile_manager.get("serial_protocol", PROTOCOL_BINARY))
         
         macropad = MacroPad(multiplexer=multiplexer, configfile_manager=configfile_manager,
-                            midi_manager=midi_manager)
+                            midi_manager=midi_manager, data_link=data_link)
         print("MACROPAD MANAGER DONE")
 
-        rtc_manager = RTCManager(sda=board.GP18, scl=board.GP19)
+        rtc_manager = RTCManager(sda=board.GP18, scl=board.GP19,
+                                 resync_s=configfile_manager.get("rtc_resync_s", RTC_RESYNC_S))
         # print("RTC MANAGER DONE")
 
         display_manager = DisplayManager(sda=board.GP16, scl=board.GP17,
@@ -1133,7 +2338,7 @@ async def main():
                                          macropad_manager=macropad)
         # print("DISPLAY MANAGER DONE")
 
-        serial_manager = SerialManager(display_manager)
+        serial_manager = SerialManager(display_manager, data_link)
         # print("SERIAL MANAGER DONE")
 
         rotary_manager = RotaryManager(
@@ -1148,14 +2353,18 @@ async def main():
         # print("ROTARY MANAGER DONE")
 
         await display_manager.display_last_page()
+        print(f"Sprite cache: {SPRITES.memory_report()}")
 
 
         # Create and run tasks
         tasks = [
             asyncio.create_task(macropad.update_values()),
+            asyncio.create_task(macropad.hid.run()),
             asyncio.create_task(serial_manager.handle_serial()),
             asyncio.create_task(display_manager.update_display()),
             asyncio.create_task(display_manager.check_curr_time()),
+            asyncio.create_task(rtc_manager.run()),
+            asyncio.create_task(configfile_manager.run()),
             asyncio.create_task(rotary_manager.process_encoders()),
         ]
 
@@ -1165,6 +2374,11 @@ async def main():
         print(f"Main loop error: {e}")
         gc.collect()
 
+    finally:
+        # Ctrl-C or a fatal error: write settings that are still waiting
+        if configfile_manager is not None:
+            configfile_manager.save()
+
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,85 @@
+"""Runs the pad firmware (pico_test.py) on CPython with simulated hardware.
+
+    hw = Hardware(drive_root)
+    firmware = load_firmware(hw)
+    asyncio.run(run(firmware, hw, seconds=5))
+
+The CircuitPython modules are replaced by fakes wired to hw: a virtual mux
+with per-channel ADC traces, virtual encoders, a pty as usb_cdc.data, a
+recorder for everything sent over HID and MIDI and an in-memory SSD1306.
+"""
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import types
+
+from .fakes import gc_module, install, os_module, time_module
+from .hardware import Hardware
+
+FIRMWARE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIRMWARE_PATH = os.path.join(FIRMWARE_DIR, "pico_test.py")
+DRIVE_FILES = ("config.json", "keyboard_layouts.json")
+
+
+def make_drive(root=None):
+    """Copy the firmware's data files to a fresh CIRCUITPY directory."""
+    root = root or tempfile.mkdtemp(prefix="circuitpy_")
+    for name in DRIVE_FILES:
+        source = os.path.join(FIRMWARE_DIR, name)
+        if os.path.exists(source) and not os.path.exists(os.path.join(root, name)):
+            shutil.copy(source, root)
+    return root
+
+
+def load_firmware(hardware, path=FIRMWARE_PATH):
+    """Import the firmware as module "pico_test" against the fakes of hardware."""
+    install(hardware)
+
+    module = types.ModuleType("pico_test")
+    module.__file__ = path
+    module.open = hardware.drive.open
+
+    saved = {name: sys.modules.get(name) for name in ("gc", "os", "time")}
+    sys.modules["gc"] = gc_module(hardware)
+    sys.modules["os"] = os_module(hardware)
+    sys.modules["time"] = time_module(hardware)
+    try:
+        with open(path, "r", encoding="utf-8") as file:
+            code = compile(file.read(), path, "exec")
+        exec(code, module.__dict__)
+    finally:
+        for name, original in saved.items():
+            if original is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = original
+
+    sys.modules["pico_test"] = module
+    return module
+
+
+async def run(firmware, hardware, seconds=None, script=None):
+    """Run firmware.main() for `seconds` (forever if None).
+
+    script is an optional coroutine function script(hardware) run alongside,
+    e.g. to press buttons or turn encoders; it is cancelled with the firmware.
+    """
+    task = asyncio.create_task(firmware.main())
+    helper = asyncio.create_task(script(hardware)) if script else None
+    try:
+        await asyncio.wait_for(asyncio.shield(task), seconds)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        for pending in (task, helper):
+            if pending is not None and not pending.done():
+                pending.cancel()
+                try:
+                    await pending
+                except asyncio.CancelledError:
+                    pass
+
+
+__all__ = ["Hardware", "load_firmware", "make_drive", "run"]
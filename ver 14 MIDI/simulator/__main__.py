@@ -0,0 +1,32 @@
+import argparse
+import asyncio
+import json
+
+from . import Hardware, load_firmware, make_drive, run
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m simulator",
+                                     description="Run the pad firmware with simulated hardware.")
+    parser.add_argument("--seconds", type=float, default=None, help="stop after this long (default: run forever)")
+    parser.add_argument("--drive", default=None, help="CIRCUITPY directory (default: fresh temp copy)")
+    parser.add_argument("--readonly", action="store_true", help="mount the drive read-only like over USB")
+    parser.add_argument("--real-sleep", action="store_true", help="make blocking time.sleep() really wait")
+    args = parser.parse_args()
+
+    hw = Hardware(make_drive(args.drive), readonly=args.readonly, fast_sleep=not args.real_sleep)
+    print(f"Pad serial port: {hw.cdc.port_name}")
+    try:
+        firmware = load_firmware(hw)
+        asyncio.run(run(firmware, hw, args.seconds))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(hw.stats(), indent=2))
+        if hw.display is not None:
+            print("Display:", " | ".join(hw.display.texts()))
+        hw.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,381 @@
+"""End-to-end input-to-action latency benchmark.
+
+Every scenario boots a fresh pad in the simulator, changes an input on the
+virtual hardware and timestamps the first resulting action: a HID or MIDI
+message recorded on the pad, or a VolumeControl.set_volume call on the host,
+which talks to the pad through the simulator's pty with the real
+SerialConnection, VolumeActuator and process_sliders.
+
+    python -m simulator.benchmark -n 200 -o results.json
+    python -m simulator.benchmark -n 200 --baseline results.json
+
+Both halves share one event loop, like they share one machine's CPU.
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from . import FIRMWARE_DIR, Hardware, load_firmware, make_drive
+
+HOST_DIR = os.path.join(os.path.dirname(FIRMWARE_DIR), "ver 11 pico clock")
+
+POT_LOW = 10000
+POT_HIGH = 50000
+ACTION_TIMEOUT = 2.0  # seconds an input may take to produce its action
+SETTLE_QUIET = 0.1  # a pot burst is over after this long without writes
+SLIDER_FUNCTIONS = ["MASTER_VOLUME"] + [f"app{i}.exe" for i in range(7)]
+MIDI_LAYOUT = "MIDI CONTROLLER"
+
+LATENCY_METRICS = ("p50_ms", "p95_ms", "p99_ms")
+DEFAULT_TOLERANCE = 0.2
+NOISE_FLOOR_MS = 0.5  # latency changes smaller than this are never regressions
+
+
+def percentile(sorted_values, fraction):
+    """Nearest rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(fraction * len(sorted_values) + 0.999999))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(latencies, duration, **extra):
+    ordered = sorted(latencies)
+    result = {
+        "samples": len(ordered),
+        "p50_ms": percentile(ordered, 0.50) * 1000,
+        "p95_ms": percentile(ordered, 0.95) * 1000,
+        "p99_ms": percentile(ordered, 0.99) * 1000,
+        "mean_ms": sum(ordered) / len(ordered) * 1000 if ordered else 0.0,
+        "max_ms": ordered[-1] * 1000 if ordered else 0.0,
+        "duration_s": duration,
+    }
+    result.update(extra)
+    return result
+
+
+class Rig:
+    """One simulated pad, optionally with the host pipeline attached to its pty."""
+
+    def __init__(self, layout=None, host=False):
+        drive = make_drive()
+        if layout:
+            path = os.path.join(drive, "config.json")
+            with open(path) as file:
+                config = json.load(file)
+            config["last_layout"] = layout
+            with open(path, "w") as file:
+                json.dump(config, file)
+
+        self.hw = Hardware(drive)
+        self.firmware = load_firmware(self.hw)
+        self.host = host
+        self.volume_writes = []  # (perf_counter, name, level), appended on the audio thread
+        self.serial_obj = None
+        self._tasks = []
+        self._executors = []
+
+    async def start(self):
+        self._tasks.append(asyncio.create_task(self.firmware.main()))
+        if self.host:
+            await self._start_host()
+        await asyncio.sleep(0.5)  # let the first scans and pot frames pass
+
+    async def _start_host(self):
+        sys.path.insert(0, HOST_DIR)
+        import audio_sessions
+        import main as host_main
+        import pyserial
+        import volume_actuator
+        import volume_potentiometer
+
+        writes = self.volume_writes
+
+        class RecordingVolumeControl(volume_potentiometer.VolumeControl):
+            def set_volume(self, name, value):
+                applied = super().set_volume(name, value)
+                writes.append((time.perf_counter(), name, value))
+                return applied
+
+        loop = asyncio.get_running_loop()
+        volume_obj = RecordingVolumeControl(audio_sessions.FakeSessionBackend(len(SLIDER_FUNCTIONS) - 1))
+        audio_executor = ThreadPoolExecutor(max_workers=1, initializer=volume_obj.init_worker_thread)
+        serial_executor = ThreadPoolExecutor(max_workers=2)
+        self._executors = [audio_executor, serial_executor]
+
+        protocol = self.firmware.ConfigFileManager().get("serial_protocol", "binary")
+        self.serial_obj = pyserial.SerialConnection(len(SLIDER_FUNCTIONS), protocol=protocol,
+                                                    port=self.hw.cdc.port_name, executor=serial_executor)
+        await loop.run_in_executor(audio_executor, volume_obj.initialise)
+        actuator = volume_actuator.VolumeActuator(volume_obj, audio_executor)
+
+        self._tasks += [
+            asyncio.create_task(self.serial_obj.run()),
+            asyncio.create_task(actuator.run()),
+            asyncio.create_task(host_main.process_sliders(self.serial_obj, actuator, len(SLIDER_FUNCTIONS),
+                                                          SLIDER_FUNCTIONS)),
+        ]
+        deadline = time.monotonic() + 5
+        while not self.serial_obj.connected and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        await asyncio.sleep(1.5)  # let the first pings and slider frames settle
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        for executor in self._executors:
+            executor.shutdown(wait=False, cancel_futures=True)
+        self.hw.close()
+
+
+async def wait_for(events, start, match, timeout=ACTION_TIMEOUT):
+    """Return the first event in events[start:] that matches, polling until timeout."""
+    deadline = time.perf_counter() + timeout
+    index = start
+    while True:
+        while index < len(events):
+            if match(events[index]):
+                return events[index]
+            index += 1
+        if time.perf_counter() > deadline:
+            return None
+        await asyncio.sleep(0.0005)
+
+
+async def wait_quiet(events, quiet=SETTLE_QUIET, timeout=ACTION_TIMEOUT):
+    """Wait until no event arrived for `quiet` seconds; return the last one."""
+    deadline = time.perf_counter() + timeout
+    count = len(events)
+    changed_at = time.perf_counter()
+    while time.perf_counter() < deadline:
+        await asyncio.sleep(0.005)
+        if len(events) != count:
+            count = len(events)
+            changed_at = time.perf_counter()
+        elif time.perf_counter() - changed_at >= quiet:
+            break
+    return events[-1] if events else None
+
+
+async def button_to_output(rig, samples, rng, device):
+    """Button 0 press -> first HID or MIDI message on the pad."""
+    events = rig.hw.outputs.events
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(samples):
+        await asyncio.sleep(rng.uniform(0.02, 0.04))  # de-phase from the scan period
+        start = len(events)
+        pressed_at = time.perf_counter()
+        rig.hw.mux.press_button(0)
+        event = await wait_for(events, start, lambda e: e[1] == device and e[0] >= pressed_at)
+        if event is not None:
+            latencies.append(event[0] - pressed_at)
+
+        await asyncio.sleep(0.03)
+        rig.hw.mux.press_button(0, False)
+        await wait_quiet(events, quiet=0.03)
+
+    return summarize(latencies, time.perf_counter() - started, lost=samples - len(latencies))
+
+
+async def button_to_hid(rig, samples, rng):
+    return await button_to_output(rig, samples, rng, "keyboard")
+
+
+async def button_to_midi(rig, samples, rng):
+    return await button_to_output(rig, samples, rng, "midi")
+
+
+async def pot_to_midi(rig, samples, rng):
+    """Pot 0 step -> first MIDI CC carrying a new value (only pot 0 moves)."""
+    events = rig.hw.outputs.events
+    latencies = []
+    started = time.perf_counter()
+    for i in range(samples):
+        await asyncio.sleep(rng.uniform(0.1, 0.11))  # the filter settles, the phase to the scan varies
+        last_values = {event[3][0]: event[3][1] for event in events if event[1] == "midi"}
+        start = len(events)
+        moved_at = time.perf_counter()
+        rig.hw.mux.set_pot(0, POT_HIGH if i % 2 == 0 else POT_LOW)
+
+        event = await wait_for(events, start, lambda e: e[1] == "midi" and e[3][1] != last_values.get(e[3][0]))
+        if event is not None:
+            latencies.append(event[0] - moved_at)
+
+    return summarize(latencies, time.perf_counter() - started, lost=samples - len(latencies))
+
+
+async def pot_to_volume(rig, samples, rng):
+    """Pot 0 step on the pad -> first and last set_volume of the burst on the host."""
+    writes = rig.volume_writes
+    latencies = []
+    settled = []
+    started = time.perf_counter()
+    for i in range(samples):
+        await wait_quiet(writes)
+        await asyncio.sleep(rng.uniform(0.0, 0.01))
+        start = len(writes)
+        moved_at = time.perf_counter()
+        rig.hw.mux.set_pot(0, POT_HIGH if i % 2 == 0 else POT_LOW)
+
+        first = await wait_for(writes, start, lambda w: w[1] == SLIDER_FUNCTIONS[0])
+        if first is None:
+            continue
+        latencies.append(first[0] - moved_at)
+        last = await wait_quiet(writes)
+        settled.append(last[0] - moved_at)
+
+    result = summarize(latencies, time.perf_counter() - started, lost=samples - len(latencies))
+    settled.sort()
+    result["settle_p50_ms"] = percentile(settled, 0.50) * 1000
+    result["settle_p95_ms"] = percentile(settled, 0.95) * 1000
+    return result
+
+
+async def pot_sweep(rig, seconds, rng):
+    """All pots moving at once: how much the pipeline delivers per second."""
+    import math
+
+    for pot in range(8):
+        period = rng.uniform(0.5, 2.0)
+        rig.hw.mux.set_pot(pot, lambda t, p=period: 32767 + 30000 * math.sin(2 * math.pi * t / p))
+
+    writes, frames = len(rig.volume_writes), rig.serial_obj.decoder.frames
+    started = time.perf_counter()
+    await asyncio.sleep(seconds)
+    duration = time.perf_counter() - started
+    return {
+        "duration_s": duration,
+        "throughput_per_s": (len(rig.volume_writes) - writes) / duration,
+        "frames_per_s": (rig.serial_obj.decoder.frames - frames) / duration,
+        "lost_frames": rig.serial_obj.decoder.lost_frames,
+        "crc_errors": rig.serial_obj.decoder.crc_errors,
+    }
+
+
+# name -> (coroutine, layout, needs the host)
+SCENARIOS = {
+    "button_to_hid": (button_to_hid, None, False),
+    "button_to_midi": (button_to_midi, MIDI_LAYOUT, False),
+    "pot_to_midi": (pot_to_midi, MIDI_LAYOUT, False),
+    "pot_to_volume": (pot_to_volume, None, True),
+    "pot_sweep": (pot_sweep, None, True),
+}
+
+
+async def run_scenario(name, samples, seed, sweep_seconds):
+    scenario, layout, host = SCENARIOS[name]
+    rig = Rig(layout, host)
+    await rig.start()
+    try:
+        amount = sweep_seconds if scenario is pot_sweep else samples
+        return await scenario(rig, amount, random.Random(seed))
+    finally:
+        await rig.stop()
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=FIRMWARE_DIR, capture_output=True,
+                              text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def run_all(names, samples, seed=1, sweep_seconds=5.0, verbose=False):
+    results = {
+        "meta": {
+            "time": time.time(),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "samples": samples,
+            "seed": seed,
+        },
+        "scenarios": {},
+    }
+    for name in names:
+        print(f"{name}...", flush=True)
+        quiet = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(open(os.devnull, "w"))
+        with quiet:
+            results["scenarios"][name] = asyncio.run(run_scenario(name, samples, seed, sweep_seconds))
+    return results
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Print current vs baseline per metric; return the list of regressions."""
+    regressions = []
+    for name, current in results["scenarios"].items():
+        base = baseline.get("scenarios", {}).get(name)
+        if base is None:
+            print(f"{name}: not in baseline")
+            continue
+
+        for metric in LATENCY_METRICS + ("throughput_per_s",):
+            if metric not in current or metric not in base:
+                continue
+            new, old = current[metric], base[metric]
+            change = (new - old) / old if old else 0.0
+            if metric == "throughput_per_s":
+                regressed = old and new < old * (1 - tolerance)
+            else:
+                regressed = new > old * (1 + tolerance) and new - old > NOISE_FLOOR_MS
+            flag = "  REGRESSION" if regressed else ""
+            print(f"{name:<15} {metric:<17} {old:10.2f} -> {new:10.2f}  ({change:+.0%}){flag}")
+            if regressed:
+                regressions.append((name, metric, old, new))
+    return regressions
+
+
+def print_results(results):
+    for name, result in results["scenarios"].items():
+        if "p50_ms" in result:
+            print(f"{name:<15} p50 {result['p50_ms']:7.2f} ms  p95 {result['p95_ms']:7.2f} ms  "
+                  f"p99 {result['p99_ms']:7.2f} ms  ({result['samples']} samples, {result['lost']} lost)")
+        else:
+            print(f"{name:<15} {result['throughput_per_s']:7.1f} actions/s, {result['frames_per_s']:.1f} frames/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m simulator.benchmark", description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--samples", type=int, default=100, help="inputs per latency scenario")
+    parser.add_argument("-s", "--scenarios", default=",".join(SCENARIOS), help="comma separated subset")
+    parser.add_argument("-o", "--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against a saved results file, exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed relative slowdown before a metric counts as regressed")
+    parser.add_argument("--sweep-seconds", type=float, default=5.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("-v", "--verbose", action="store_true", help="show pad and host output")
+    args = parser.parse_args()
+
+    names = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)} (choose from {', '.join(SCENARIOS)})")
+
+    results = run_all(names, args.samples, args.seed, args.sweep_seconds, args.verbose)
+    print_results(results)
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
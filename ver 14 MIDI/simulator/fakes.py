@@ -0,0 +1,541 @@
+import calendar
+import sys
+import time
+import types
+
+# Subset of adafruit_hid.keycode.Keycode / consumer_control_code.ConsumerControlCode
+# with the real HID usage ids
+KEYCODES = {
+    **{chr(ord("A") + i): 0x04 + i for i in range(26)},
+    **{name: 0x1E + i for i, name in enumerate(
+        ["ONE", "TWO", "THREE", "FOUR", "FIVE", "SIX", "SEVEN", "EIGHT", "NINE", "ZERO"])},
+    "ENTER": 0x28, "RETURN": 0x28, "ESCAPE": 0x29, "BACKSPACE": 0x2A, "TAB": 0x2B,
+    "SPACEBAR": 0x2C, "SPACE": 0x2C, "MINUS": 0x2D, "EQUALS": 0x2E, "LEFT_BRACKET": 0x2F,
+    "RIGHT_BRACKET": 0x30, "BACKSLASH": 0x31, "POUND": 0x32, "SEMICOLON": 0x33, "QUOTE": 0x34,
+    "GRAVE_ACCENT": 0x35, "COMMA": 0x36, "PERIOD": 0x37, "FORWARD_SLASH": 0x38, "CAPS_LOCK": 0x39,
+    **{f"F{i}": 0x3A + i - 1 for i in range(1, 13)},
+    "PRINT_SCREEN": 0x46, "SCROLL_LOCK": 0x47, "PAUSE": 0x48, "INSERT": 0x49, "HOME": 0x4A,
+    "PAGE_UP": 0x4B, "DELETE": 0x4C, "END": 0x4D, "PAGE_DOWN": 0x4E, "RIGHT_ARROW": 0x4F,
+    "LEFT_ARROW": 0x50, "DOWN_ARROW": 0x51, "UP_ARROW": 0x52, "KEYPAD_NUMLOCK": 0x53,
+    "KEYPAD_FORWARD_SLASH": 0x54, "KEYPAD_ASTERISK": 0x55, "KEYPAD_MINUS": 0x56, "KEYPAD_PLUS": 0x57,
+    "KEYPAD_ENTER": 0x58,
+    **{f"KEYPAD_{name}": 0x59 + i for i, name in enumerate(
+        ["ONE", "TWO", "THREE", "FOUR", "FIVE", "SIX", "SEVEN", "EIGHT", "NINE", "ZERO"])},
+    "KEYPAD_PERIOD": 0x63, "KEYPAD_BACKSLASH": 0x64, "APPLICATION": 0x65, "POWER": 0x66,
+    "KEYPAD_EQUALS": 0x67,
+    **{f"F{i}": 0x68 + i - 13 for i in range(13, 25)},
+    "LEFT_CONTROL": 0xE0, "CONTROL": 0xE0, "LEFT_SHIFT": 0xE1, "SHIFT": 0xE1, "LEFT_ALT": 0xE2,
+    "ALT": 0xE2, "OPTION": 0xE2, "LEFT_GUI": 0xE3, "GUI": 0xE3, "WINDOWS": 0xE3, "COMMAND": 0xE3,
+    "RIGHT_CONTROL": 0xE4, "RIGHT_SHIFT": 0xE5, "RIGHT_ALT": 0xE6, "RIGHT_GUI": 0xE7,
+}
+
+CONSUMER_CODES = {
+    "BRIGHTNESS_INCREMENT": 0x6F, "BRIGHTNESS_DECREMENT": 0x70, "RECORD": 0xB2, "FAST_FORWARD": 0xB3,
+    "REWIND": 0xB4, "SCAN_NEXT_TRACK": 0xB5, "SCAN_PREVIOUS_TRACK": 0xB6, "STOP": 0xB7, "EJECT": 0xB8,
+    "PLAY_PAUSE": 0xCD, "MUTE": 0xE2, "VOLUME_INCREMENT": 0xE9, "VOLUME_DECREMENT": 0xEA,
+}
+
+BLOCK_BYTES = 16  # one GC block on the pad
+SIM_HEAP_BYTES = 64 * 1024 * 1024
+
+FONT_WIDTH = 6
+FONT_HEIGHT = 12
+
+
+def _module(name, **attrs):
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    return module
+
+
+# ---- displayio ---------------------------------------------------------------
+
+class Group:
+    def __init__(self, *, scale=1, x=0, y=0):
+        self.scale = scale
+        self.x = x
+        self.y = y
+        self.hidden = False
+        self._children = []
+
+    def append(self, layer):
+        self._children.append(layer)
+
+    def insert(self, index, layer):
+        self._children.insert(index, layer)
+
+    def remove(self, layer):
+        self._children.remove(layer)
+
+    def pop(self, index=-1):
+        return self._children.pop(index)
+
+    def index(self, layer):
+        return self._children.index(layer)
+
+    def __len__(self):
+        return len(self._children)
+
+    def __iter__(self):
+        return iter(self._children)
+
+    def __getitem__(self, index):
+        return self._children[index]
+
+    def __contains__(self, layer):
+        return layer in self._children
+
+
+class Bitmap:
+    def __init__(self, width, height, value_count):
+        self.width = width
+        self.height = height
+        self.value_count = value_count
+        self._data = bytearray(width * height)
+
+    def _index(self, key):
+        if isinstance(key, tuple):
+            x, y = key
+            return y * self.width + x
+        return key
+
+    def __getitem__(self, key):
+        return self._data[self._index(key)]
+
+    def __setitem__(self, key, value):
+        self._data[self._index(key)] = value
+
+    def fill(self, value):
+        self._data[:] = bytes((value,)) * len(self._data)
+
+
+class Palette:
+    def __init__(self, color_count):
+        self._colors = [0] * color_count
+
+    def __len__(self):
+        return len(self._colors)
+
+    def __getitem__(self, index):
+        return self._colors[index]
+
+    def __setitem__(self, index, color):
+        self._colors[index] = color
+
+    def make_transparent(self, index):
+        pass
+
+
+class TileGrid:
+    def __init__(self, bitmap, *, pixel_shader, x=0, y=0, width=1, height=1, **kwargs):
+        self.bitmap = bitmap
+        self.pixel_shader = pixel_shader
+        self.x = x
+        self.y = y
+        self.hidden = False
+        self.tile_width = bitmap.width
+        self.tile_height = bitmap.height
+
+
+class Label(Group):
+    """adafruit_display_text.label.Label with terminalio's 6x12 cells."""
+
+    def __init__(self, font, *, text="", color=0xFFFFFF, scale=1, **kwargs):
+        super().__init__(scale=scale)
+        self.font = font
+        self.text = text
+        self.color = color
+
+    @property
+    def bounding_box(self):
+        return 0, -FONT_HEIGHT // 2, FONT_WIDTH * len(self.text), FONT_HEIGHT if self.text else 0
+
+
+class SSD1306:
+    """In-memory framebuffer display. render() rasterizes the current root_group."""
+
+    def __init__(self, hardware, width, height):
+        self.hardware = hardware
+        self.width = width
+        self.height = height
+        self._root_group = None
+        self.root_swaps = 0
+        self.auto_refresh = True
+
+    @property
+    def root_group(self):
+        return self._root_group
+
+    @root_group.setter
+    def root_group(self, group):
+        self._root_group = group
+        self.root_swaps += 1
+
+    def refresh(self, **kwargs):
+        return True
+
+    def texts(self):
+        """Visible label texts, top to bottom."""
+        found = []
+
+        def walk(group, y):
+            for layer in group:
+                if getattr(layer, "hidden", False):
+                    continue
+                if isinstance(layer, Label):
+                    if layer.text:
+                        found.append((y + layer.y, layer.text))
+                elif isinstance(layer, Group):
+                    walk(layer, y + layer.y)
+
+        if self._root_group is not None:
+            walk(self._root_group, 0)
+        return [text for _, text in sorted(found, key=lambda item: item[0])]
+
+    def render(self):
+        """Return the frame as a width*height bytearray of 0/1 pixels."""
+        frame = bytearray(self.width * self.height)
+
+        def plot(x, y, on):
+            if 0 <= x < self.width and 0 <= y < self.height:
+                frame[y * self.width + x] = 1 if on else 0
+
+        def draw(layer, ox, oy, scale):
+            if getattr(layer, "hidden", False):
+                return
+            if isinstance(layer, Label):
+                # Glyphs drawn as solid cells, enough to see layout and inversion
+                x0 = ox + layer.x * scale
+                y0 = oy + (layer.y - FONT_HEIGHT // 2) * scale
+                s = scale * layer.scale
+                for i, char in enumerate(layer.text):
+                    if char == " ":
+                        continue
+                    for dy in range(2 * s, (FONT_HEIGHT - 2) * s):
+                        for dx in range((FONT_WIDTH - 1) * s):
+                            plot(x0 + i * FONT_WIDTH * s + dx, y0 + dy, layer.color)
+            elif isinstance(layer, Group):
+                for child in layer:
+                    draw(child, ox + layer.x * scale, oy + layer.y * scale, scale * layer.scale)
+            elif isinstance(layer, TileGrid):
+                bitmap, palette = layer.bitmap, layer.pixel_shader
+                for y in range(bitmap.height):
+                    for x in range(bitmap.width):
+                        plot(ox + layer.x + x, oy + layer.y + y, palette[bitmap[x, y]])
+
+        if self._root_group is not None:
+            draw(self._root_group, 0, 0, 1)
+        return frame
+
+
+# ---- pins --------------------------------------------------------------------
+
+class Pin:
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return f"board.{self.name}"
+
+
+class Direction:
+    INPUT = "INPUT"
+    OUTPUT = "OUTPUT"
+
+
+class Pull:
+    UP = "UP"
+    DOWN = "DOWN"
+
+
+def build_modules(hardware):
+    """Return {module name: fake module} wired to hardware."""
+
+    class DigitalInOut:
+        def __init__(self, pin):
+            self._state = hardware.pin(pin.name)
+
+        @property
+        def direction(self):
+            return self._state.direction
+
+        @direction.setter
+        def direction(self, direction):
+            self._state.direction = direction
+
+        @property
+        def pull(self):
+            return self._state.pull
+
+        @pull.setter
+        def pull(self, pull):
+            self._state.pull = pull
+            if pull == Pull.UP and self._state.direction == Direction.INPUT:
+                self._state.value = True
+
+        @property
+        def value(self):
+            return self._state.value
+
+        @value.setter
+        def value(self, value):
+            self._state.value = bool(value)
+            self._state.writes += 1
+
+        def deinit(self):
+            pass
+
+    class AnalogIn:
+        def __init__(self, pin):
+            self.pin = pin
+
+        @property
+        def value(self):
+            return hardware.mux.read()
+
+    class IncrementalEncoder:
+        def __init__(self, pin_a, pin_b, divisor=4):
+            self._encoder = VirtualEncoderProxy.create(pin_a, pin_b, divisor)
+
+        @property
+        def position(self):
+            return self._encoder.position
+
+        @position.setter
+        def position(self, value):
+            self._encoder.position = value
+
+    class VirtualEncoderProxy:
+        @staticmethod
+        def create(pin_a, pin_b, divisor):
+            from .hardware import VirtualEncoder
+            encoder = VirtualEncoder(pin_a.name, pin_b.name, divisor)
+            hardware.encoders.append(encoder)
+            return encoder
+
+    class Keyboard:
+        def __init__(self, devices):
+            self.devices = devices
+
+        def press(self, *keycodes):
+            hardware.outputs.record("keyboard", "press", *keycodes)
+
+        def release(self, *keycodes):
+            hardware.outputs.record("keyboard", "release", *keycodes)
+
+        def release_all(self):
+            hardware.outputs.record("keyboard", "release_all")
+
+        def send(self, *keycodes):
+            hardware.outputs.record("keyboard", "send", *keycodes)
+
+    class ConsumerControl:
+        def __init__(self, devices):
+            self.devices = devices
+
+        def press(self, consumer_code):
+            hardware.outputs.record("consumer", "press", consumer_code)
+
+        def release(self):
+            hardware.outputs.record("consumer", "release")
+
+        def send(self, consumer_code):
+            hardware.outputs.record("consumer", "send", consumer_code)
+
+    class ControlChange:
+        def __init__(self, control, value, *, channel=None):
+            self.control = control
+            self.value = value
+            self.channel = channel
+
+    class PortOut:
+        """usb_midi output port: parses the byte stream and records every
+        channel message like adafruit_midi's MIDI.send does."""
+
+        NAMES = {0x80: "NoteOff", 0x90: "NoteOn", 0xA0: "PolyphonicKeyPressure", 0xB0: "ControlChange",
+                 0xC0: "ProgramChange", 0xD0: "ChannelPressure", 0xE0: "PitchBend"}
+
+        def __init__(self):
+            self._status = None
+            self._data = []
+            self.writes = 0
+
+        def write(self, buf, length=None):
+            self.writes += 1
+            data = bytes(buf[:len(buf) if length is None else length])
+            for byte in data:
+                if byte & 0x80:
+                    self._status = byte
+                    self._data = []
+                    continue
+                if self._status is None:
+                    continue  # data without status: dropped like a real parser
+
+                self._data.append(byte)
+                kind = self._status & 0xF0
+                if len(self._data) == (1 if kind in (0xC0, 0xD0) else 2):
+                    hardware.outputs.record("midi", self.NAMES.get(kind, hex(kind)), *self._data)
+                    self._data = []
+            return len(data)
+
+    class MIDI:
+        def __init__(self, midi_in=None, midi_out=None, *, in_channel=None, out_channel=0, **kwargs):
+            self.out_channel = out_channel
+
+        def send(self, msg, channel=None):
+            for message in msg if isinstance(msg, (list, tuple)) else (msg,):
+                hardware.outputs.record("midi", type(message).__name__,
+                                        getattr(message, "control", None), getattr(message, "value", None))
+
+    class DS1307:
+        def __init__(self, i2c):
+            self._rtc = hardware.rtc
+
+        @property
+        def datetime(self):
+            return self._rtc.datetime
+
+        @datetime.setter
+        def datetime(self, value):
+            self._rtc.datetime = value
+
+    class Debouncer:
+        def __init__(self, io, interval=0.01):
+            self._read = io if callable(io) else (lambda: io.value)
+            self.interval = interval
+            self.value = bool(self._read())
+            self._previous = self.value
+            self._changed_at = 0.0
+
+        def update(self):
+            self._previous = self.value
+            current = bool(self._read())
+            now = hardware.clock.monotonic()
+            if current != self.value and now - self._changed_at >= self.interval:
+                self.value = current
+                self._changed_at = now
+
+        @property
+        def fell(self):
+            return self._previous and not self.value
+
+        @property
+        def rose(self):
+            return not self._previous and self.value
+
+    def interp(x, xp, fp):
+        values = x if isinstance(x, (list, tuple)) else [x]
+        result = []
+        for value in values:
+            if value <= xp[0]:
+                result.append(float(fp[0]))
+            elif value >= xp[-1]:
+                result.append(float(fp[-1]))
+            else:
+                for i in range(1, len(xp)):
+                    if value <= xp[i]:
+                        span = (value - xp[i - 1]) / (xp[i] - xp[i - 1])
+                        result.append(fp[i - 1] + span * (fp[i] - fp[i - 1]))
+                        break
+        return result
+
+    def make_display(display_bus, *, width, height, **kwargs):
+        hardware.display = SSD1306(hardware, width, height)
+        return hardware.display
+
+    class _Board(types.ModuleType):
+        def __getattr__(self, name):
+            if name.startswith(("GP", "LED", "A")) or name in ("SDA", "SCL"):
+                pin = Pin(name)
+                setattr(self, name, pin)
+                return pin
+            raise AttributeError(name)
+
+    board = _Board("board")
+
+    keycode = type("Keycode", (), dict(KEYCODES))
+    consumer_control_code = type("ConsumerControlCode", (), dict(CONSUMER_CODES))
+
+    ulab_numpy = _module("ulab.numpy", interp=interp)
+    adafruit_hid = _module("adafruit_hid")
+    adafruit_midi = _module("adafruit_midi", MIDI=MIDI)
+    adafruit_midi_cc = _module("adafruit_midi.control_change", ControlChange=ControlChange)
+    adafruit_display_text = _module("adafruit_display_text")
+    label = _module("adafruit_display_text.label", Label=Label)
+    adafruit_display_text.label = label
+    adafruit_midi.control_change = adafruit_midi_cc
+
+    modules = {
+        "board": board,
+        "digitalio": _module("digitalio", DigitalInOut=DigitalInOut, Direction=Direction, Pull=Pull),
+        "analogio": _module("analogio", AnalogIn=AnalogIn),
+        "rotaryio": _module("rotaryio", IncrementalEncoder=IncrementalEncoder),
+        "busio": _module("busio", I2C=lambda scl, sda, **kwargs: ("I2C", scl, sda)),
+        "usb_cdc": _module("usb_cdc", data=hardware.cdc, console=None,
+                           enable=lambda **kwargs: None),
+        "usb_hid": _module("usb_hid", devices=["keyboard", "mouse", "consumer_control"]),
+        "usb_midi": _module("usb_midi", ports=("midi_in", PortOut())),
+        "storage": _module("storage", remount=lambda *args, **kwargs: None),
+        "displayio": _module("displayio", Group=Group, Bitmap=Bitmap, Palette=Palette, TileGrid=TileGrid,
+                             release_displays=lambda: None,
+                             I2CDisplay=lambda i2c, device_address=0x3C: ("I2CDisplay", device_address)),
+        "terminalio": _module("terminalio", FONT="terminalio.FONT"),
+        "adafruit_displayio_ssd1306": _module("adafruit_displayio_ssd1306", SSD1306=make_display),
+        "adafruit_ds1307": _module("adafruit_ds1307", DS1307=DS1307),
+        "adafruit_debouncer": _module("adafruit_debouncer", Debouncer=Debouncer),
+        "ulab": _module("ulab", numpy=ulab_numpy),
+        "ulab.numpy": ulab_numpy,
+        "adafruit_midi": adafruit_midi,
+        "adafruit_midi.control_change": adafruit_midi_cc,
+        "adafruit_hid": adafruit_hid,
+        "adafruit_hid.keyboard": _module("adafruit_hid.keyboard", Keyboard=Keyboard),
+        "adafruit_hid.Keycode": _module("adafruit_hid.Keycode", Keycode=keycode),
+        "adafruit_hid.keycode": _module("adafruit_hid.keycode", Keycode=keycode),
+        "adafruit_hid.consumer_control": _module("adafruit_hid.consumer_control", ConsumerControl=ConsumerControl),
+        "adafruit_hid.consumer_control_code": _module("adafruit_hid.consumer_control_code",
+                                                      ConsumerControlCode=consumer_control_code),
+        "adafruit_display_text": adafruit_display_text,
+        "adafruit_display_text.label": label,
+    }
+    return modules
+
+
+def time_module(hardware):
+    """time as seen by the firmware: monotonic() and sleep() follow hardware.clock."""
+    return _module(
+        "time",
+        monotonic=hardware.clock.monotonic,
+        monotonic_ns=hardware.clock.monotonic_ns,
+        sleep=hardware.clock.sleep,
+        time=time.time,
+        localtime=time.gmtime,  # the board has no time zone
+        mktime=lambda t: calendar.timegm(tuple(t)[:6] + (0, 0, 0)),
+        struct_time=time.struct_time,
+        perf_counter=time.perf_counter,
+    )
+
+
+def gc_module(hardware):
+    """gc with CircuitPython's heap queries, estimated from CPython's allocated blocks."""
+    import gc
+
+    def mem_alloc():
+        return sys.getallocatedblocks() * BLOCK_BYTES
+
+    return _module("gc", collect=gc.collect, enable=gc.enable, disable=gc.disable, mem_alloc=mem_alloc,
+                   mem_free=lambda: max(0, SIM_HEAP_BYTES - mem_alloc()))
+
+
+def os_module(hardware):
+    """os with file operations redirected to the simulated drive."""
+    import os
+
+    module = _module("os", remove=hardware.drive.remove, rename=hardware.drive.rename,
+                     stat=hardware.drive.stat, listdir=hardware.drive.listdir)
+    module.__getattr__ = lambda name: getattr(os, name)
+    return module
+
+
+def install(hardware):
+    """Register the fake CircuitPython modules in sys.modules."""
+    sys.modules.update(build_modules(hardware))
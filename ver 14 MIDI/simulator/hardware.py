@@ -0,0 +1,331 @@
+import calendar
+import errno
+import os
+import select
+import time
+import tty
+
+
+class SimClock:
+    """Time as the firmware sees it.
+
+    monotonic() follows the real clock plus an offset, so tests can jump ahead
+    with advance(). With fast_sleep, blocking time.sleep() calls (e.g. the boot
+    delay) only advance the offset instead of waiting.
+    """
+
+    def __init__(self, fast_sleep=True):
+        self.fast_sleep = fast_sleep
+        self.offset = 0.0
+        self._start = time.monotonic()
+
+    def monotonic(self):
+        return time.monotonic() - self._start + self.offset
+
+    def monotonic_ns(self):
+        return int(self.monotonic() * 1e9)
+
+    def advance(self, seconds):
+        self.offset += seconds
+
+    def sleep(self, seconds):
+        if self.fast_sleep:
+            self.advance(seconds)
+        else:
+            time.sleep(seconds)
+
+
+class PinState:
+    def __init__(self, name):
+        self.name = name
+        self.value = False
+        self.direction = None
+        self.pull = None
+        self.writes = 0
+
+
+class VirtualMux:
+    """Two CD74HC4067 chips sharing one ADC input.
+
+    The selected chip and channel are decoded from the real pin states the
+    firmware drives, so wrong select sequences read wrong channels just like on
+    the board. Every channel holds a trace: an int or a callable(t) -> int,
+    where t is the simulated monotonic time.
+    """
+
+    FLOATING = 0  # what the ADC reads with no chip enabled
+
+    def __init__(self, hardware, select=("GP10", "GP11", "GP12", "GP13"), enable=("GP14", "GP15")):
+        self.hardware = hardware
+        self.select = select
+        self.enable = enable
+        self.traces = [[0] * 16 for _ in enable]
+
+        self.reads = 0
+        self.conflicts = 0  # reads with more than one chip enabled
+
+        # Buttons idle high (pulled up), pressed pulls them low
+        for channel in range(16):
+            self.traces[0][channel] = 65535
+        for channel in range(8, 12):
+            self.traces[1][channel] = 65535
+
+    def set(self, chip, channel, trace):
+        self.traces[chip][channel] = trace
+
+    def set_pot(self, index, trace):
+        self.set(1, index, trace)
+
+    def press_button(self, index, pressed=True):
+        self.set(0, index, 0 if pressed else 65535)
+
+    def press_encoder_button(self, index, pressed=True):
+        self.set(1, 8 + index, 0 if pressed else 65535)
+
+    def read(self):
+        self.reads += 1
+        pins = self.hardware.pins
+        enabled = [chip for chip, name in enumerate(self.enable) if name in pins and not pins[name].value]
+        if len(enabled) != 1:
+            if enabled:
+                self.conflicts += 1
+            return self.FLOATING
+
+        channel = 0
+        for bit, name in enumerate(self.select):
+            if name in pins and pins[name].value:
+                channel |= 1 << bit
+
+        trace = self.traces[enabled[0]][channel]
+        value = trace(self.hardware.clock.monotonic()) if callable(trace) else trace
+        return max(0, min(65535, int(value)))
+
+
+class VirtualEncoder:
+    def __init__(self, pin_a, pin_b, divisor):
+        self.pins = (pin_a, pin_b)
+        self.divisor = divisor
+        self.position = 0
+
+    def turn(self, detents):
+        """Positive turns one way, negative the other."""
+        self.position += detents
+
+
+class PtyPort:
+    """usb_cdc.data backed by a pseudo terminal.
+
+    The pad owns the master side; a host (pyserial, main.py, the benchmark)
+    opens port_name like a real COM port.
+    """
+
+    def __init__(self):
+        self.master_fd, self.slave_fd = os.openpty()
+        tty.setraw(self.slave_fd)
+        os.set_blocking(self.master_fd, False)
+        self.port_name = os.ttyname(self.slave_fd)
+        self.timeout = 1.0
+        self.write_timeout = 0.05
+        self._buffer = bytearray()
+
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.bytes_dropped = 0
+
+    def _fill(self, wait=0.0):
+        ready, _, _ = select.select([self.master_fd], [], [], wait)
+        if not ready:
+            return False
+        try:
+            data = os.read(self.master_fd, 4096)
+        except OSError as e:
+            if e.errno in (errno.EAGAIN, errno.EIO):
+                return False  # nothing there / host side closed
+            raise
+        self._buffer += data
+        self.bytes_in += len(data)
+        return bool(data)
+
+    @property
+    def in_waiting(self):
+        self._fill()
+        return len(self._buffer)
+
+    @property
+    def connected(self):
+        return True
+
+    def read(self, size=1):
+        if len(self._buffer) < size:
+            self._fill(self.timeout)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def readline(self, size=-1):
+        deadline = time.monotonic() + self.timeout
+        while b"\n" not in self._buffer:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not self._fill(remaining):
+                break
+
+        end = self._buffer.find(b"\n")
+        end = len(self._buffer) if end < 0 else end + 1
+        if size >= 0:
+            end = min(end, size)
+        line = bytes(self._buffer[:end])
+        del self._buffer[:end]
+        return line
+
+    def write(self, data):
+        """Like USB CDC with no host reading: after write_timeout the rest is dropped."""
+        data = bytes(data)
+        view = memoryview(data)
+        while view:
+            try:
+                written = os.write(self.master_fd, view)
+            except BlockingIOError:
+                _, writable, _ = select.select([], [self.master_fd], [], self.write_timeout)
+                if not writable:
+                    self.bytes_dropped += len(view)
+                    break
+                continue
+            view = view[written:]
+        self.bytes_out += len(data) - len(view)
+        return len(data) - len(view)
+
+    def reset_input_buffer(self):
+        while self._fill():
+            pass
+        self._buffer.clear()
+
+    def flush(self):
+        pass
+
+    def close(self):
+        for fd in (self.master_fd, self.slave_fd):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+
+class OutputRecorder:
+    """Everything the pad sends over USB HID and MIDI, in order, timestamped."""
+
+    def __init__(self):
+        self.events = []  # (time.perf_counter(), device, action, args)
+
+    def record(self, device, action, *args):
+        self.events.append((time.perf_counter(), device, action, args))
+
+    def of(self, device):
+        return [event for event in self.events if event[1] == device]
+
+    def clear(self):
+        self.events.clear()
+
+
+class VirtualRTC:
+    """DS1307 that keeps time from the simulated clock."""
+
+    def __init__(self, clock):
+        self.clock = clock
+        self._base = time.time()
+        self._set_at = clock.monotonic()
+        self.reads = 0
+        self.writes = 0
+
+    @property
+    def datetime(self):
+        self.reads += 1
+        now = self._base + self.clock.monotonic() - self._set_at
+        return time.gmtime(int(now))
+
+    @datetime.setter
+    def datetime(self, value):
+        self._base = calendar.timegm(tuple(value)[:6] + (0, 0, 0))
+        self._set_at = self.clock.monotonic()
+        self.writes += 1
+
+
+class Drive:
+    """The CIRCUITPY drive: absolute firmware paths ("/config.json") live under root."""
+
+    def __init__(self, root, readonly=False):
+        self.root = root
+        self.readonly = readonly
+
+    def path(self, path):
+        path = os.fspath(path)
+        return os.path.join(self.root, path.lstrip("/")) if path.startswith("/") else path
+
+    def open(self, path, mode="r", *args, **kwargs):
+        if self.readonly and any(flag in mode for flag in "wax+"):
+            raise OSError(errno.EROFS, "Read-only filesystem")
+        return open(self.path(path), mode, *args, **kwargs)
+
+    def _check_writable(self):
+        if self.readonly:
+            raise OSError(errno.EROFS, "Read-only filesystem")
+
+    def remove(self, path):
+        self._check_writable()
+        os.remove(self.path(path))
+
+    def rename(self, old, new):
+        self._check_writable()
+        if os.path.exists(self.path(new)):
+            raise OSError(errno.EEXIST, "File exists")  # FAT does not overwrite
+        os.rename(self.path(old), self.path(new))
+
+    def stat(self, path):
+        return os.stat(self.path(path))
+
+    def listdir(self, path="/"):
+        return os.listdir(self.path(path))
+
+
+class Hardware:
+    """All simulated peripherals of one pad, shared by the fake modules."""
+
+    def __init__(self, drive_root, readonly=False, fast_sleep=True):
+        self.clock = SimClock(fast_sleep)
+        self.pins = {}
+        self.mux = VirtualMux(self)
+        self.encoders = []  # creation order: control encoder first
+        self.cdc = PtyPort()
+        self.outputs = OutputRecorder()
+        self.rtc = VirtualRTC(self.clock)
+        self.drive = Drive(drive_root, readonly)
+        self.display = None  # set when the firmware creates its SSD1306
+
+    def pin(self, name):
+        state = self.pins.get(name)
+        if state is None:
+            state = self.pins[name] = PinState(name)
+        return state
+
+    def set_input(self, name, value):
+        """Drive an input pin from outside, e.g. the control encoder button."""
+        self.pin(name).value = value
+
+    def pin_writes(self):
+        return sum(state.writes for state in self.pins.values())
+
+    def stats(self):
+        return {
+            "adc_reads": self.mux.reads,
+            "mux_conflicts": self.mux.conflicts,
+            "pin_writes": self.pin_writes(),
+            "hid_midi_events": len(self.outputs.events),
+            "cdc_bytes_in": self.cdc.bytes_in,
+            "cdc_bytes_out": self.cdc.bytes_out,
+            "cdc_bytes_dropped": self.cdc.bytes_dropped,
+            "display_root_swaps": self.display.root_swaps if self.display else 0,
+            "rtc_reads": self.rtc.reads,
+            "rtc_writes": self.rtc.writes,
+        }
+
+    def close(self):
+        self.cdc.close()